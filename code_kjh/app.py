@@ -1,20 +1,21 @@
 import os
-import json
 import streamlit as st
 from dotenv import load_dotenv
-from langchain_community.vectorstores import FAISS
 
-from modules.data_loader import detect_changes, convert_to_documents
-from modules.chunk_splitter import split_by_token, split_by_char
+from modules.index_manager import sync_faiss_index, open_record_store
+from modules.data_loader import load_items
+from data_pipeline.record_hashes import hash_manifest_path, load_hash_manifest
 from modules.upstage_embedding import UpstageEmbeddings
+from modules.embedding_cache import CachedEmbeddings
 from modules.llm_prompt import make_prompt, query_solar
+from modules.metadata_filter import load_filter_index, filtered_similarity_search
 
 # 📁 경로 설정
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_PATH = os.path.join(BASE_DIR, "data", "combined_service_data_merged.json")
-PREV_PATH = os.path.join(BASE_DIR, "data", "combined_service_data_merged_prev.json")
+DATA_PATH = os.path.join(BASE_DIR, "data", "combined_service_data_merged.parquet")
 INDEX_DIR = os.path.join(BASE_DIR, "faiss_index")
-INDEX_FILE = os.path.join(INDEX_DIR, "index.faiss")
+EMBEDDING_CACHE_PATH = os.path.join(BASE_DIR, "data", "embedding_cache.sqlite")
+CONDITION_COLUMNS_PATH = os.path.join(BASE_DIR, "data", "supportConditions_columns.json")
 
 # 🔐 환경변수 로드
 load_dotenv(os.path.join(BASE_DIR, ".env"))
@@ -25,44 +26,58 @@ UPSTAGE_API_URL = os.getenv("UPSTAGE_API_URL")
 st.set_page_config(page_title="정부지원 서비스 질문", page_icon="📝")
 st.title("📚 정부지원 서비스 RAG 데모")
 
-# ✅ 벡터 DB 초기화 (캐시 사용)
+# ✅ 벡터 DB 초기화 (프로세스당 한 번, 모든 세션이 공유)
 @st.cache_resource
 def load_db():
-    with open(DATA_PATH, "r", encoding="utf-8") as f:
-        new_data = json.load(f)
+    # 문서 생성에 필요한 컬럼만 Parquet에서 읽고, 변경 감지는 파이프라인이 저장한 해시 매니페스트로
+    new_data = load_items(DATA_PATH)
+    record_hashes = load_hash_manifest(hash_manifest_path(DATA_PATH))
 
-    if os.path.exists(PREV_PATH):
-        with open(PREV_PATH, "r", encoding="utf-8") as f:
-            prev_data = json.load(f)
-    else:
-        prev_data = []
+    embedding = CachedEmbeddings(
+        UpstageEmbeddings(api_key=UPSTAGE_API_KEY, api_url=UPSTAGE_API_URL),
+        cache_path=EMBEDDING_CACHE_PATH
+    )
+    # 인덱스는 읽기 전용 mmap으로 열어, 여러 Streamlit 프로세스가 같은 페이지 캐시를 공유
+    # 원본 레코드 저장소는 Parquet의 모든 컬럼으로 채움 (record_path)
+    db = sync_faiss_index(new_data=new_data, embedding=embedding, index_dir=INDEX_DIR,
+                          record_hashes=record_hashes, mmap=True, record_path=DATA_PATH)
+    # 원본 레코드는 docstore가 아닌 저장소에서 검색 결과를 보여줄 때만 조회
+    records = open_record_store(INDEX_DIR)
+    # 조건 비트맵·대상연령·소관기관 필터 인덱스
+    filter_index = load_filter_index(db, CONDITION_COLUMNS_PATH)
 
-    added, updated, deleted = detect_changes(new_data=new_data, prev_data=prev_data)
-    embedding = UpstageEmbeddings(api_key=UPSTAGE_API_KEY, api_url=UPSTAGE_API_URL)
-
-    if added or updated or deleted or not os.path.exists(INDEX_FILE):
-        documents = convert_to_documents(new_data)
-        split_docs = split_by_char(documents)
-        db = FAISS.from_documents(split_docs, embedding)
-        db.save_local(INDEX_DIR)
-    else:
-        db = FAISS.load_local(INDEX_DIR, embeddings=embedding, allow_dangerous_deserialization=True)
-
-    return db
+    return db, records, filter_index
 
 # 🔹 벡터 DB 로딩
-db = load_db()
+db, records, filter_index = load_db()
+
+# 🎯 검색 필터 (조건에 맞는 서비스 안에서만 검색)
+filters = {}
+if filter_index is not None:
+    st.sidebar.markdown("### 🎯 검색 필터")
+    if st.sidebar.checkbox("나이로 거르기"):
+        filters["age"] = int(st.sidebar.number_input("나이", min_value=0, max_value=120, value=25))
+    selected_conditions = st.sidebar.multiselect("조건", filter_index.condition_names)
+    if selected_conditions:
+        filters["conditions"] = selected_conditions
+    region = st.sidebar.text_input("지역 (소관기관명에 포함)", placeholder="예: 의정부시")
+    if region.strip():
+        filters["regions"] = [region.strip()]
 
 # 🔍 질문 입력
 query = st.text_input("💬 궁금한 점을 입력하세요:", placeholder="예: 25세 여성이 받을 수 있는 주거지원은?")
 if query:
     with st.spinner("답변 생성 중..."):
-        docs = db.similarity_search(query, k=3)
+        # 사이드바에서 고른 필터가 없으면 질문 속 나이·조건명을 필터로 사용
+        query_filters = filters or (filter_index.parse_query(query) if filter_index else {})
+        if query_filters:
+            st.caption(f"🎯 적용된 필터: {query_filters}")
+        docs = records.hydrate(filtered_similarity_search(db, filter_index, query, k=3, **query_filters))
 
         for i, doc in enumerate(docs):
             st.markdown(f"### 📄 문서 {i+1}")
             st.code(doc.page_content[:500])
-            조건들 = doc.metadata.get("조건", {})
+            조건들 = doc.metadata["원본"].get("조건") or {}
             선택된_조건 = [k for k, v in 조건들.items() if v]
             if 선택된_조건:
                 st.markdown("**📌 조건 태그:** " + ", ".join(선택된_조건))
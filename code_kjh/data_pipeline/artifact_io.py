@@ -0,0 +1,96 @@
+# data_pipeline/artifact_io.py
+import json
+import os
+from typing import List, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 중첩 필드는 JSON 문자열이 아닌 Arrow 타입으로 저장 (조건: 키가 서비스마다 달라 map, 대상연령: 고정 키라 struct)
+NESTED_TYPES = {
+    "조건": pa.map_(pa.string(), pa.bool_()),
+    "대상연령": pa.struct([("시작", pa.int64()), ("종료", pa.int64())]),
+}
+JSON_COLUMNS_KEY = b"json_columns"
+
+def _json_default(value):
+    # numpy 스칼라(np.int64 등)를 파이썬 값으로 변환
+    return value.item() if hasattr(value, "item") else str(value)
+
+def _to_arrow(name: str, series: pd.Series):
+    """
+    컬럼 하나를 Arrow 배열로 바꿉니다. 타입이 섞여 있어 Arrow로 표현할 수 없는 컬럼(예: 병합된 `1||2`와 숫자)은
+    값마다 JSON 문자열로 저장하고 두 번째 반환값으로 표시합니다.
+    """
+    values = series.to_numpy(dtype=object)
+    if name in NESTED_TYPES:
+        return pa.array([None if not isinstance(v, dict) else v for v in values], type=NESTED_TYPES[name]), False
+
+    if not any(isinstance(v, (dict, list)) for v in values):
+        try:
+            return pa.Array.from_pandas(series), False
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+
+    encoded = [None if not isinstance(v, (dict, list)) and pd.isna(v) else json.dumps(v, ensure_ascii=False, default=_json_default)
+               for v in values]
+    return pa.array(encoded, type=pa.string()), True
+
+def json_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+def write_artifact(df: pd.DataFrame, path: str, export_json: bool = False):
+    """
+    DataFrame을 Parquet(zstd)으로 저장합니다. 중첩 필드(조건/대상연령)는 그대로 보존됩니다.
+    export_json=True이면 사람이 읽을 수 있도록 같은 이름의 .json도 함께 저장합니다.
+    """
+    arrays, json_columns = [], []
+    for col in df.columns:
+        array, is_json = _to_arrow(col, df[col])
+        arrays.append(array)
+        if is_json:
+            json_columns.append(col)
+
+    table = pa.Table.from_arrays(arrays, names=[str(col) for col in df.columns])
+    table = table.replace_schema_metadata({JSON_COLUMNS_KEY: json.dumps(json_columns).encode("utf-8")})
+
+    # 쓰는 도중 중단되어도 이전 파일이 깨지지 않도록 임시 파일에 쓰고 교체
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+    if export_json:
+        df.to_json(json_path(path), orient="records", force_ascii=False, indent=2)
+
+def read_records(path: str, columns: Optional[List[str]] = None) -> List[dict]:
+    """
+    Parquet 아티팩트를 레코드(dict) 리스트로 읽습니다. (json.load 결과와 같은 형태)
+    columns를 지정하면 해당 컬럼만 디스크에서 읽습니다. 파일에 없는 컬럼은 무시합니다.
+    """
+    schema = pq.read_schema(path)
+    if columns is not None:
+        columns = [col for col in columns if col in schema.names]
+    table = pq.read_table(path, columns=columns)
+
+    metadata = schema.metadata or {}
+    json_columns = set(json.loads(metadata.get(JSON_COLUMNS_KEY, b"[]")))
+
+    names, column_values = table.column_names, []
+    for name in names:
+        values = table.column(name).to_pylist()
+        if pa.types.is_map(table.schema.field(name).type):
+            values = [dict(v) if v is not None else None for v in values]
+        elif name in json_columns:
+            values = [json.loads(v) if v is not None else None for v in values]
+        column_values.append(values)
+
+    return [dict(zip(names, row)) for row in zip(*column_values)]
+
+def export_json(path: str) -> str:
+    """
+    이미 저장된 Parquet 아티팩트를 사람이 읽을 수 있는 .json으로 내보내고 그 경로를 반환합니다.
+    """
+    target = json_path(path)
+    with open(target, "w", encoding="utf-8") as f:
+        json.dump(read_records(path), f, ensure_ascii=False, indent=2)
+    return target
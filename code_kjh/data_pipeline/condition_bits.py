@@ -0,0 +1,31 @@
+import json
+import numpy as np
+from typing import List
+
+def encode_condition_bits(flag_matrix: np.ndarray) -> List[str]:
+    """
+    (서비스 수 × 조건 수) boolean 행렬을 행마다 비트마스크(hex 문자열)로 압축합니다.
+    비트 순서는 조건 컬럼 순서(supportConditions_columns.json)를 따릅니다.
+    """
+    flag_matrix = np.asarray(flag_matrix, dtype=bool)
+    if flag_matrix.ndim != 2 or flag_matrix.shape[1] == 0:
+        return [""] * len(flag_matrix)
+    packed = np.packbits(flag_matrix, axis=1)
+    return [row.tobytes().hex() for row in packed]
+
+def decode_condition_bits(bit_strings: List[str], n_conditions: int) -> np.ndarray:
+    """
+    encode_condition_bits로 만든 hex 문자열들을 (서비스 수 × 조건 수) boolean 행렬로 되돌립니다.
+    """
+    n_bytes = (n_conditions + 7) // 8
+    buffer = b"".join(bytes.fromhex(bits) if bits else bytes(n_bytes) for bits in bit_strings)
+    packed = np.frombuffer(buffer, dtype=np.uint8).reshape(len(bit_strings), n_bytes)
+    return np.unpackbits(packed, axis=1, count=n_conditions).astype(bool)
+
+def save_condition_columns(path: str, condition_cols: List[str]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"columns": list(condition_cols)}, f, ensure_ascii=False, indent=2)
+
+def load_condition_columns(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["columns"]
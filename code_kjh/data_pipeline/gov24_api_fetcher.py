@@ -1,56 +1,136 @@
+import math
 import requests
 import pandas as pd
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
 
-def fetch_to_pd(
+def _fetch_page(
+    session: requests.Session,
     url: str,
     encoded_key: str,
-    per_page: int = 500,
-    verbose: bool = True,
-    page_retry_limit: int = 3
-) -> pd.DataFrame:
+    page: int,
+    per_page: int,
+    verbose: bool,
+    page_retry_limit: int,
+    backoff_base: float
+) -> Optional[dict]:
     """
-    페이지 단위로 재시도하면서 전체 데이터를 수집합니다.
+    한 페이지를 요청합니다. 실패하면 지수 백오프로 재시도하고, 재시도를 모두 소진하면 None을 반환합니다.
     """
-    
     headers = {"accept": "*/*"}
-    page = 1
-    all_data = []
-
-    if verbose:
-        print(f"📦 전체 데이터 수집 시작: {url}")
-
-    while True:
-        full_url = f"{url}?page={page}&perPage={per_page}&serviceKey={encoded_key}"
-        retry_count = 0
-
-        while retry_count < page_retry_limit:
-            if verbose:
-                print(f"📄 페이지 {page} 요청 중... (재시도 {retry_count + 1}/{page_retry_limit})")
+    full_url = f"{url}?page={page}&perPage={per_page}&serviceKey={encoded_key}"
+    name = url.rstrip("/").rsplit("/", 1)[-1]
 
-            response = requests.get(full_url, headers=headers)
+    for retry_count in range(page_retry_limit):
+        if verbose:
+            print(f"📄 [{name}] 페이지 {page} 요청 중... (재시도 {retry_count + 1}/{page_retry_limit})")
 
+        try:
+            response = session.get(full_url, headers=headers, timeout=60)
+        except requests.RequestException as e:
+            print(f"❌ 요청 오류 (페이지 {page}):", e)
+        else:
             if response.status_code == 200:
                 try:
-                    json_data = response.json()
-                    data = json_data.get("data", [])
-                    if not data:
-                        if verbose:
-                            print("✅ 마지막 페이지 도달 또는 데이터 없음")
-                        return pd.DataFrame(all_data)
-                    all_data.extend(data)
-                    page += 1
-                    break  # 현재 페이지 성공 → 다음 페이지로
+                    return response.json()
                 except Exception as e:
                     print("❌ JSON 파싱 오류:", e)
             else:
                 print(f"❌ 요청 실패 (페이지 {page}): {response.status_code}")
 
-            retry_count += 1
-            time.sleep(2)
+        time.sleep(backoff_base * (2 ** retry_count))
+
+    print(f"🚫 페이지 {page} 요청 재시도 초과. 중단합니다.")
+    return None
+
+class IncompleteFetchError(RuntimeError):
+    """일부 페이지를 받지 못해 전체 데이터를 수집하지 못한 경우 (일부만 반환하면 빠진 서비스가 삭제된 것으로 처리됨)"""
+
+def iter_records(
+    url: str,
+    encoded_key: str,
+    per_page: int = 500,
+    verbose: bool = True,
+    page_retry_limit: int = 3,
+    max_workers: int = 4,
+    backoff_base: float = 1.0
+) -> Iterator[dict]:
+    """
+    첫 페이지의 totalCount로 전체 페이지 수를 구한 뒤, 나머지 페이지를 병렬로 요청해
+    레코드를 페이지 순서대로 하나씩 내보내는 제너레이터입니다.
+    totalCount가 없는 응답이면 빈 페이지가 나올 때까지 순차적으로 요청합니다.
+
+    페이지 요청이 재시도를 모두 소진하거나 받은 레코드 수가 totalCount보다 적으면 IncompleteFetchError를 발생시킵니다.
+    (증분 인덱싱은 빠진 서비스를 삭제된 것으로 보므로 일부 데이터만 조용히 반환하지 않음)
+    """
+    if verbose:
+        print(f"📦 전체 데이터 수집 시작: {url}")
+
+    with requests.Session() as session:
+        def fetch(page: int) -> Optional[dict]:
+            return _fetch_page(session, url, encoded_key, page, per_page, verbose, page_retry_limit, backoff_base)
+
+        first = fetch(1)
+        if first is None:
+            raise IncompleteFetchError(f"❌ {url} 페이지 1 요청 실패")
+        yield from first.get("data", [])
+        fetched = len(first.get("data", []))
+
+        total_count = first.get("totalCount")
+        if total_count is None:
+            page = 2
+            while True:
+                json_data = fetch(page)
+                if json_data is None:
+                    raise IncompleteFetchError(f"❌ {url} 페이지 {page} 요청 실패")
+                if not json_data.get("data"):
+                    break
+                yield from json_data["data"]
+                page += 1
+            return
+
+        total_pages = math.ceil(total_count / per_page)
+        if verbose:
+            print(f"🔢 totalCount={total_count} → 총 {total_pages}페이지")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {page: executor.submit(fetch, page) for page in range(2, total_pages + 1)}
+            try:
+                # 완료 순서와 관계없이 페이지 순서대로 조립
+                for page in range(2, total_pages + 1):
+                    json_data = futures[page].result()
+                    if json_data is None:
+                        raise IncompleteFetchError(f"❌ {url} 페이지 {page} 요청 실패 ({total_pages}페이지 중)")
+                    yield from json_data.get("data", [])
+                    fetched += len(json_data.get("data", []))
+            finally:
+                # 실패하거나 소비가 중간에 멈추면 아직 시작하지 않은 페이지 요청은 취소
+                for future in futures.values():
+                    future.cancel()
+
+        if fetched < total_count:
+            raise IncompleteFetchError(f"❌ {url} 레코드 {fetched}개만 수집 (totalCount={total_count})")
 
-        if retry_count == page_retry_limit:
-            print(f"🚫 페이지 {page} 요청 재시도 초과. 중단합니다.")
-            break
+    if verbose:
+        print("✅ 마지막 페이지 도달")
 
-    return pd.DataFrame(all_data)
+def fetch_to_pd(
+    url: str,
+    encoded_key: str,
+    per_page: int = 500,
+    verbose: bool = True,
+    page_retry_limit: int = 3,
+    max_workers: int = 4
+) -> pd.DataFrame:
+    """
+    페이지 단위로 재시도하면서 전체 데이터를 병렬로 수집합니다.
+    """
+    return pd.DataFrame(list(iter_records(
+        url,
+        encoded_key,
+        per_page=per_page,
+        verbose=verbose,
+        page_retry_limit=page_retry_limit,
+        max_workers=max_workers
+    )))
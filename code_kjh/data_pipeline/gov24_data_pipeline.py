@@ -1,15 +1,53 @@
 # data_pipeline/gov24_data_pipeline.py
 import os
 import urllib.parse
+import numpy as np
 import pandas as pd
 import shutil
 from collections import defaultdict, Counter
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from copy import deepcopy
 from data_pipeline.gov24_api_fetcher import fetch_to_pd
-from data_pipeline.support_model_crawler import crawl_support_conditions_model
+from data_pipeline.support_model_crawler import load_support_conditions_model, DEFAULT_CACHE_TTL_SECONDS
+from data_pipeline.condition_bits import encode_condition_bits, save_condition_columns
+from data_pipeline.group_merge import group_merge
+from data_pipeline.artifact_io import write_artifact, json_path
+from data_pipeline.record_hashes import (
+    build_hash_manifest, diff_hash_manifests, hash_manifest_path, load_hash_manifest, save_hash_manifest
+)
 
-def run_gov24_data_pipeline():
+def first_non_null(frame: pd.DataFrame) -> pd.Series:
+    """
+    왼쪽 컬럼부터 처음 나오는 null이 아닌 값을 고릅니다. (combine_first를 연쇄 적용한 것과 동일)
+    """
+    if frame.shape[1] == 1:
+        return frame.iloc[:, 0]
+    values = frame.to_numpy(dtype=object)
+    first = pd.isna(values).argmin(axis=1)
+    return pd.Series(values[np.arange(len(values)), first], index=frame.index).infer_objects()
+
+def to_nullable_ints(series: pd.Series) -> list:
+    """
+    숫자로 변환할 수 있는 값은 int, 나머지는 None인 리스트를 반환합니다.
+    """
+    values = np.trunc(pd.to_numeric(series, errors="coerce")).astype("Int64")
+    return values.astype(object).where(values.notna(), None).tolist()
+
+def run_gov24_data_pipeline(
+    export_json: bool = False,
+    refresh_model: bool = False,
+    offline_model: bool = False,
+    model_cache_ttl: float = DEFAULT_CACHE_TTL_SECONDS
+):
+    """
+    정부24 데이터를 수집·가공해 data/ 폴더에 저장합니다.
+
+    Args:
+        export_json: True이면 Parquet과 함께 사람이 읽을 JSON도 저장
+        refresh_model: True이면 항목코드 표 캐시를 무시하고 다시 크롤링
+        offline_model: True이면 항목코드 표를 캐시에서만 읽음 (브라우저 실행 안 함)
+        model_cache_ttl: 항목코드 표 캐시 유효 기간(초)
+    """
     # 1. 환경변수 및 경로 설정
     base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
     env_path = os.path.join(base_dir, ".env")
@@ -23,21 +61,31 @@ def run_gov24_data_pipeline():
     data_dir = os.path.join(base_dir, "data")
     os.makedirs(data_dir, exist_ok=True)
 
-    detail_json_path = os.path.join(data_dir, "serviceDetail_all.json")
-    conditions_json_path = os.path.join(data_dir, "supportConditions_all.json")
-    model_json_path = os.path.join(data_dir, "supportConditions_model.json")
-    combined_json_path = os.path.join(data_dir, "combined_service_data.json")
-    merged_json_path = os.path.join(data_dir, "combined_service_data_merged.json")
+    condition_columns_path = os.path.join(data_dir, "supportConditions_columns.json")
+    model_cache_path = os.path.join(data_dir, "supportConditions_model_cache.json")
+
+    def artifact_path(name: str) -> str:
+        return os.path.join(data_dir, f"{name}.parquet")
 
-    def backup_if_exists(src_path: str, backup_name: str):
-        if os.path.exists(src_path):
-            backup_path = os.path.join(data_dir, f"{backup_name}_prev.json")
-            shutil.copy(src_path, backup_path)
+    def backup_if_exists(name: str):
+        for src_path, backup_path in [
+            (artifact_path(name), artifact_path(f"{name}_prev")),
+            (hash_manifest_path(artifact_path(name)), hash_manifest_path(artifact_path(f"{name}_prev"))),
+        ]:
+            if os.path.exists(src_path):
+                shutil.copy(src_path, backup_path)
 
-    # 2. 데이터 수집
-    detail_df = fetch_to_pd("https://api.odcloud.kr/api/gov24/v3/serviceDetail", encoded_key)
-    conditions_df = fetch_to_pd("https://api.odcloud.kr/api/gov24/v3/supportConditions", encoded_key)
-    model_df = crawl_support_conditions_model()
+    # 2. 데이터 수집 (두 API와 항목코드 표 로드를 동시에 진행, 항목코드 표는 캐시가 오래됐을 때만 크롤링)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        detail_future = executor.submit(fetch_to_pd, "https://api.odcloud.kr/api/gov24/v3/serviceDetail", encoded_key)
+        conditions_future = executor.submit(fetch_to_pd, "https://api.odcloud.kr/api/gov24/v3/supportConditions", encoded_key)
+        model_future = executor.submit(
+            load_support_conditions_model, model_cache_path,
+            ttl_seconds=model_cache_ttl, refresh=refresh_model, offline=offline_model
+        )
+        detail_df = detail_future.result()
+        conditions_df = conditions_future.result()
+        model_df = model_future.result()
 
     # 3. 컬럼 매핑 및 통합
     code_to_desc = dict(zip(model_df["항목코드"], model_df["설명"]))
@@ -52,67 +100,69 @@ def run_gov24_data_pipeline():
     conditions_df.columns = new_columns
     print("✅ supportConditions_df column names mapped to description")
 
-    merged_df = pd.DataFrame(index=conditions_df.index)
     column_groups = defaultdict(list)
     for col in conditions_df.columns:
         base_name = col.split("_")[0]
         column_groups[base_name].append(col)
-    for base_name, col_list in column_groups.items():
-        merged_series = conditions_df[col_list[0]]
-        for other_col in col_list[1:]:
-            merged_series = merged_series.combine_first(conditions_df[other_col])
-        merged_df[base_name] = merged_series
-    conditions_df = merged_df
+    conditions_df = pd.DataFrame(
+        {base_name: first_non_null(conditions_df[col_list]) for base_name, col_list in column_groups.items()},
+        index=conditions_df.index
+    )
     print("✅ Duplicate description columns merged")
 
-    # 4. 조건 필드 가공
+    # 4. 조건 필드 가공 (행 단위 apply 대신 컬럼 단위 연산)
     exclude_cols = ["서비스명", "대상연령(시작)", "대상연령(종료)"]
     condition_cols = [col for col in conditions_df.columns if col not in exclude_cols]
-    conditions_df["조건"] = conditions_df.apply(
-        lambda row: {col: True for col in condition_cols if str(row[col]).strip().upper() == "Y"}, axis=1
-    )
-    conditions_df["대상연령"] = conditions_df.apply(
-        lambda row: {
-            "시작": int(row["대상연령(시작)"]) if pd.notnull(row["대상연령(시작)"]) else None,
-            "종료": int(row["대상연령(종료)"]) if pd.notnull(row["대상연령(종료)"]) else None,
-        }, axis=1
-    )
+    flag_matrix = np.char.upper(np.char.strip(conditions_df[condition_cols].astype(str).to_numpy(dtype=str))) == "Y"
+    condition_names = np.array(condition_cols, dtype=object)
+    conditions_df["조건"] = [dict.fromkeys(condition_names[flags], True) for flags in flag_matrix]
+
+    age_start = to_nullable_ints(conditions_df["대상연령(시작)"])
+    age_end = to_nullable_ints(conditions_df["대상연령(종료)"])
+    conditions_df["대상연령"] = [{"시작": start, "종료": end} for start, end in zip(age_start, age_end)]
+
+    # 조건 dict와 함께 압축된 비트마스크도 보관 (비트 순서: supportConditions_columns.json)
+    conditions_df["조건비트"] = encode_condition_bits(flag_matrix)
 
     # 5. 병합
     combined_df = pd.merge(detail_df, conditions_df[["서비스명", "대상연령", "조건"]], on="서비스명", how="inner")
-    merged_rows = []
-    for name, group in combined_df.groupby("서비스명"):
-        base = deepcopy(group.iloc[0].to_dict())
-        for _, row in group.iloc[1:].iterrows():
-            for col, val in row.items():
-                base_val = base.get(col)
-                if isinstance(base_val, str) and isinstance(val, str) and base_val != val:
-                    base[col] = "||".join(sorted(set(base_val.split("||") + val.split("||"))))
-                elif isinstance(base_val, list) and isinstance(val, list):
-                    base[col] = list(set(base_val) | set(val))
-                elif isinstance(base_val, dict) and isinstance(val, dict):
-                    merged = {k: base_val.get(k) if base_val.get(k) is not None else val.get(k)
-                              for k in set(base_val) | set(val)}
-                    base[col] = merged
-                elif pd.isna(base_val) and pd.notna(val):
-                    base[col] = val
-                elif base_val != val:
-                    base[col] = f"{base_val}||{val}"
-        merged_rows.append(base)
-    combined_merged_df = pd.DataFrame(merged_rows)
-
-    # 6. 저장 및 백업
-    backup_if_exists(detail_json_path, "serviceDetail_all")
-    backup_if_exists(conditions_json_path, "supportConditions_all")
-    backup_if_exists(model_json_path, "supportConditions_model")
-    backup_if_exists(combined_json_path, "combined_service_data")
-    backup_if_exists(merged_json_path, "combined_service_data_merged")
-
-    detail_df.to_json(detail_json_path, orient="records", force_ascii=False, indent=2)
-    conditions_df.to_json(conditions_json_path, orient="records", force_ascii=False, indent=2)
-    model_df.to_json(model_json_path, orient="records", force_ascii=False, indent=2)
-    combined_df.to_json(combined_json_path, orient="records", force_ascii=False, indent=2)
-    combined_merged_df.to_json(merged_json_path, orient="records", force_ascii=False, indent=2)
-
-    print(f"✅ JSON 저장 및 백업 완료")
+    # 서비스명이 같은 행들을 컬럼별 병합 정책(문자열/리스트 합집합, 딕셔너리 첫 non-null 등)으로 합침
+    combined_merged_df = group_merge(combined_df, "서비스명")
+
+    # 병합된 서비스의 조건비트 = 같은 서비스명을 가진 조건 행들의 OR
+    flags_by_name = pd.DataFrame(flag_matrix, index=conditions_df.index).groupby(conditions_df["서비스명"]).any()
+    bits_by_name = dict(zip(flags_by_name.index, encode_condition_bits(flags_by_name.to_numpy())))
+    if not combined_merged_df.empty:
+        combined_merged_df["조건비트"] = combined_merged_df["서비스명"].map(bits_by_name)
+
+    # 6. 저장 및 백업 (Parquet, export_json=True이면 사람이 읽을 JSON도 함께 저장)
+    # 각 아티팩트 옆에 레코드별 해시 매니페스트(<이름>.hashes.json)도 저장 (키: 레코드 식별 컬럼)
+    artifacts = {
+        "serviceDetail_all": (detail_df, "서비스ID"),
+        "supportConditions_all": (conditions_df, "서비스명"),
+        "supportConditions_model": (model_df, "항목코드"),
+        "combined_service_data": (combined_df, "서비스ID"),
+        "combined_service_data_merged": (combined_merged_df, "서비스ID"),
+    }
+    for name, (df, key) in artifacts.items():
+        backup_if_exists(name)
+        write_artifact(df, artifact_path(name), export_json=export_json)
+        save_hash_manifest(hash_manifest_path(artifact_path(name)), build_hash_manifest(df, key=key))
+        stale_json_path = json_path(artifact_path(name))
+        if not export_json and os.path.exists(stale_json_path):
+            # 이전 실행에서 내보낸 JSON은 더 이상 최신 데이터가 아니므로 삭제
+            os.remove(stale_json_path)
+    save_condition_columns(condition_columns_path, condition_cols)
+
+    # 최종 병합본의 변경 요약 (해시 매니페스트 비교, 어떤 필드가 바뀌었는지 집계)
+    added, deleted, updated = diff_hash_manifests(
+        load_hash_manifest(hash_manifest_path(artifact_path("combined_service_data_merged"))),
+        load_hash_manifest(hash_manifest_path(artifact_path("combined_service_data_merged_prev")))
+    )
+    changed_fields = Counter(field for fields in updated.values() for field in fields)
+    print(f"🧾 변경 요약: 추가 {len(added)} / 수정 {len(updated)} / 삭제 {len(deleted)}")
+    if changed_fields:
+        print("   수정된 필드: " + ", ".join(f"{field}({count})" for field, count in changed_fields.most_common()))
+
+    print(f"✅ Parquet 저장 및 백업 완료")
     print(f"🔁 병합 전: {len(combined_df)} / 병합 후: {len(combined_merged_df)}")
\ No newline at end of file
@@ -0,0 +1,111 @@
+# data_pipeline/group_merge.py
+from functools import reduce
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+SEPARATOR = "||"
+
+def merge_pair(base_val: Any, val: Any) -> Any:
+    """
+    두 값을 합치는 기본 규칙입니다. (기존 iterrows 병합 루프의 셀 단위 규칙과 동일)
+    - 서로 다른 문자열: `||`로 나눠 합집합을 정렬해 다시 연결
+    - 리스트: 합집합 / 딕셔너리: 키별로 먼저 나온 None이 아닌 값
+    - 그 외: 기존 값이 비어 있으면 새 값, 다르면 `기존||새값` 문자열
+    """
+    if isinstance(base_val, str) and isinstance(val, str) and base_val != val:
+        return SEPARATOR.join(sorted(set(base_val.split(SEPARATOR) + val.split(SEPARATOR))))
+    elif isinstance(base_val, list) and isinstance(val, list):
+        return list(set(base_val) | set(val))
+    elif isinstance(base_val, dict) and isinstance(val, dict):
+        return {k: base_val.get(k) if base_val.get(k) is not None else val.get(k)
+                for k in set(base_val) | set(val)}
+    elif pd.isna(base_val) and pd.notna(val):
+        return val
+    elif base_val != val:
+        return f"{base_val}{SEPARATOR}{val}"
+    return base_val
+
+def _string_union(values: np.ndarray, groups: np.ndarray) -> pd.Series:
+    # 그룹 안의 문자열이 모두 같으면 첫 값 그대로, 아니면 `||` 조각들의 정렬된 합집합
+    frame = pd.DataFrame({"group": groups, "value": values})
+    first = frame.groupby("group")["value"].first()
+    same = frame.groupby("group")["value"].nunique() == 1
+
+    parts = frame.assign(part=frame["value"].str.split(SEPARATOR, regex=False)).explode("part")
+    parts = parts.drop_duplicates(["group", "part"]).sort_values(["group", "part"])
+    union = parts.groupby("group")["part"].agg(SEPARATOR.join)
+    return first.where(same, union)
+
+def _list_union(values: List[list]) -> list:
+    return list(set().union(*values))
+
+def _dict_first_non_null(values: List[dict]) -> dict:
+    merged = {}
+    for value in values:
+        for k, v in value.items():
+            if merged.get(k) is None:
+                merged[k] = v
+    return merged
+
+def _scalar(values: List[Any]) -> Any:
+    # 타입이 섞인 컬럼은 순서에 따라 결과가 달라지므로 기본 규칙을 그룹 안에서 차례로 적용
+    return reduce(merge_pair, values)
+
+GROUP_POLICIES: Dict[str, Callable[[List[Any]], Any]] = {
+    "list_union": _list_union,
+    "dict_first_non_null": _dict_first_non_null,
+    "scalar": _scalar,
+}
+POLICIES = ["string_union", *GROUP_POLICIES]
+
+def infer_policy(values: np.ndarray) -> str:
+    """
+    컬럼 값들의 타입으로 병합 정책을 고릅니다. 타입이 섞여 있으면 scalar(기본 규칙 순차 적용)입니다.
+    """
+    for policy, kind in (("string_union", str), ("list_union", list), ("dict_first_non_null", dict)):
+        if all(isinstance(value, kind) for value in values):
+            return policy
+    return "scalar"
+
+def group_merge(df: pd.DataFrame, key: str, policies: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    key가 같은 행들을 컬럼별 병합 정책으로 한 행으로 합칩니다.
+    groupby(key) 후 행마다 merge_pair를 적용하던 결과와 같으며, key 기준으로 정렬되고 key가 비어 있는 행은 제외됩니다.
+    policies로 컬럼별 정책(POLICIES 중 하나)을 지정하지 않으면 중복 행들의 값 타입으로 추론합니다.
+    """
+    policies = policies or {}
+    df = df[df[key].notna()]
+    if df.empty:
+        return pd.DataFrame(columns=df.columns)
+
+    codes, _ = pd.factorize(df[key], sort=True)
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    sizes = np.bincount(codes)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    # 중복이 있는 그룹의 행만 병합 대상 (단독 그룹은 첫 행 값을 그대로 사용)
+    duplicated = sizes[codes] > 1
+    dup_codes = codes[duplicated]
+    dup_starts = np.flatnonzero(np.diff(dup_codes, prepend=-1))
+    dup_groups = dup_codes[dup_starts]
+
+    merged = {}
+    for col in df.columns:
+        values = df[col].to_numpy(dtype=object)[order]
+        result = values[starts].copy()
+
+        if len(dup_codes):
+            dup_values = values[duplicated]
+            policy = policies.get(col) or infer_policy(dup_values)
+            if policy == "string_union":
+                result[dup_groups] = _string_union(dup_values, dup_codes).loc[dup_groups].to_numpy(dtype=object)
+            else:
+                merge = GROUP_POLICIES[policy]
+                for group, chunk in zip(dup_groups, np.split(dup_values, dup_starts[1:])):
+                    result[group] = merge(list(chunk))
+
+        merged[col] = list(result)
+
+    return pd.DataFrame(merged, columns=df.columns)
@@ -0,0 +1,71 @@
+# data_pipeline/group_merge_test.py
+# 실행: code_kjh 폴더에서 `python -m pytest data_pipeline/group_merge_test.py` 또는 `python -m data_pipeline.group_merge_test`
+import json
+import random
+from copy import deepcopy
+import numpy as np
+import pandas as pd
+from data_pipeline.group_merge import group_merge
+
+def legacy_merge(combined_df: pd.DataFrame) -> pd.DataFrame:
+    # ✅ 기존 gov24_data_pipeline 5단계의 iterrows/deepcopy 병합 루프 (비교 기준)
+    merged_rows = []
+    for name, group in combined_df.groupby("서비스명"):
+        base = deepcopy(group.iloc[0].to_dict())
+        for _, row in group.iloc[1:].iterrows():
+            for col, val in row.items():
+                base_val = base.get(col)
+                if isinstance(base_val, str) and isinstance(val, str) and base_val != val:
+                    base[col] = "||".join(sorted(set(base_val.split("||") + val.split("||"))))
+                elif isinstance(base_val, list) and isinstance(val, list):
+                    base[col] = list(set(base_val) | set(val))
+                elif isinstance(base_val, dict) and isinstance(val, dict):
+                    merged = {k: base_val.get(k) if base_val.get(k) is not None else val.get(k)
+                              for k in set(base_val) | set(val)}
+                    base[col] = merged
+                elif pd.isna(base_val) and pd.notna(val):
+                    base[col] = val
+                elif base_val != val:
+                    base[col] = f"{base_val}||{val}"
+        merged_rows.append(base)
+    return pd.DataFrame(merged_rows)
+
+def to_records(df: pd.DataFrame) -> list:
+    # combined_service_data_merged.json으로 저장되는 형태 그대로 비교
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+def make_combined_df(n_rows: int, n_names: int, seed: int) -> pd.DataFrame:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_rows):
+        rows.append({
+            "서비스ID": f"{i:06d}",
+            "서비스명": rng.choice([f"서비스{rng.randrange(n_names)}", None]) if i % 37 == 0 else f"서비스{rng.randrange(n_names)}",
+            "지원내용": rng.choice(["월세 지원", "교통비||월세 지원", "교통비", "a||b||a"]),
+            "문의처": rng.choice(["02-123-4567", "1577-0000", None, np.nan]),
+            "조회수": rng.choice([1, 2, 3]),
+            "신청기한": rng.choice([1.5, None, "상시", "상시||수시"]),
+            "태그": rng.choice([[1, 2], [2, 3], [5]]),
+            "대상연령": {"시작": rng.choice([None, 19, 20]), "종료": rng.choice([None, 39])},
+            "조건": dict.fromkeys(rng.sample(["청년", "남성", "여성", "중위소득"], rng.randrange(3)), True),
+        })
+    return pd.DataFrame(rows)
+
+def test_group_merge_matches_legacy_loop():
+    for seed in range(20):
+        combined_df = make_combined_df(n_rows=300, n_names=80, seed=seed)
+        assert to_records(group_merge(combined_df, "서비스명")) == to_records(legacy_merge(combined_df))
+
+def test_group_merge_without_duplicates():
+    combined_df = make_combined_df(n_rows=50, n_names=10_000, seed=0).drop_duplicates("서비스명")
+    assert to_records(group_merge(combined_df, "서비스명")) == to_records(legacy_merge(combined_df))
+
+def test_group_merge_empty():
+    combined_df = make_combined_df(n_rows=10, n_names=5, seed=0).iloc[:0]
+    assert to_records(group_merge(combined_df, "서비스명")) == to_records(legacy_merge(combined_df))
+
+if __name__ == "__main__":
+    test_group_merge_matches_legacy_loop()
+    test_group_merge_without_duplicates()
+    test_group_merge_empty()
+    print("✅ group_merge 결과가 기존 병합 루프와 동일합니다")
@@ -0,0 +1,111 @@
+# data_pipeline/record_hashes.py
+import hashlib
+import json
+import os
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+
+def hash_manifest_path(artifact_path: str) -> str:
+    # serviceDetail_all.parquet → serviceDetail_all.hashes.json
+    return os.path.splitext(artifact_path)[0] + ".hashes.json"
+
+def _json_default(value):
+    return value.item() if hasattr(value, "item") else str(value)
+
+def hash_value(value) -> str:
+    """
+    필드 값 하나의 해시입니다. NaN과 None은 같은 값(null)으로 취급하고, 정수 값의 실수(5.0)는 정수(5)로 봅니다.
+    (pandas는 null이 섞인 정수 컬럼을 float64로 바꾸므로, 다른 레코드에 null이 생기거나 없어져도 해시가 같도록)
+    """
+    if not isinstance(value, (dict, list)) and pd.isna(value):
+        value = None
+    elif isinstance(value, (float, np.floating)) and float(value).is_integer():
+        value = int(value)
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, default=_json_default)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=8).hexdigest()
+
+def combine_hashes(hashes: Iterable[str]) -> str:
+    return hashlib.blake2b("".join(hashes).encode("utf-8"), digest_size=8).hexdigest()
+
+def build_hash_manifest(data: Union[pd.DataFrame, List[dict]], key: str = "서비스ID") -> dict:
+    """
+    레코드별 해시 매니페스트를 만듭니다.
+    {"key": key, "fields": [필드명...], "records": {키: [레코드 해시, 필드 해시...]}}
+    필드는 이름순으로 정렬되며, 키가 중복되면 두 번째부터 `키#1`, `키#2` 처럼 순번을 붙입니다.
+    """
+    # 레코드마다 자기 값을 그대로 해시 (리스트를 DataFrame으로 만들면 다른 레코드의 null 때문에 dtype이 바뀜)
+    items = data.astype(object).to_dict("records") if isinstance(data, pd.DataFrame) else data
+    columns = data.columns if isinstance(data, pd.DataFrame) else dict.fromkeys(col for item in items for col in item)
+    fields = sorted(str(col) for col in columns if col != key)
+
+    records, seen = {}, Counter()
+    for i, item in enumerate(items):
+        values = {str(col): value for col, value in item.items()}
+        record_key = str(values[key]) if key in values else str(i)
+        seen[record_key] += 1
+        if seen[record_key] > 1:
+            record_key = f"{record_key}#{seen[record_key] - 1}"
+        row = [hash_value(values.get(field)) for field in fields]
+        records[record_key] = [combine_hashes(row), *row]
+
+    return {"key": key, "fields": fields, "records": records}
+
+def save_hash_manifest(path: str, manifest: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+def load_hash_manifest(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def subset_hashes(manifest: dict, field_groups: Dict[str, List[str]]) -> Dict[str, Dict[str, str]]:
+    """
+    필드 묶음별 해시를 레코드마다 계산합니다. 매니페스트에 없는 필드는 null 값의 해시로 봅니다.
+    예: {"embedding": [...], "metadata": [...]} → {키: {"embedding": 해시, "metadata": 해시}}
+    """
+    positions = {field: i + 1 for i, field in enumerate(manifest["fields"])}
+    null_hash = hash_value(None)
+    result = {}
+    for record_key, row in manifest["records"].items():
+        result[record_key] = {
+            group: combine_hashes(row[positions[f]] if f in positions else null_hash for f in fields)
+            for group, fields in field_groups.items()
+        }
+    return result
+
+def diff_hash_manifests(new: dict, prev: Optional[dict]) -> Tuple[List[str], List[str], Dict[str, List[str]]]:
+    """
+    두 매니페스트를 해시맵으로 비교합니다.
+
+    Returns:
+        tuple: (추가된 키, 삭제된 키, {수정된 키: [바뀐 필드명...]})
+    """
+    prev_records = prev["records"] if prev else {}
+    prev_fields = prev["fields"] if prev else []
+    new_records, new_fields = new["records"], new["fields"]
+
+    added = [k for k in new_records if k not in prev_records]
+    deleted = [k for k in prev_records if k not in new_records]
+
+    # 한쪽에만 있는 필드는 다른 쪽 값을 null로 보고 비교
+    null_hash = hash_value(None)
+    prev_positions = {field: i + 1 for i, field in enumerate(prev_fields)}
+    new_positions = {field: i + 1 for i, field in enumerate(new_fields)}
+    all_fields = new_fields + [field for field in prev_fields if field not in new_positions]
+
+    updated = {}
+    for record_key, row in new_records.items():
+        prev_row = prev_records.get(record_key)
+        if prev_row is None or (prev_row[0] == row[0] and prev_fields == new_fields):
+            continue
+        changed = [field for field in all_fields
+                   if (row[new_positions[field]] if field in new_positions else null_hash)
+                   != (prev_row[prev_positions[field]] if field in prev_positions else null_hash)]
+        if changed:
+            updated[record_key] = changed
+
+    return added, deleted, updated
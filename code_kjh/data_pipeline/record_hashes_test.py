@@ -0,0 +1,24 @@
+# data_pipeline/record_hashes_test.py
+# 실행: code_kjh 폴더에서 `python -m pytest data_pipeline/record_hashes_test.py` 또는 `python -m data_pipeline.record_hashes_test`
+import pandas as pd
+from data_pipeline.record_hashes import build_hash_manifest, diff_hash_manifests
+
+def test_null_in_other_record_keeps_hash():
+    # 다른 레코드에 null이 생겨 정수 컬럼이 float64가 돼도 바뀌지 않은 레코드의 해시는 같아야 함
+    with_null = [{"서비스ID": "1", "n": 5}, {"서비스ID": "2", "n": None}]
+    without_null = [{"서비스ID": "1", "n": 5}, {"서비스ID": "2", "n": 7}]
+    expected = build_hash_manifest(without_null)["records"]["1"]
+    assert build_hash_manifest(with_null)["records"]["1"] == expected
+    assert build_hash_manifest(pd.DataFrame(with_null))["records"]["1"] == expected
+    assert build_hash_manifest(pd.DataFrame(without_null))["records"]["1"] == expected
+
+def test_diff_reports_only_changed_records():
+    prev = build_hash_manifest([{"서비스ID": "1", "n": 5, "m": "a"}, {"서비스ID": "2", "n": 7, "m": "b"}])
+    new = build_hash_manifest(pd.DataFrame([{"서비스ID": "1", "n": 5, "m": "a"}, {"서비스ID": "2", "n": None, "m": "b"},
+                                            {"서비스ID": "3", "n": 1, "m": "c"}]))
+    assert diff_hash_manifests(new, prev) == (["3"], [], {"2": ["n"]})
+
+if __name__ == "__main__":
+    test_null_in_other_record_keeps_hash()
+    test_diff_reports_only_changed_records()
+    print("✅ 레코드 해시가 다른 레코드의 null과 무관합니다")
@@ -1,11 +1,12 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
-import pandas as pd
+import hashlib
+import json
+import os
 import time
+import pandas as pd
+
+MODEL_URL = "https://www.data.go.kr/data/15113968/openapi.do#/"
+CACHE_VERSION = 1                              # 캐시 파일 형식 버전 (바뀌면 기존 캐시는 무시)
+DEFAULT_CACHE_TTL_SECONDS = 60 * 60 * 24 * 30  # 항목코드 표는 거의 바뀌지 않으므로 30일
 
 def crawl_support_conditions_model(verbose: bool = True) -> pd.DataFrame:
     """
@@ -14,6 +15,14 @@ def crawl_support_conditions_model(verbose: bool = True) -> pd.DataFrame:
     Returns:
         pd.DataFrame: 항목코드와 설명이 담긴 DataFrame
     """
+    # 셀레니움은 실제로 크롤링할 때만 불러옴 (캐시/오프라인 모드에서는 브라우저 관련 모듈이 필요 없음)
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+    from bs4 import BeautifulSoup
+
     # 셀레니움 옵션 설정
     options = Options()
     options.add_argument("--headless")
@@ -22,8 +31,7 @@ def crawl_support_conditions_model(verbose: bool = True) -> pd.DataFrame:
 
     # 드라이버 실행
     driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    url = "https://www.data.go.kr/data/15113968/openapi.do#/"
-    driver.get(url)
+    driver.get(MODEL_URL)
     time.sleep(3)
 
     # 접혀있는 버튼 클릭 (최대 10회)
@@ -62,3 +70,91 @@ def crawl_support_conditions_model(verbose: bool = True) -> pd.DataFrame:
         print(f"크롤링 완료: {len(df)}개 항목 수집됨")
 
     return df
+
+
+def _content_hash(items: list) -> str:
+    return hashlib.sha256(json.dumps(items, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _read_cache(cache_path: str):
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return cache if cache.get("version") == CACHE_VERSION else None
+
+def _cache_frame(cache: dict) -> pd.DataFrame:
+    return pd.DataFrame(cache["items"], columns=["항목코드", "설명"])
+
+def _write_cache(cache_path: str, items: list, prev_cache):
+    if not items:
+        raise ValueError("❌ 빈 항목코드 표는 캐시에 저장하지 않습니다.")
+    content_hash = _content_hash(items)
+    revision = (prev_cache or {}).get("revision", 0)
+    if prev_cache is None or prev_cache.get("content_hash") != content_hash:
+        revision += 1  # 항목코드 표 내용이 바뀐 경우에만 리비전 증가
+
+    cache = {
+        "version": CACHE_VERSION,
+        "revision": revision,
+        "content_hash": content_hash,
+        "fetched_at": time.time(),
+        "source": MODEL_URL,
+        "items": items,
+    }
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, cache_path)
+
+def load_support_conditions_model(
+    cache_path: str,
+    ttl_seconds: float = DEFAULT_CACHE_TTL_SECONDS,
+    refresh: bool = False,
+    offline: bool = False,
+    verbose: bool = True
+) -> pd.DataFrame:
+    """
+    항목코드-설명 표를 로컬 캐시에서 읽고, 캐시가 없거나 TTL이 지났을 때만 크롤링합니다.
+
+    Args:
+        refresh: True이면 TTL과 관계없이 다시 크롤링
+        offline: True이면 브라우저를 절대 실행하지 않고 캐시만 사용 (캐시가 없으면 오류)
+
+    Returns:
+        pd.DataFrame: 항목코드와 설명이 담긴 DataFrame
+    """
+    cache = _read_cache(cache_path)
+
+    if offline:
+        if cache is None:
+            raise FileNotFoundError(f"❌ 오프라인 모드이지만 항목코드 캐시가 없습니다: {cache_path}")
+        if verbose:
+            print(f"📦 오프라인 모드: 항목코드 캐시 사용 (리비전 {cache['revision']})")
+        return _cache_frame(cache)
+
+    age = time.time() - cache["fetched_at"] if cache else None
+    if cache is not None and not refresh and age < ttl_seconds:
+        if verbose:
+            print(f"📦 항목코드 캐시 사용 (리비전 {cache['revision']}, {age / 3600:.1f}시간 전 수집)")
+        return _cache_frame(cache)
+
+    try:
+        df = crawl_support_conditions_model(verbose=verbose)
+    except Exception as e:
+        if cache is None:
+            raise
+        print(f"⚠️ 크롤링 실패, 기존 항목코드 캐시를 사용합니다: {e}")
+        return _cache_frame(cache)
+
+    if df.empty:
+        # 페이지 구조가 바뀌어 아무것도 못 가져온 경우 빈 표를 캐시에 남기지 않음 (TTL 동안 설명이 모두 사라짐)
+        if cache is None:
+            raise ValueError("❌ 항목코드 크롤링 결과가 비어 있고 기존 캐시도 없습니다. (페이지 구조 변경 여부 확인)")
+        print("⚠️ 크롤링 결과가 비어 있어 기존 항목코드 캐시를 유지합니다.")
+        return _cache_frame(cache)
+
+    _write_cache(cache_path, df.to_dict(orient="records"), cache)
+    return df
@@ -1,17 +1,20 @@
 import os
-import json
 from dotenv import load_dotenv
-from langchain_community.vectorstores import FAISS
 
 from data_pipeline.gov24_data_pipeline import run_gov24_data_pipeline
-from modules.data_loader import detect_changes, convert_to_documents
-from modules.chunk_splitter import split_by_char, split_by_token
+from modules.index_manager import sync_faiss_index, open_record_store
+from modules.data_loader import load_items
+from data_pipeline.record_hashes import hash_manifest_path, load_hash_manifest
 from modules.upstage_embedding import UpstageEmbeddings
+from modules.embedding_cache import CachedEmbeddings
 from modules.llm_prompt import make_prompt, query_solar
+from modules.metadata_filter import load_filter_index, filtered_similarity_search
 # path 설정
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))   # c:\Users\jihu6\code\RAG\KJH 
-DATA_PATH = os.path.join(BASE_DIR, "data", "combined_service_data_merged.json")
-PREV_PATH = os.path.join(BASE_DIR, "data", "combined_service_data_merged_prev.json")
+DATA_PATH = os.path.join(BASE_DIR, "data", "combined_service_data_merged.parquet")
+INDEX_DIR = os.path.join(BASE_DIR, "faiss_index")
+EMBEDDING_CACHE_PATH = os.path.join(BASE_DIR, "data", "embedding_cache.sqlite")
+CONDITION_COLUMNS_PATH = os.path.join(BASE_DIR, "data", "supportConditions_columns.json")
 
 # 환경변수 가져오기
 env_path = os.path.join(BASE_DIR, ".env")
@@ -26,50 +29,37 @@ LANGSMITH_API_KEY = os.getenv("LANGSMITH_API_KEY")
 # data_pipeline 실행
 run_gov24_data_pipeline()
 
-# 🔹 JSON 로드 (new)
-with open(DATA_PATH, "r", encoding="utf-8") as f:
-    new_data = json.load(f)
+# 🔹 Parquet 로드 (문서 생성에 필요한 컬럼만 읽음)
+new_data = load_items(DATA_PATH)
 new_dict = {item["서비스ID"]: item for item in new_data}
 
-# 🔹 JSON 로드 (prev)
-if os.path.exists(PREV_PATH):
-    with open(PREV_PATH, "r", encoding="utf-8") as f:
-        prev_data = json.load(f)
-    prev_dict = {item["서비스ID"]: item for item in prev_data}
-else:
-    prev_data = []
-    prev_dict = {}
+# 🔹 파이프라인이 저장한 레코드별 해시 매니페스트 (변경 감지에 사용)
+record_hashes = load_hash_manifest(hash_manifest_path(DATA_PATH))
 
-# data 변환 확인
-added, updated, deleted = detect_changes(new_data=new_data, prev_data=prev_data)
-# 임베딩 객체 생성
-embedding = UpstageEmbeddings(api_key=UPSTAGE_API_KEY,api_url=UPSTAGE_API_URL,batch_size=64)
-
-if added or updated or deleted:
-    print("임베딩 업데이트 필요\n")
-    print(len(added),len(updated),len(deleted))
-    documents = convert_to_documents(new_data)
-    # 청크 분할
-    token_split_docs = split_by_char(documents=documents)
-
-    # FAISS 인덱스 생성 및 저장
-    db = FAISS.from_documents(token_split_docs, embedding)  # 문서 임베딩 후 FAISS 인덱스 생성
-    db.save_local("faiss_index")  # 인덱스를 로컬 디렉토리에 저장
-else:
-    print("수정사항이 없어 임베딩 과정을 건너 뛰었습니다.")
-
-# ✅ allow_dangerous_deserialization=True 추가
-db = FAISS.load_local(
-    "faiss_index",
-    embeddings=embedding,
-    allow_dangerous_deserialization=True  # ✅ Pickle 로드 허용
+# 임베딩 객체 생성 (한 번 임베딩한 텍스트는 디스크 캐시에서 재사용)
+embedding = CachedEmbeddings(
+    UpstageEmbeddings(api_key=UPSTAGE_API_KEY,api_url=UPSTAGE_API_URL,batch_size=64),
+    cache_path=EMBEDDING_CACHE_PATH
 )
 
+# 변경된 서비스만 반영해 FAISS 인덱스 갱신 (변경 없으면 기존 인덱스 로드)
+# 원본 레코드 저장소는 Parquet의 모든 컬럼으로 채움 (record_path)
+db = sync_faiss_index(new_data=new_data, embedding=embedding, index_dir=INDEX_DIR, record_hashes=record_hashes,
+                      record_path=DATA_PATH)
+# 원본 레코드 저장소 (검색 결과를 보여줄 때만 서비스ID로 조회)
+records = open_record_store(INDEX_DIR)
+# 조건 비트맵·대상연령 필터 인덱스 (검색 전에 조건에 맞는 청크만 고름)
+filter_index = load_filter_index(db, CONDITION_COLUMNS_PATH)
+
 # 질문 입력 받기
 query = input("💬 질문을 입력하세요: ")
 
 # 유사한 문서 찾기
-docs = db.similarity_search(query, k=3)
+# 질문 속 나이("25세")·조건명("여성")을 필터로 사용
+filters = filter_index.parse_query(query) if filter_index else {}
+if filters:
+    print(f"🔎 검색 필터: {filters}")
+docs = records.hydrate(filtered_similarity_search(db, filter_index, query, k=3, **filters))
 
 2# 🔍 유사 문서 + 조건 출력
 for i, doc in enumerate(docs):
@@ -77,7 +67,7 @@ for i, doc in enumerate(docs):
     # 🔸 문서 요약 (앞부분만 출력)
     print(doc.page_content[:500])
     # 🔸 조건 정보 출력
-    조건들 = doc.metadata.get("조건", {})
+    조건들 = doc.metadata["원본"].get("조건") or {}
     선택된_조건 = [k for k, v in 조건들.items() if v]    
     print(f"📌 조건 태그: {', '.join(선택된_조건) if 선택된_조건 else '조건 없음'}")
     print("-" * 50)
@@ -1,27 +1,51 @@
-import json
 import os
 from langchain.docstore.document import Document
+from data_pipeline.artifact_io import read_records
+from data_pipeline.record_hashes import build_hash_manifest, diff_hash_manifests
 
+# 문서 본문(page_content)에 들어가는 필드: 바뀌면 다시 임베딩해야 함
+EMBEDDING_FIELDS = [
+    "서비스명", "서비스목적", "지원대상", "지원내용", "신청방법", "신청기한",
+    "선정기준", "구비서류", "소관기관명", "문의처", "온라인신청사이트URL", "법령", "조건",
+]
+# 메타데이터(원본 레코드 저장소·태그)에만 들어가는 필드: 바뀌어도 임베딩 없이 메타데이터만 갱신
+METADATA_FIELDS = ["대상연령", "접수기관명", "수정일시", "조건비트"]
+# 청크 메타데이터에 들어가는 키 (바뀌면 인덱스 전체를 다시 빌드)
+DOCUMENT_METADATA_KEYS = ["서비스ID", "서비스명", "조건비트", "대상연령", "소관기관명"]
+# convert_to_documents가 사용하는 컬럼 (Parquet에서 이 컬럼만 읽음)
+DOCUMENT_COLUMNS = ["서비스ID", *EMBEDDING_FIELDS, *METADATA_FIELDS]
 
-def detect_changes(new_data, prev_data):
-    new_dict = {item["서비스ID"]: item for item in new_data}
-    prev_dict = {item["서비스ID"]: item for item in prev_data}
-
-    added, updated, deleted = [], [], []
-
-    for sid, item in new_dict.items():
-        if sid not in prev_dict:
-            added.append(item)
-        elif json.dumps(item, sort_keys=True, ensure_ascii=False) != json.dumps(prev_dict[sid], sort_keys=True, ensure_ascii=False):
-            updated.append(item)
 
-    for sid in prev_dict:
-        if sid not in new_dict:
-            deleted.append(prev_dict[sid])
+def detect_changes(new_data, prev_data):
+    """
+    두 데이터의 레코드별 해시 매니페스트를 비교해 추가/수정/삭제된 레코드를 반환합니다.
+    """
+    new_dict = {str(item["서비스ID"]): item for item in new_data}
+    prev_dict = {str(item["서비스ID"]): item for item in prev_data}
 
+    added_ids, deleted_ids, updated_fields = diff_hash_manifests(
+        build_hash_manifest(list(new_dict.values())), build_hash_manifest(list(prev_dict.values()))
+    )
+    added = [new_dict[sid] for sid in added_ids]
+    updated = [new_dict[sid] for sid in updated_fields]
+    deleted = [prev_dict[sid] for sid in deleted_ids]
     return added, updated, deleted
 
+def load_items(path, columns=DOCUMENT_COLUMNS):
+    """
+    파이프라인이 저장한 Parquet 아티팩트에서 필요한 컬럼만 읽어 레코드 리스트로 반환합니다.
+    columns=None이면 모든 컬럼을 읽습니다. (원본 레코드 저장소용) 파일이 없으면 빈 리스트를 반환합니다.
+    """
+    if not os.path.exists(path):
+        return []
+    return read_records(path, columns=columns)
+
 def convert_to_documents(items):
+    """
+    레코드를 Document로 변환합니다.
+    메타데이터에는 ID와 검색 필터용 간단한 태그(서비스명, 조건비트, 대상연령, 소관기관명)만 넣고,
+    원본 레코드는 RecordStore에서 필요할 때 읽습니다.
+    """
     documents = []
     for item in items:
         조건_태그 = [k for k, v in item.get("조건", {}).items() if v]
@@ -44,12 +68,7 @@ def convert_to_documents(items):
 
         doc = Document(
             page_content=content.strip(),
-            metadata={
-                "서비스ID": item.get("서비스ID"),
-                "서비스명": item.get("서비스명"),
-                "조건": item.get("조건", {}),
-                "원본": item
-            }
+            metadata={key: item.get(key) for key in DOCUMENT_METADATA_KEYS}
         )
         documents.append(doc)
 
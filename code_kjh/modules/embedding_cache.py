@@ -0,0 +1,169 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class EmbeddingCacheStore:
+    """
+    내용 해시 → 임베딩 벡터를 저장하는 SQLite 기반 디스크 캐시입니다.
+    전체 크기가 max_bytes를 넘으면 가장 오래 사용되지 않은 벡터부터 삭제합니다.
+    """
+    def __init__(self, path: str = "embedding_cache.sqlite", max_bytes: int = 2 * 1024 ** 3):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: List[str], chunk_size: int = 500) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), chunk_size):
+                chunk = keys[i:i + chunk_size]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update({key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows})
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((key, blob, len(blob), now))
+
+        with self._lock:
+            replaced = self._existing_size([row[0] for row in rows])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._total_bytes += sum(row[2] for row in rows) - replaced
+            self._evict()
+            self._conn.commit()
+
+    def _existing_size(self, keys: List[str], chunk_size: int = 500) -> int:
+        total = 0
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            total += self._conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM embeddings WHERE key IN ({placeholders})", chunk
+            ).fetchone()[0]
+        return total
+
+    def _evict(self) -> None:
+        if self._total_bytes <= self.max_bytes:
+            return
+        excess = self._total_bytes - self.max_bytes
+        cursor = self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_used")
+        to_delete, freed = [], 0
+        for key, size in cursor:
+            if freed >= excess:
+                break
+            to_delete.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", to_delete)
+        self._total_bytes -= freed
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    임의의 Embeddings(OpenAIEmbeddings, UpstageEmbeddings 등)를 감싸 (모델명 + 텍스트) 해시로 결과를 캐시합니다.
+    인덱스를 다시 만들 때 한 번도 임베딩하지 않은 텍스트만 API를 호출합니다.
+    """
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache_path: str = "embedding_cache.sqlite",
+        namespace: Optional[str] = None,
+        max_bytes: int = 2 * 1024 ** 3
+    ):
+        self.embeddings = embeddings
+        self.namespace = namespace or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.store = EmbeddingCacheStore(cache_path, max_bytes=max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model(self) -> str:
+        return self.namespace
+
+    def _key(self, text: str, kind: str = "document") -> str:
+        # 질문/문서 임베딩 모델이 다른 경우(Upstage embedding-query / embedding-passage 등)가 있으므로 호출 종류를 키에 포함
+        # 문서 키는 예전 형식을 유지해 이미 쌓인 코퍼스 캐시를 그대로 사용
+        prefix = self.namespace if kind == "document" else f"{self.namespace}\x00{kind}"
+        return hashlib.sha256(f"{prefix}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, texts: List[str], kind: str = "document"):
+        keys = [self._key(text, kind) for text in texts]
+        vectors = self.store.get_many(list(dict.fromkeys(keys)))
+
+        # 캐시에 없는 텍스트만 (중복 제거 후) 원래 임베딩 모델로 계산
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return keys, vectors, missing
+
+    def _store(self, vectors: dict, missing: dict, new_vectors) -> None:
+        new_items = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, new_vectors)}
+        self.store.put_many(new_items)
+        vectors.update(new_items)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._lookup(texts)
+        if missing:
+            self._store(vectors, missing, self.embeddings.embed_documents(list(missing.values())))
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, vectors, missing = self._lookup([text], kind="query")
+        if missing:
+            self._store(vectors, missing, [self.embeddings.embed_query(text)])
+        return vectors[keys[0]].tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._lookup(texts)
+        if missing:
+            self._store(vectors, missing, await self.embeddings.aembed_documents(list(missing.values())))
+        return [vectors[key].tolist() for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, vectors, missing = self._lookup([text], kind="query")
+        if missing:
+            self._store(vectors, missing, [await self.embeddings.aembed_query(text)])
+        return vectors[keys[0]].tolist()
@@ -0,0 +1,314 @@
+import hashlib
+import json
+import os
+import tempfile
+import faiss
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+from modules.data_loader import convert_to_documents, load_items, EMBEDDING_FIELDS, METADATA_FIELDS, DOCUMENT_METADATA_KEYS
+from modules.chunk_splitter import split_by_char
+from modules.record_store import RecordStore
+from data_pipeline.record_hashes import build_hash_manifest, subset_hashes
+
+MANIFEST_NAME = "manifest.json"
+INDEX_NAME = "index.faiss"
+SHARED_INDEX_NAME = "index_shared.faiss"  # 여러 프로세스가 mmap으로 공유하는 검색 전용 사본
+SHARED_SOURCE_NAME = "index_shared.source"  # 공유 사본을 만든 원본 인덱스의 해시 (바뀐 경우만 다시 씀)
+DOCSTORE_NAME = "docstore.jsonl"      # 청크 ID·본문·메타데이터 (pickle 대신 JSON Lines)
+RECORDS_NAME = "records.sqlite"       # 서비스ID → 원본 레코드
+
+
+def compute_service_hashes(items, record_hashes=None) -> dict:
+    """
+    서비스ID별로 임베딩 대상 필드의 해시, 메타데이터 필드의 해시, 레코드 전체 해시를 계산합니다.
+    파이프라인이 저장한 해시 매니페스트(record_hashes)가 있으면 레코드를 다시 직렬화하지 않고 그것을 사용합니다.
+    (이 경우 레코드 해시는 아티팩트의 모든 컬럼 기준이므로, 원본 레코드 저장소만 갱신하면 되는 변경도 찾을 수 있음)
+
+    Returns:
+        dict: {서비스ID: {"embedding": 해시, "metadata": 해시, "record": 해시}}
+    """
+    manifest = record_hashes or build_hash_manifest(items, key="서비스ID")
+    hashes = subset_hashes(manifest, {"embedding": EMBEDDING_FIELDS, "metadata": METADATA_FIELDS})
+    for record_key, row in manifest["records"].items():
+        hashes[record_key]["record"] = row[0]
+    return hashes
+
+
+def load_manifest(index_dir: str):
+    path = os.path.join(index_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(index_dir: str, manifest: dict):
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def _replace_file(path: str, write):
+    """
+    path와 같은 폴더에 고유한 이름의 임시 파일을 만들어 write(임시 경로)로 쓴 뒤 원자적으로 교체합니다.
+    여러 프로세스가 동시에 저장해도 서로의 임시 파일을 덮어쓰지 않고, 읽는 쪽은 항상 완성된 파일만 봅니다.
+    """
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.",
+                                     suffix=".tmp", delete=False) as f:
+        tmp_path = f.name
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _to_shared_layout(index):
+    """
+    flat 인덱스를 리스트가 1개인 IVF로 옮깁니다. (검색 결과 동일)
+    faiss는 IVF의 inverted list만 mmap으로 읽을 수 있으므로, 이렇게 해야 벡터가 프로세스 메모리에 복사되지 않습니다.
+    """
+    index = faiss.downcast_index(index)
+    if not isinstance(index, faiss.IndexFlat):
+        return None
+    quantizer = faiss.IndexFlat(index.d, index.metric_type)
+    quantizer.add(np.zeros((1, index.d), dtype=np.float32))
+    shared = faiss.IndexIVFFlat(quantizer, index.d, 1, index.metric_type)
+    if index.ntotal:
+        shared.add(index.reconstruct_n(0, index.ntotal))
+    shared.make_direct_map()
+    return shared
+
+
+def _write_shared_index(index, index_dir: str) -> bool:
+    shared_path = os.path.join(index_dir, SHARED_INDEX_NAME)
+    source_path = os.path.join(index_dir, SHARED_SOURCE_NAME)
+    if not isinstance(faiss.downcast_index(index), faiss.IndexFlat):
+        for path in (shared_path, source_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return False
+
+    # 원본 인덱스가 그대로면 공유 사본을 다시 쓰지 않음 (다른 프로세스의 mmap 페이지 캐시 유지)
+    digest = hashlib.blake2b(faiss.serialize_index(index), digest_size=16).hexdigest()
+    if os.path.exists(shared_path) and os.path.exists(source_path):
+        with open(source_path, "r", encoding="utf-8") as f:
+            if f.read().strip() == digest:
+                return True
+
+    # 다른 프로세스가 읽는 중이거나 동시에 저장할 수 있으므로 고유한 임시 파일에 쓰고 교체
+    shared = _to_shared_layout(index)
+    _replace_file(shared_path, lambda tmp_path: faiss.write_index(shared, tmp_path))
+
+    def write_digest(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(digest)
+    _replace_file(source_path, write_digest)
+    return True
+
+
+def save_index(db: FAISS, index_dir: str):
+    """
+    FAISS 인덱스를 pickle 없이 저장합니다. (index.faiss + docstore.jsonl, 한 줄에 청크 하나를 인덱스 순서대로)
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    _replace_file(os.path.join(index_dir, INDEX_NAME), lambda tmp_path: faiss.write_index(db.index, tmp_path))
+
+    def write_docstore(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for _, doc_id in sorted(db.index_to_docstore_id.items()):
+                doc = db.docstore.search(doc_id)
+                f.write(json.dumps({"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata},
+                                   ensure_ascii=False) + "\n")
+    _replace_file(os.path.join(index_dir, DOCSTORE_NAME), write_docstore)
+    _write_shared_index(db.index, index_dir)
+
+    legacy_path = os.path.join(index_dir, "index.pkl")
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+
+def _read_faiss_index(index_dir: str, mmap: bool):
+    if not mmap:
+        return faiss.read_index(os.path.join(index_dir, INDEX_NAME))
+    shared_path = os.path.join(index_dir, SHARED_INDEX_NAME)
+    if not os.path.exists(shared_path) and not _write_shared_index(faiss.read_index(os.path.join(index_dir, INDEX_NAME)), index_dir):
+        return faiss.read_index(os.path.join(index_dir, INDEX_NAME))
+    return faiss.read_index(shared_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+
+
+def load_index(index_dir: str, embedding, mmap: bool = False) -> FAISS:
+    """
+    save_index로 저장한 인덱스를 불러옵니다. docstore.jsonl이 없으면 이전 형식(index.pkl)으로 읽습니다.
+    mmap=True이면 벡터를 읽기 전용 메모리 맵으로 열어, 같은 서버의 여러 프로세스가 OS 페이지 캐시를 공유합니다.
+    (검색 전용: 이렇게 연 인덱스에는 문서를 추가/삭제할 수 없음)
+    """
+    docstore_path = os.path.join(index_dir, DOCSTORE_NAME)
+    if not os.path.exists(docstore_path):
+        return FAISS.load_local(index_dir, embeddings=embedding, allow_dangerous_deserialization=True)
+
+    docs, index_to_docstore_id = {}, {}
+    with open(docstore_path, "r", encoding="utf-8") as f:
+        for position, line in enumerate(f):
+            row = json.loads(line)
+            docs[row["id"]] = Document(page_content=row["page_content"], metadata=row["metadata"])
+            index_to_docstore_id[position] = row["id"]
+    return FAISS(
+        embedding_function=embedding,
+        index=_read_faiss_index(index_dir, mmap),
+        docstore=InMemoryDocstore(docs),
+        index_to_docstore_id=index_to_docstore_id,
+    )
+
+
+def open_record_store(index_dir: str) -> RecordStore:
+    """검색 결과에 원본 레코드를 붙일 때(RecordStore.hydrate) 사용하는 저장소를 엽니다."""
+    return RecordStore(os.path.join(index_dir, RECORDS_NAME))
+
+
+def _full_records(record_path, new_data, service_ids=None):
+    """
+    원본 레코드 저장소에 넣을 레코드입니다. record_path(Parquet 아티팩트)가 있으면 모든 컬럼을 읽고,
+    없으면 문서 생성용으로 읽은 new_data를 그대로 사용합니다. service_ids를 주면 해당 서비스만 반환합니다.
+    """
+    items = load_items(record_path, columns=None) if record_path else new_data
+    if service_ids is None:
+        return items
+    wanted = set(service_ids)
+    return [item for item in items if str(item["서비스ID"]) in wanted]
+
+
+def split_with_ids(items, chunk_size: int = 800, chunk_overlap: int = 100):
+    """
+    레코드를 청크로 나누고 `서비스ID#순번` 형태의 고정 청크 ID를 부여합니다.
+
+    Returns:
+        tuple: (청크 Document 리스트, 청크 ID 리스트)
+    """
+    chunks = split_by_char(convert_to_documents(items), chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    ids, counters = [], {}
+    for chunk in chunks:
+        sid = chunk.metadata.get("서비스ID")
+        counters[sid] = counters.get(sid, 0) + 1
+        ids.append(f"{sid}#{counters[sid] - 1}")
+    return chunks, ids
+
+
+def _group_ids_by_service(chunks, ids) -> dict:
+    grouped = {}
+    for chunk, chunk_id in zip(chunks, ids):
+        grouped.setdefault(str(chunk.metadata.get("서비스ID")), []).append(chunk_id)
+    return grouped
+
+
+def _refresh_metadata(db: FAISS, items, chunk_size: int, chunk_overlap: int):
+    # 본문이 같으면 청크와 청크 ID도 같으므로, 임베딩 없이 docstore의 Document만 교체
+    chunks, ids = split_with_ids(items, chunk_size, chunk_overlap)
+    if ids:
+        db.docstore.delete(ids)
+        db.docstore.add(dict(zip(ids, chunks)))
+
+
+def sync_faiss_index(new_data, embedding, index_dir: str = "faiss_index",
+                     chunk_size: int = 800, chunk_overlap: int = 100, record_hashes=None, mmap: bool = False,
+                     record_path: str = None) -> FAISS:
+    """
+    빌드 매니페스트(서비스별 해시, 임베딩 모델, 청크 설정)를 기준으로 FAISS 인덱스를 최신 상태로 맞춥니다.
+
+    - 서비스별 해시가 모두 같으면 기존 인덱스를 그대로 로드합니다. (재임베딩 없음)
+    - 임베딩 대상 필드(EMBEDDING_FIELDS)가 바뀐 서비스와 삭제된 서비스의 청크만 지우고,
+      추가되거나 본문이 바뀐 서비스의 청크만 임베딩해 추가합니다.
+    - 메타데이터 필드(METADATA_FIELDS)만 바뀐 서비스는 임베딩 없이 docstore의 메타데이터만 갱신합니다.
+    - 그 외(인덱스 없음, 임베딩 모델/청크 설정/docstore 형식·메타데이터 키 변경)에는 전체를 다시 빌드합니다.
+
+    원본 레코드는 docstore 대신 index_dir의 RecordStore(records.sqlite)에 서비스ID 기준으로 함께 동기화합니다.
+    new_data는 문서 생성에 필요한 컬럼만 읽은 레코드이므로, record_path에 Parquet 아티팩트 경로를 넘기면
+    저장소는 모든 컬럼을 담은 레코드로 채웁니다. (임베딩·메타데이터 외 컬럼만 바뀐 서비스는 저장소만 갱신)
+
+    record_hashes에는 파이프라인이 아티팩트 옆에 저장한 해시 매니페스트(<이름>.hashes.json)를 넘길 수 있습니다.
+    mmap=True이면 갱신을 마친 뒤 검색 전용 mmap 인덱스(load_index 참고)를 반환합니다.
+
+    Returns:
+        FAISS: 최신 데이터가 반영된 벡터 DB
+    """
+    settings = {
+        "embedding_model": getattr(embedding, "model", None) or type(embedding).__name__,
+        "chunker": {"type": "split_by_char", "chunk_size": chunk_size, "chunk_overlap": chunk_overlap},
+        # 메타데이터에 원본 레코드를 넣던 이전 인덱스(index.pkl)는 전체를 다시 빌드
+        "docstore": {"format": DOCSTORE_NAME, "records": RECORDS_NAME, "metadata": DOCUMENT_METADATA_KEYS},
+    }
+    service_hashes = compute_service_hashes(new_data, record_hashes)
+    manifest = load_manifest(index_dir)
+    index_exists = os.path.exists(os.path.join(index_dir, INDEX_NAME))
+    records = open_record_store(index_dir)
+    reusable = (index_exists and manifest is not None and "services" in manifest
+                and all(manifest.get(k) == v for k, v in settings.items()))
+
+    if reusable:
+        prev_hashes = manifest["services"]
+        added = [sid for sid in service_hashes if sid not in prev_hashes]
+        deleted = [sid for sid in prev_hashes if sid not in service_hashes]
+        embedding_changed = [sid for sid, h in service_hashes.items()
+                             if sid in prev_hashes and prev_hashes[sid]["embedding"] != h["embedding"]]
+        metadata_changed = [sid for sid, h in service_hashes.items()
+                            if sid in prev_hashes and prev_hashes[sid]["embedding"] == h["embedding"]
+                            and prev_hashes[sid]["metadata"] != h["metadata"]]
+        # 인덱스와 무관한 컬럼만 바뀐 서비스 (원본 레코드 저장소만 갱신)
+        record_changed = [sid for sid, h in service_hashes.items()
+                          if sid in prev_hashes and prev_hashes[sid]["embedding"] == h["embedding"]
+                          and prev_hashes[sid]["metadata"] == h["metadata"]
+                          and prev_hashes[sid].get("record") != h["record"]]
+
+        if not (added or deleted or embedding_changed or metadata_changed):
+            print("수정사항이 없어 임베딩 과정을 건너 뛰었습니다.")
+            if len(records) != len(service_hashes):
+                # 레코드 저장소만 지워졌거나 어긋난 경우 다시 채움 (임베딩 불필요)
+                records.replace_all(_full_records(record_path, new_data))
+            elif record_changed:
+                records.upsert(_full_records(record_path, new_data, record_changed))
+            records.close()
+            if record_changed:
+                save_manifest(index_dir, {**manifest, "services": service_hashes})
+            return load_index(index_dir, embedding, mmap=mmap)
+
+        print(f"🔁 증분 인덱싱: 추가 {len(added)} / 본문 수정 {len(embedding_changed)} / "
+              f"메타데이터만 수정 {len(metadata_changed)} / 삭제 {len(deleted)}")
+
+        db = load_index(index_dir, embedding)
+        service_chunks = manifest["chunks"]
+        items_by_id = {str(item["서비스ID"]): item for item in new_data}
+
+        stale_ids = []
+        for sid in embedding_changed + deleted:
+            stale_ids.extend(service_chunks.pop(sid, []))
+        if stale_ids:
+            db.delete(stale_ids)
+
+        chunks, ids = split_with_ids([items_by_id[sid] for sid in added + embedding_changed if sid in items_by_id], chunk_size, chunk_overlap)
+        if chunks:
+            db.add_documents(chunks, ids=ids)
+        service_chunks.update(_group_ids_by_service(chunks, ids))
+
+        _refresh_metadata(db, [items_by_id[sid] for sid in metadata_changed if sid in items_by_id], chunk_size, chunk_overlap)
+
+        records.delete(deleted)
+        records.upsert(_full_records(record_path, new_data, added + embedding_changed + metadata_changed + record_changed))
+    else:
+        print("🧱 전체 인덱스 빌드")
+        chunks, ids = split_with_ids(new_data, chunk_size, chunk_overlap)
+        db = FAISS.from_documents(chunks, embedding, ids=ids)
+        service_chunks = _group_ids_by_service(chunks, ids)
+        records.replace_all(_full_records(record_path, new_data))
+
+    records.close()
+    save_index(db, index_dir)
+    save_manifest(index_dir, {**settings, "services": service_hashes, "chunks": service_chunks})
+    if mmap:
+        # 갱신에 쓴 메모리 사본 대신 프로세스 간 공유되는 읽기 전용 인덱스를 반환
+        return load_index(index_dir, embedding, mmap=True)
+    return db
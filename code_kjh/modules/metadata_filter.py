@@ -0,0 +1,147 @@
+import os
+import re
+from typing import Dict, List, Optional
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from data_pipeline.condition_bits import load_condition_columns
+
+# 같은 그룹의 조건을 하나도 표시하지 않은 서비스는 그 그룹에 제한이 없는 것으로 봄 (예: 성별 무관)
+CONDITION_GROUPS = {
+    "성별": ["남성", "여성"],
+}
+# 대상연령이 비어 있는 서비스는 연령 제한이 없는 것으로 봄
+MAX_AGE = 200
+AGE_PATTERN = re.compile(r"(\d{1,3})\s*세")
+
+
+class MetadataFilterIndex:
+    """
+    청크(FAISS 위치)별 조건 비트맵, 대상연령 구간, 소관기관 코드를 모아 둔 필터 인덱스입니다.
+    필터 결과는 FAISS IDSelectorBitmap으로 넘겨, 상위 k개를 뽑은 뒤 거르는 대신 조건에 맞는 청크 안에서만 검색합니다.
+    """
+    def __init__(self, condition_names: List[str], condition_bits: np.ndarray,
+                 age_start: np.ndarray, age_end: np.ndarray, agency_codes: np.ndarray, agency_names: List[str]):
+        self.condition_names = list(condition_names)
+        self._condition_positions = {name: i for i, name in enumerate(self.condition_names)}
+        self.condition_bits = condition_bits    # (청크 수 × 바이트 수) packbits 행렬
+        self.age_start = age_start
+        self.age_end = age_end
+        self.agency_codes = agency_codes
+        self.agency_names = agency_names
+
+    def __len__(self):
+        return len(self.age_start)
+
+    @classmethod
+    def from_vectorstore(cls, db: FAISS, condition_names: List[str]) -> "MetadataFilterIndex":
+        """docstore 메타데이터(조건비트, 대상연령, 소관기관명)를 FAISS 위치 순서대로 읽어 만듭니다."""
+        n_bytes = (len(condition_names) + 7) // 8
+        id_by_position = db.index_to_docstore_id
+        metadatas = [db.docstore.search(id_by_position[i]).metadata for i in range(len(id_by_position))]
+
+        bits = b"".join(
+            bytes.fromhex(meta.get("조건비트") or "").ljust(n_bytes, b"\x00")[:n_bytes] for meta in metadatas
+        )
+        condition_bits = np.frombuffer(bits, dtype=np.uint8).reshape(len(metadatas), n_bytes)
+
+        ages = [meta.get("대상연령") or {} for meta in metadatas]
+        age_start = np.array([age.get("시작") if age.get("시작") is not None else 0 for age in ages], dtype=np.int32)
+        age_end = np.array([age.get("종료") if age.get("종료") is not None else MAX_AGE for age in ages], dtype=np.int32)
+
+        agency_codes = {}
+        codes = np.array(
+            [agency_codes.setdefault(meta.get("소관기관명") or "", len(agency_codes)) for meta in metadatas], dtype=np.int32
+        )
+        agency_names = list(agency_codes)
+        return cls(condition_names, condition_bits, age_start, age_end, codes, agency_names)
+
+    def _has_condition(self, name: str) -> np.ndarray:
+        position = self._condition_positions[name]
+        # packbits는 바이트 안에서 앞쪽 조건이 상위 비트
+        return (self.condition_bits[:, position // 8] >> (7 - position % 8)) & 1 == 1
+
+    def mask(self, age: Optional[int] = None, conditions: Optional[List[str]] = None,
+             regions: Optional[List[str]] = None) -> np.ndarray:
+        """
+        조건에 맞는 청크를 True로 표시한 boolean 배열을 반환합니다.
+
+        Args:
+            age: 나이 (대상연령 구간에 포함되는 서비스만)
+            conditions: 조건명 목록 (모두 만족해야 함, CONDITION_GROUPS의 그룹을 아예 표시하지 않은 서비스는 통과)
+            regions: 지역명 목록 (소관기관명에 하나라도 포함되는 서비스만)
+        """
+        allowed = np.ones(len(self), dtype=bool)
+        if age is not None:
+            allowed &= (self.age_start <= age) & (age <= self.age_end)
+
+        for name in conditions or []:
+            if name not in self._condition_positions:
+                raise ValueError(f"알 수 없는 조건입니다: {name}")
+            satisfied = self._has_condition(name)
+            group = next((members for members in CONDITION_GROUPS.values() if name in members), None)
+            if group is not None:
+                unrestricted = ~np.any([self._has_condition(m) for m in group if m in self._condition_positions], axis=0)
+                satisfied |= unrestricted
+            allowed &= satisfied
+
+        if regions:
+            matching_codes = [code for code, agency in enumerate(self.agency_names)
+                              if any(region in agency for region in regions)]
+            allowed &= np.isin(self.agency_codes, matching_codes)
+        return allowed
+
+    def parse_query(self, query: str) -> Dict[str, object]:
+        """
+        질문에 들어 있는 나이("25세")와 조건명("여성")을 필터로 뽑습니다.
+        예: "25세 여성 주거지원" → {"age": 25, "conditions": ["여성"]}
+        """
+        filters = {}
+        age_match = AGE_PATTERN.search(query)
+        if age_match:
+            filters["age"] = int(age_match.group(1))
+        conditions = [name for name in self.condition_names if len(name) >= 2 and name in query]
+        if conditions:
+            filters["conditions"] = conditions
+        return filters
+
+
+def load_filter_index(db: FAISS, condition_columns_path: str) -> Optional[MetadataFilterIndex]:
+    """조건 컬럼 목록(supportConditions_columns.json)이 없으면 None (필터 없이 검색)"""
+    if not os.path.exists(condition_columns_path):
+        return None
+    return MetadataFilterIndex.from_vectorstore(db, load_condition_columns(condition_columns_path))
+
+
+def _search_parameters(index, allowed: np.ndarray):
+    bitmap = np.packbits(allowed, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(allowed), faiss.swig_ptr(bitmap))
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=base.nprobe)
+    elif isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    # selector는 bitmap 메모리를 참조만 하므로 검색이 끝날 때까지 함께 살려 둠
+    return params, (selector, bitmap)
+
+
+def filtered_similarity_search(db: FAISS, filter_index: Optional[MetadataFilterIndex], query: str, k: int = 3,
+                               age: Optional[int] = None, conditions: Optional[List[str]] = None,
+                               regions: Optional[List[str]] = None):
+    """
+    조건에 맞는 청크만 대상으로 유사도 검색을 합니다. (필터가 없으면 db.similarity_search와 같음)
+    """
+    if filter_index is None or (age is None and not conditions and not regions):
+        return db.similarity_search(query, k=k)
+
+    allowed = filter_index.mask(age=age, conditions=conditions, regions=regions)
+    if not allowed.any():
+        return []
+    vector = np.array([db._embed_query(query)], dtype=np.float32)
+    if db._normalize_L2:
+        vector = vector / np.linalg.norm(vector, axis=1, keepdims=True)
+    params, _keepalive = _search_parameters(db.index, allowed)
+    _, indices = db.index.search(vector, k, params=params)
+    return [db.docstore.search(db.index_to_docstore_id[int(i)]) for i in indices[0] if i != -1]
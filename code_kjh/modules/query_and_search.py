@@ -1,7 +1,7 @@
-from langchain.vectorstores import FAISS
+from modules.index_manager import load_index
 
 def load_faiss_index(embedding, path="faiss_index"):
-    return FAISS.load_local(path, embeddings=embedding, allow_dangerous_deserialization=True)
+    return load_index(path, embedding)
 
 def search_similar_documents(db, query, k=3):
     docs = db.similarity_search(query, k=k)
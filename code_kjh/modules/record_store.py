@@ -0,0 +1,81 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List
+from langchain.docstore.document import Document
+
+
+def _json_default(value):
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+class RecordStore:
+    """
+    서비스ID → 원본 레코드(JSON)를 저장하는 SQLite 기반 사이드 스토어입니다.
+    FAISS docstore에는 ID와 간단한 태그만 두고, 원본 레코드는 검색 결과를 보여줄 때만 여기서 읽습니다.
+    """
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS records (service_id TEXT PRIMARY KEY, record TEXT NOT NULL)")
+        self._conn.commit()
+
+    def upsert(self, items) -> None:
+        rows = [(str(item["서비스ID"]), json.dumps(item, ensure_ascii=False, default=_json_default)) for item in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO records (service_id, record) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def replace_all(self, items) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM records")
+            self._conn.commit()
+        self.upsert(items)
+
+    def delete(self, service_ids: List[str]) -> None:
+        if not service_ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM records WHERE service_id = ?", [(str(sid),) for sid in service_ids])
+            self._conn.commit()
+
+    def get_many(self, service_ids: List[str], chunk_size: int = 500) -> Dict[str, dict]:
+        keys = list(dict.fromkeys(str(sid) for sid in service_ids))
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), chunk_size):
+                chunk = keys[i:i + chunk_size]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT service_id, record FROM records WHERE service_id IN ({placeholders})", chunk
+                ).fetchall()
+                found.update({sid: json.loads(record) for sid, record in rows})
+        return found
+
+    def hydrate(self, docs: List[Document]) -> List[Document]:
+        """
+        검색 결과 Document에 원본 레코드를 붙인 사본을 반환합니다. (metadata["원본"])
+        """
+        records = self.get_many([doc.metadata.get("서비스ID") for doc in docs])
+        return [
+            Document(
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "원본": records.get(str(doc.metadata.get("서비스ID")), {})}
+            )
+            for doc in docs
+        ]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
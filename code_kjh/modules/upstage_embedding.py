@@ -1,35 +1,216 @@
-import requests
+import asyncio
+import contextlib
+import random
+import threading
 import time
-from typing import List
+from typing import List, Optional
+import requests
+from requests.adapters import HTTPAdapter
 from langchain.vectorstores import FAISS
 from langchain_core.embeddings import Embeddings
+from modules.index_manager import save_index
 
 class UpstageEmbeddings(Embeddings):
-    def __init__(self, api_key: str, api_url: str, batch_size: int = 64):
+    def __init__(
+        self,
+        api_key: str,
+        api_url: str,
+        batch_size: int = 64,
+        model: str = "embedding-query",
+        max_batch_tokens: int = 100_000,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        timeout: float = 60
+    ):
         self.api_key = api_key
         self.api_url = api_url
         self.batch_size = batch_size
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
 
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        headers = {
+        # 429 응답을 받으면 줄어들고, 성공할 때마다 batch_size까지 다시 늘어나는 현재 배치 크기
+        self._current_batch_size = batch_size
+        self._batch_lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._async_session = None
+        self._async_loop = None
+
+    @property
+    def headers(self) -> dict:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
 
+    @property
+    def session(self) -> requests.Session:
+        # keep-alive 연결을 재사용하도록 세션은 한 번만 생성
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(self.headers)
+            self._session = session
+        return self._session
+
+    # ---------- 적응형 배치 ----------
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        # 한국어는 대략 한 글자당 1토큰 이하이므로 글자 수를 보수적인 추정치로 사용
+        return len(text)
+
+    def _next_batch_end(self, texts: List[str], start: int) -> int:
+        """현재 배치 크기와 토큰 한도를 모두 넘지 않는 범위에서 배치 끝 위치를 정합니다."""
+        end, tokens = start, 0
+        while end < len(texts) and end - start < self._current_batch_size:
+            tokens += self._estimate_tokens(texts[end])
+            if end > start and tokens > self.max_batch_tokens:
+                break
+            end += 1
+        return end
+
+    def _split_batches(self, texts: List[str]) -> List[List[str]]:
+        batches, start = [], 0
+        while start < len(texts):
+            end = self._next_batch_end(texts, start)
+            batches.append(texts[start:end])
+            start = end
+        return batches
+
+    def _on_rate_limited(self):
+        with self._batch_lock:
+            self._current_batch_size = max(1, self._current_batch_size // 2)
+
+    def _on_success(self):
+        with self._batch_lock:
+            self._current_batch_size = min(self.batch_size, self._current_batch_size + 1)
+
+    @staticmethod
+    def _retry_delay(retry_after: Optional[str], attempt: int) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(30.0, 2 ** attempt) * (0.5 + random.random() / 2)
+
+    def _payload(self, texts: List[str]) -> dict:
+        return {"input": texts, "model": self.model}
+
+    @staticmethod
+    def _parse(result: dict) -> List[List[float]]:
+        return [item["embedding"] for item in sorted(result["data"], key=lambda x: x.get("index", 0))]
+
+    # ---------- 동기 API ----------
+    def _embed_batch(self, texts: List[str], attempt: int = 0) -> List[List[float]]:
+        response = self.session.post(self.api_url, json=self._payload(texts), timeout=self.timeout)
+        if response.status_code == 429 and attempt < self.max_retries:
+            self._on_rate_limited()
+            time.sleep(self._retry_delay(response.headers.get("Retry-After"), attempt))
+            if len(texts) > self._current_batch_size:
+                # 줄어든 배치 크기에 맞게 나눠서 재시도
+                return [
+                    embedding
+                    for part in self._split_batches(texts)
+                    for embedding in self._embed_batch(part, attempt + 1)
+                ]
+            return self._embed_batch(texts, attempt + 1)
+
+        response.raise_for_status()
+        self._on_success()
+        return self._parse(response.json())
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
         all_embeddings = []
-        for i in range(0, len(texts), self.batch_size):
-            batch = texts[i:i + self.batch_size]
-            payload = {"input": batch, "model": "embedding-query"}
-            response = requests.post(self.api_url, headers=headers, json=payload)
-            response.raise_for_status()
-            result = response.json()
-            all_embeddings.extend([item["embedding"] for item in result["data"]])
-            time.sleep(0.1)
+        start = 0
+        while start < len(texts):
+            end = self._next_batch_end(texts, start)
+            all_embeddings.extend(self._embed_batch(texts[start:end]))
+            start = end
         return all_embeddings
 
     def embed_query(self, text: str) -> List[float]:
-        return self.embed_documents([text])[0]
+        return self._embed_batch([text])[0]
+
+    # ---------- 비동기 API ----------
+    def _new_async_session(self):
+        import aiohttp
+
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+
+    @contextlib.asynccontextmanager
+    async def _async_session_scope(self):
+        """
+        현재 이벤트 루프에서 사용할 aiohttp 세션입니다.
+        `async with embeddings:`로 같은 루프에 열어 둔 세션이 있으면 재사용하고, 없으면 이번 호출 동안만 쓰는 세션을 만들어
+        끝날 때 닫습니다. (asyncio.run을 여러 번 호출해 루프가 바뀌어도 닫히지 않은 세션이 남지 않음)
+        """
+        if (self._async_session is not None and not self._async_session.closed
+                and self._async_loop is asyncio.get_running_loop()):
+            yield self._async_session
+            return
+        async with self._new_async_session() as session:
+            yield session
+
+    async def __aenter__(self):
+        # 여러 번 호출하는 동안 keep-alive 연결을 재사용하도록 현재 루프에 세션을 열어 둠
+        loop = asyncio.get_running_loop()
+        if self._async_session is None or self._async_session.closed or self._async_loop is not loop:
+            self._async_session = self._new_async_session()
+            self._async_loop = loop
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _aembed_batch(self, texts: List[str], semaphore: asyncio.Semaphore, session,
+                            attempt: int = 0) -> List[List[float]]:
+        async with semaphore:
+            async with session.post(self.api_url, json=self._payload(texts)) as response:
+                if response.status == 429 and attempt < self.max_retries:
+                    self._on_rate_limited()
+                    delay = self._retry_delay(response.headers.get("Retry-After"), attempt)
+                else:
+                    response.raise_for_status()
+                    result = await response.json(content_type=None)
+                    self._on_success()
+                    return self._parse(result)
+
+        # 대기 중에는 세마포어를 놓아 다른 배치가 진행될 수 있게 함
+        await asyncio.sleep(delay)
+        if len(texts) > self._current_batch_size:
+            parts = await asyncio.gather(
+                *(self._aembed_batch(part, semaphore, session, attempt + 1) for part in self._split_batches(texts))
+            )
+            return [embedding for part in parts for embedding in part]
+        return await self._aembed_batch(texts, semaphore, session, attempt + 1)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._async_session_scope() as session:
+            results = await asyncio.gather(
+                *(self._aembed_batch(batch, semaphore, session) for batch in self._split_batches(texts))
+            )
+        return [embedding for batch in results for embedding in batch]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        semaphore = asyncio.Semaphore(1)
+        async with self._async_session_scope() as session:
+            return (await self._aembed_batch([text], semaphore, session))[0]
+
+    async def aclose(self):
+        session, self._async_session, self._async_loop = self._async_session, None, None
+        if session is not None and not session.closed:
+            await session.close()
 
 def save_faiss_index(documents, embedding, index_path="faiss_index"):
     db = FAISS.from_documents(documents, embedding)
-    db.save_local(index_path)
+    save_index(db, index_path)
@@ -0,0 +1,135 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import numpy as np
+from region_shards import RegionShardIndex
+
+# 나이·소득 구간·연도 등 질문의 숫자 조건
+NUMBER_PATTERN = re.compile(r"\d+")
+# 샤드 색인이 없을 때 시/도 이름만으로 지역을 찾는 빈 색인
+_PROVINCES_ONLY = RegionShardIndex()
+
+
+def question_scope(question: str, region_shards: Optional[RegionShardIndex] = None) -> tuple:
+    """
+    질문의 지역(시/도, 시/군/구)과 숫자(나이 등) 조건입니다. 의미 유사도 캐시는 이 값이 같은 질문끼리만 재사용합니다.
+    ("서울 청년 주거지원"과 "부산 청년 주거지원"은 임베딩 유사도가 0.95를 넘기 쉬워도 답변이 달라야 함)
+    """
+    text = unicodedata.normalize("NFKC", question)
+    regions = (region_shards or _PROVINCES_ONLY).mentioned_regions(text)
+    return tuple(regions), tuple(sorted(NUMBER_PATTERN.findall(text)))
+
+
+class AnswerCache:
+    """
+    질문 → 답변 캐시입니다. 두 단계로 조회합니다.
+    1) 정규화한 질문 문자열이 같으면 바로 반환 (임베딩 호출도 생략)
+    2) 질문 임베딩의 코사인 유사도가 similarity_threshold 이상이고 scope(question_scope: 지역·나이 등)가 같은
+       질문이 있으면 그 답변을 반환
+
+    항목은 TTL이 지나면 만료되고, max_size를 넘으면 가장 오래 사용하지 않은 항목부터 삭제합니다.
+    인덱스 버전이 바뀌면 (벡터스토어 재생성) 캐시 전체를 비웁니다.
+    """
+    def __init__(self, max_size: int = 1000, ttl_seconds: float = 60 * 60 * 24, similarity_threshold: float = 0.95):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.index_version: Optional[str] = None
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self._matrix_scopes: List[Any] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        # 전각/반각 통일, 소문자화, 공백·문장부호 제거 ("청년 월세 지원?" == "청년월세지원")
+        text = unicodedata.normalize("NFKC", question).lower()
+        return re.sub(r"[\W_]+", "", text)
+
+    def _sync_version(self, index_version: Optional[str]) -> None:
+        if index_version != self.index_version:
+            self._entries.clear()
+            self._matrix = None
+            self.index_version = index_version
+
+    def _expire(self) -> None:
+        now = time.time()
+        expired = [key for key, entry in self._entries.items() if now - entry["created_at"] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def get(self, question: str, index_version: Optional[str] = None) -> Optional[Any]:
+        """정규화한 질문이 정확히 일치하는 항목을 찾습니다. 없으면 None (miss 집계는 get_similar에서)"""
+        key = self.normalize(question)
+        with self._lock:
+            self._sync_version(index_version)
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            return entry["value"]
+
+    def get_similar(self, query_embedding, index_version: Optional[str] = None, scope: Any = None) -> Optional[Any]:
+        """임베딩이 비슷하고 scope가 같은 질문의 답변을 찾습니다. (지역·나이가 다른 질문의 답변은 돌려주지 않음)"""
+        with self._lock:
+            self._sync_version(index_version)
+            self._expire()
+            if not self._entries:
+                self.stats["misses"] += 1
+                return None
+
+            if self._matrix is None:
+                self._matrix_keys = list(self._entries)
+                self._matrix_scopes = [self._entries[key]["scope"] for key in self._matrix_keys]
+                self._matrix = np.vstack([self._entries[key]["embedding"] for key in self._matrix_keys])
+
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            similarities = self._matrix @ query
+            similarities[[entry_scope != scope for entry_scope in self._matrix_scopes]] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.stats["misses"] += 1
+                return None
+
+            key = self._matrix_keys[best]
+            self._entries.move_to_end(key)
+            self.stats["semantic_hits"] += 1
+            return self._entries[key]["value"]
+
+    def put(self, question: str, value: Any, query_embedding, index_version: Optional[str] = None,
+            scope: Any = None) -> None:
+        embedding = np.asarray(query_embedding, dtype=np.float32)
+        embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+        with self._lock:
+            self._sync_version(index_version)
+            key = self.normalize(question)
+            self._entries[key] = {"value": value, "embedding": embedding, "scope": scope, "created_at": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
@@ -0,0 +1,27 @@
+# answer_cache_test.py
+# 실행: code_shim 폴더에서 `python -m pytest answer_cache_test.py` 또는 `python answer_cache_test.py`
+import numpy as np
+from answer_cache import AnswerCache, question_scope
+from region_shards import RegionShardIndex
+
+def make_shards() -> RegionShardIndex:
+    shards = RegionShardIndex()
+    shards.add([["경기도 의정부시", ""], ["경기도 수원시", ""], ["서울특별시 강남구", ""]])
+    shards.build()
+    return shards
+
+def test_semantic_hit_requires_same_scope():
+    # 임베딩이 같아도 지역·나이가 다른 질문에는 캐시된 답변을 돌려주지 않음
+    shards = make_shards()
+    cache, embedding = AnswerCache(), np.ones(8)
+    for question in ["서울 청년 주거지원", "의정부 청년 월세", "25세 청년 월세"]:
+        cache.put(question, question, embedding, scope=question_scope(question, shards))
+    assert cache.get_similar(embedding, scope=question_scope("부산 청년 주거지원", shards)) is None
+    assert cache.get_similar(embedding, scope=question_scope("수원 청년 월세", shards)) is None
+    assert cache.get_similar(embedding, scope=question_scope("30세 청년 월세", shards)) is None
+    assert cache.get_similar(embedding, scope=question_scope("서울 청년 주거 지원은?", shards)) == "서울 청년 주거지원"
+    assert cache.get_similar(embedding, scope=question_scope("의정부시 청년 월세", shards)) == "의정부 청년 월세"
+
+if __name__ == "__main__":
+    test_semantic_hit_requires_same_scope()
+    print("✅ 답변 캐시 테스트 통과")
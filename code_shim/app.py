@@ -6,38 +6,59 @@ from vectorstore import VectorStoreManager
 from llm import GovPolicyLLM
 from prompt import GovPolicyPrompt, MarkdownFormatter
 from gov_policy_qa import GovPolicyQA
+from answer_cache import AnswerCache
 from chat_history import ChatHistory
 from logger import Logger
-from grounding_checker import VectorstoreGroundingChecker
+from grounding_checker import SentenceGroundingChecker
+from embedding_cache import CachedEmbeddings
 from langchain_openai import OpenAIEmbeddings
 
 # 페이지 설정
 st.set_page_config(page_title="정부 정책 챗봇", layout="wide")
 st.title("🇰🇷 정부 지원 정책 질문 챗봇")
 
-# 세션 상태 초기화
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = ChatHistory()
+# 답변 캐시는 모든 세션이 공유
+@st.cache_resource
+def get_answer_cache() -> AnswerCache:
+    return AnswerCache()
 
-if "qa_system" not in st.session_state:
+# 인덱스·임베딩·LLM·QA 시스템은 프로세스당 한 번만 만들어 모든 세션이 공유
+# 인덱스는 읽기 전용 mmap으로 열어 같은 서버의 여러 Streamlit 프로세스가 페이지 캐시를 함께 사용
+@st.cache_resource
+def load_qa_resources():
     config = ConfigLoader(project_name="GovPolicyQA")
     config.load()
 
-    st.session_state.logger = Logger()
-
     doc_loader = DocumentLoader(filepath="data/serviceDetail_all.csv")
-    documents = doc_loader.load_documents()
+    # 문서는 배치 단위로 읽어 바로 임베딩 단계로 넘김 (인덱스가 이미 있으면 읽지 않음)
+    document_batches = doc_loader.iter_document_batches()
 
-    embeddings = OpenAIEmbeddings()
-    vs_manager = VectorStoreManager(embeddings=embeddings)
-    vectorstore = vs_manager.load_or_create(documents, path="code/faiss_index_v2")
+    embeddings = CachedEmbeddings(OpenAIEmbeddings(), cache_path="code/embedding_cache.sqlite")
+    vs_manager = VectorStoreManager(embeddings=embeddings, checkpoint_dir="code/embedding_checkpoint")
+    vectorstore = vs_manager.load_or_create(document_batches, path="code/faiss_index_v2", mmap=True)
 
     llm = GovPolicyLLM(model_name="gpt-4o", temperature=0).get_llm()
     prompt = GovPolicyPrompt().get_prompt()
     formatter = MarkdownFormatter()
 
-    st.session_state.qa_system = GovPolicyQA(vectorstore, embeddings, llm, prompt, formatter)
-    st.session_state.grounding_checker = VectorstoreGroundingChecker(vectorstore, embeddings)
+    qa_system = GovPolicyQA(
+        vectorstore, embeddings, llm, prompt, formatter,
+        side_store=vs_manager.side_store,
+        lexical_index=vs_manager.lexical_index,
+        policy_index=vs_manager.policy_index,
+        region_shards=vs_manager.region_shards,
+        cache=get_answer_cache(),
+        index_version=vs_manager.version
+    )
+    return qa_system, SentenceGroundingChecker(embeddings)
+
+# 세션 상태 초기화 (대화 기록과 로거만 세션별)
+if "chat_history" not in st.session_state:
+    st.session_state.chat_history = ChatHistory()
+
+if "qa_system" not in st.session_state:
+    st.session_state.logger = Logger()
+    st.session_state.qa_system, st.session_state.grounding_checker = load_qa_resources()
 
 # 사용자 질문 입력
 user_input = st.text_input("정부 지원 정책에 대해 궁금한 점을 입력하세요", "")
@@ -46,18 +67,35 @@ if user_input:
     st.session_state.logger.log_user_input(user_input)
     st.session_state.chat_history.add_user_message(user_input)
 
-    with st.spinner("답변을 생성 중입니다..."):
-        answer = st.session_state.qa_system.run(user_input)
-
-    # 🔍 그라운드체킹 실행
-    grounding_results = st.session_state.grounding_checker.run(answer)
-    grounded_count = sum(r["grounded"] for r in grounding_results)
-    total_count = len(grounding_results)
-
-    # 📌 답변 출력
+    # 📌 답변 출력 (토큰이 도착하는 대로 표시)
     st.markdown("---")
     st.subheader("📌 답변")
-    st.markdown(answer, unsafe_allow_html=True)
+    retrieval_placeholder = st.empty()
+    answer_placeholder = st.empty()
+    retrieval_placeholder.caption("🔎 관련 문서를 검색 중입니다...")
+
+    answer = ""
+    partial_answer = ""
+    context_docs, context_embeddings = [], None
+    for event in st.session_state.qa_system.stream(user_input):
+        if event["type"] == "retrieval":
+            context_docs, context_embeddings = event["docs"], event["doc_embeddings"]
+            service_ids = list(dict.fromkeys(doc.metadata.get("서비스ID", "") for doc in event["docs"]))
+            cached_label = " · 캐시된 답변" if event.get("cached") else ""
+            retrieval_placeholder.caption(
+                f"🔎 참고 문서 {len(event['docs'])}건 (서비스ID: {', '.join(map(str, service_ids))}){cached_label}"
+            )
+        elif event["type"] == "token":
+            partial_answer += event["content"]
+            answer_placeholder.markdown(partial_answer + "▌")
+        elif event["type"] == "answer":
+            answer = event["content"]
+            answer_placeholder.markdown(answer, unsafe_allow_html=True)
+
+    # 🔍 그라운드체킹 실행 (LLM에 전달된 문서만 대상으로 확인)
+    grounding_results = st.session_state.grounding_checker.run(answer, context_docs, context_embeddings)
+    grounded_count = sum(r["grounded"] for r in grounding_results)
+    total_count = len(grounding_results)
 
     # ✅ 그라운드체킹 한 줄 요약
     if total_count > 0:
@@ -94,4 +132,14 @@ if st.session_state.chat_history.get_history():
         if role == "user":
             st.markdown(f"**👤 사용자:** {content}")
         elif role == "assistant":
-            st.markdown(f"**🤖 챗봇:**\n\n{content}", unsafe_allow_html=True)
\ No newline at end of file
+            st.markdown(f"**🤖 챗봇:**\n\n{content}", unsafe_allow_html=True)
+
+# 📊 답변 캐시 현황
+answer_cache = get_answer_cache()
+st.sidebar.markdown("### 📊 답변 캐시")
+st.sidebar.markdown(
+    f"- 저장된 답변: {len(answer_cache)}개\n"
+    f"- 정확 일치: {answer_cache.stats['exact_hits']}회 / 유사 질문: {answer_cache.stats['semantic_hits']}회 / "
+    f"미적중: {answer_cache.stats['misses']}회\n"
+    f"- 적중률: {answer_cache.hit_rate * 100:.1f}%"
+)
\ No newline at end of file
@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+from typing import Callable
+import numpy as np
+
+
+def replace_file(path: str, write: Callable[[str], None]) -> None:
+    """
+    path와 같은 폴더에 고유한 이름의 임시 파일을 만들어 write(임시 경로)로 쓴 뒤 os.replace로 교체합니다.
+    여러 프로세스가 동시에 저장해도 서로의 임시 파일을 덮어쓰지 않고, 기존 파일을 mmap으로 열어 둔 프로세스는
+    교체 전 파일을 그대로 읽습니다. (np.save처럼 기존 파일을 제자리에서 잘라 쓰면 SIGBUS가 날 수 있음)
+    """
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.",
+                                     suffix=".tmp", delete=False) as f:
+        tmp_path = f.name
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_array(path: str, array) -> None:
+    """np.save를 임시 파일에 한 뒤 교체합니다. (mmap으로 읽히는 .npy 파일용)"""
+    def write(tmp_path):
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+    replace_file(path, write)
+
+
+def save_json(path: str, data) -> None:
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+    replace_file(path, write)
+
+
+def save_text(path: str, text: str) -> None:
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+    replace_file(path, write)
@@ -1,27 +1,260 @@
-from typing import Any
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from answer_cache import AnswerCache, question_scope
+
+# 질문 하나당 MMR 후보 수, 최종 문서 수, 관련성 가중치
+RETRIEVAL_PARAMS = {"top_k_sim": 15, "top_k_final": 5, "lambda_mult": 0.7}
 
 class GovPolicyQA:
-    def __init__(self, vectorstore, embeddings, llm, prompt, formatter):
+    def __init__(self, vectorstore, embeddings, llm, prompt, formatter, side_store=None,
+                 cache: Optional[AnswerCache] = None, index_version: Optional[str] = None,
+                 search_params: Optional[Dict[str, int]] = None, lexical_index=None,
+                 policy_index=None, region_shards=None):
+        from retriever import HybridMMRRetriever  # 내부에서 불러오는 방식
+
         self.vectorstore = vectorstore
         self.embeddings = embeddings
         self.llm = llm
         self.prompt = prompt
         self.formatter = formatter
+        # 보조 벡터 저장소를 질문 간에 재사용하도록 retriever는 한 번만 생성
+        # search_params: 근사 인덱스 검색 파라미터 (예: {"nprobe": 16} 또는 {"ef_search": 64})
+        # lexical_index: 글자 n-gram BM25 역색인 (dense 결과와 RRF로 합쳐 후보를 만듦)
+        # policy_index: 서비스ID별 중심 벡터 색인 (상위 정책을 먼저 고른 뒤 그 정책의 청크만 검색)
+        # region_shards: 지역 샤드 (질문에 나온 지역과 전국 샤드만 검색)
+        self.retriever = HybridMMRRetriever(
+            self.vectorstore, self.embeddings, side_store=side_store, lexical_index=lexical_index,
+            policy_index=policy_index, region_shards=region_shards, **(search_params or {})
+        )
+        # 답변 캐시 (index_version이 바뀌면 캐시가 자동으로 비워짐)
+        self.cache = cache
+        self.index_version = index_version
+        # 의미 유사도 캐시는 지역·숫자 조건이 같은 질문끼리만 재사용 (지역은 샤드 색인의 시/군/구 이름으로 찾음)
+        self.region_shards = region_shards
+
+    def _cache_scope(self, question: str) -> tuple:
+        return question_scope(question, self.region_shards)
+
+    def _lookup_cache(self, question: str) -> Tuple[Optional[Dict[str, Any]], Optional[List[float]]]:
+        """캐시된 결과와, 조회 중 계산한 질문 임베딩(검색에 재사용)을 반환합니다."""
+        if self.cache is None:
+            return None, None
+        cached = self.cache.get(question, index_version=self.index_version)
+        if cached is not None:
+            return cached, None
+        query_embedding = self.embeddings.embed_query(question)
+        similar = self.cache.get_similar(query_embedding, index_version=self.index_version, scope=self._cache_scope(question))
+        return similar, query_embedding
+
+    def _store_cache(self, question: str, result: Dict[str, Any], query_embedding) -> None:
+        if self.cache is None or query_embedding is None:
+            return
+        self.cache.put(question, result, query_embedding, index_version=self.index_version, scope=self._cache_scope(question))
+
+    def _retrieve(self, question: str, query_embedding: List[float] = None) -> Tuple[List[Document], np.ndarray]:
+        return self.retriever.retrieve_with_embeddings(question, query_embedding=query_embedding, **RETRIEVAL_PARAMS)
+
+    @staticmethod
+    def _error_result(error: Exception) -> Dict[str, Any]:
+        return {"answer": None, "docs": [], "doc_embeddings": None, "error": error}
+
+    def _embed_queries(self, questions: List[str], max_concurrency: int) -> List[Any]:
+        """
+        질문마다 embed_query로 임베딩합니다. (질문/문서 임베딩 모델이 다른 Upstage 등도 올바른 질문 벡터 사용)
+        API 호출은 max_concurrency개씩 동시에 보내며, 실패한 질문은 벡터 대신 예외를 담습니다.
+        """
+        def embed(question: str):
+            try:
+                return self.embeddings.embed_query(question)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(questions)))) as executor:
+            return list(executor.map(embed, questions))
+
+    def _retrieve_batch(self, questions: List[str], query_embeddings: List[List[float]]) -> List[Any]:
+        try:
+            return self.retriever.retrieve_batch_with_embeddings(questions, query_embeddings, **RETRIEVAL_PARAMS)
+        except Exception:
+            # 배치 검색이 실패하면 질문별로 다시 검색해 실패한 질문만 오류로 표시
+            retrieved = []
+            for question, query_embedding in zip(questions, query_embeddings):
+                try:
+                    retrieved.append(self._retrieve(question, query_embedding))
+                except Exception as e:
+                    retrieved.append(e)
+            return retrieved
+
+    def _prepare_batch(self, questions: List[str], max_concurrency: int) -> Tuple[List[Optional[Dict[str, Any]]], List[tuple]]:
+        """
+        캐시 조회 → 캐시에 없는 질문 임베딩 → 배치 검색까지 수행합니다.
+        완료된 결과(캐시 적중·오류)와, LLM 호출이 남은 (순번, 문서, 문서 벡터, 질문 벡터) 목록을 반환합니다.
+        오류는 해당 질문에만 기록하고 나머지 질문은 계속 처리합니다.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+        misses = []
+        for i, question in enumerate(questions):
+            cached = self.cache.get(question, index_version=self.index_version) if self.cache is not None else None
+            if cached is not None:
+                results[i] = {**cached, "error": None}
+            else:
+                misses.append(i)
+        if not misses:
+            return results, []
+
+        remaining = []
+        for i, query_embedding in zip(misses, self._embed_queries([questions[i] for i in misses], max_concurrency)):
+            if isinstance(query_embedding, Exception):
+                results[i] = self._error_result(query_embedding)
+                continue
+            similar = (self.cache.get_similar(query_embedding, index_version=self.index_version,
+                                              scope=self._cache_scope(questions[i]))
+                       if self.cache is not None else None)
+            if similar is not None:
+                results[i] = {**similar, "error": None}
+            else:
+                remaining.append((i, query_embedding))
+        if not remaining:
+            return results, []
+
+        retrieved = self._retrieve_batch([questions[i] for i, _ in remaining], [vector for _, vector in remaining])
+        pending = []
+        for (i, query_embedding), item in zip(remaining, retrieved):
+            if isinstance(item, Exception):
+                results[i] = self._error_result(item)
+            else:
+                pending.append((i, item[0], item[1], query_embedding))
+        return results, pending
+
+    def _finish_batch(self, questions: List[str], results: List[Optional[Dict[str, Any]]],
+                      pending: List[tuple], responses: List[Any]) -> List[Dict[str, Any]]:
+        for (i, docs, doc_embeddings, query_embedding), response in zip(pending, responses):
+            if isinstance(response, Exception):
+                results[i] = self._error_result(response)
+                continue
+            try:
+                result = {"answer": self.formatter.format(self._content(response)), "docs": docs, "doc_embeddings": doc_embeddings}
+                self._store_cache(questions[i], result, query_embedding)
+            except Exception as e:
+                results[i] = self._error_result(e)
+                continue
+            results[i] = {**result, "error": None}
+        return results
+
+    def run_batch(self, questions: List[str], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """
+        여러 질문을 한 번에 처리합니다. (오프라인 평가·회귀 테스트용)
+        질문 임베딩과 LLM 호출은 최대 max_concurrency개씩 동시에 보내고, 검색과 MMR은 배치 연산으로 처리합니다.
+
+        Returns:
+            list: 질문 순서대로 {"answer", "docs", "doc_embeddings", "error"}. 실패한 질문은 answer가 None이고 error에 예외가 담김
+        """
+        results, pending = self._prepare_batch(questions, max_concurrency)
+        responses = []
+        if pending:
+            prompts = [self._build_prompt(questions[i], docs) for i, docs, _, _ in pending]
+            responses = self.llm.batch(prompts, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+        return self._finish_batch(questions, results, pending, responses)
+
+    async def abatch(self, questions: List[str], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """run_batch의 비동기 버전 (검색은 스레드에서, LLM은 ainvoke로 동시에 호출)"""
+        results, pending = await asyncio.to_thread(self._prepare_batch, questions, max_concurrency)
+        responses = []
+        if pending:
+            prompts = [self._build_prompt(questions[i], docs) for i, docs, _, _ in pending]
+            responses = await self.llm.abatch(prompts, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+        return self._finish_batch(questions, results, pending, responses)
+
+    def _build_prompt(self, question: str, docs: List[Document]) -> str:
+        context = "\n\n".join([doc.page_content for doc in docs])
+        return self.prompt.format(context=context, question=question)
+
+    @staticmethod
+    def _content(chunk: Any) -> str:
+        return chunk.content if hasattr(chunk, "content") else chunk
 
     def run(self, question: str) -> str:
-        from retriever import HybridMMRRetriever  # 내부에서 불러오는 방식
+        return self.run_with_context(question)["answer"]
+
+    def run_with_context(self, question: str) -> Dict[str, Any]:
+        """
+        답변과 함께 LLM에 전달한 문서(docs)와 그 벡터(doc_embeddings)를 반환합니다.
+        SentenceGroundingChecker가 전체 인덱스를 다시 검색하지 않고 이 문맥만으로 근거를 확인할 수 있습니다.
+        """
+        # Step 0: Answer from cache when the same (or a very similar) question was asked before
+        cached, query_embedding = self._lookup_cache(question)
+        if cached is not None:
+            return cached
 
         # Step 1: Retrieve documents using Hybrid MMR
-        retriever = HybridMMRRetriever(self.vectorstore, self.embeddings)
-        docs = retriever.retrieve(question, top_k_sim=15, top_k_final=5, lambda_mult=0.7)
+        docs, doc_embeddings = self._retrieve(question, query_embedding)
 
-        # Step 2: Construct context from documents
-        context = "\n\n".join([doc.page_content for doc in docs])
+        # Step 2: Construct context from documents and format prompt
+        formatted_prompt = self._build_prompt(question, docs)
 
-        # Step 3: Format prompt and invoke LLM
-        formatted_prompt = self.prompt.format(context=context, question=question)
+        # Step 3: Invoke LLM
         response = self.llm.invoke(formatted_prompt)
-        answer = response.content if hasattr(response, "content") else response
+        answer = self._content(response)
 
         # Step 4: Postprocess the answer to Markdown format
-        return self.formatter.format(answer)
+        result = {"answer": self.formatter.format(answer), "docs": docs, "doc_embeddings": doc_embeddings}
+        self._store_cache(question, result, query_embedding)
+        return result
+
+    def stream(self, question: str) -> Iterator[Dict[str, Any]]:
+        """
+        답변을 토큰 단위로 흘려보냅니다. 이벤트 순서:
+        - {"type": "retrieval", "docs": [...], "doc_embeddings": ...}: 첫 토큰 전에 검색 결과 전달
+        - {"type": "token", "content": "..."}: LLM 토큰 (도착하는 대로)
+        - {"type": "answer", "content": "..."}: Markdown 포맷이 적용된 최종 답변
+        """
+        cached, query_embedding = self._lookup_cache(question)
+        if cached is not None:
+            yield from self._cached_events(cached)
+            return
+
+        docs, doc_embeddings = self._retrieve(question, query_embedding)
+        yield {"type": "retrieval", "docs": docs, "doc_embeddings": doc_embeddings}
+
+        tokens = []
+        for chunk in self.llm.stream(self._build_prompt(question, docs)):
+            token = self._content(chunk)
+            if token:
+                tokens.append(token)
+                yield {"type": "token", "content": token}
+
+        answer = self.formatter.format("".join(tokens))
+        self._store_cache(question, {"answer": answer, "docs": docs, "doc_embeddings": doc_embeddings}, query_embedding)
+        yield {"type": "answer", "content": answer}
+
+    async def astream(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        # 검색은 동기 API(임베딩 + FAISS)이므로 이벤트 루프를 막지 않도록 스레드에서 실행
+        cached, query_embedding = await asyncio.to_thread(self._lookup_cache, question)
+        if cached is not None:
+            for event in self._cached_events(cached):
+                yield event
+            return
+
+        docs, doc_embeddings = await asyncio.to_thread(self._retrieve, question, query_embedding)
+        yield {"type": "retrieval", "docs": docs, "doc_embeddings": doc_embeddings}
+
+        tokens = []
+        async for chunk in self.llm.astream(self._build_prompt(question, docs)):
+            token = self._content(chunk)
+            if token:
+                tokens.append(token)
+                yield {"type": "token", "content": token}
+
+        answer = self.formatter.format("".join(tokens))
+        self._store_cache(question, {"answer": answer, "docs": docs, "doc_embeddings": doc_embeddings}, query_embedding)
+        yield {"type": "answer", "content": answer}
+
+    @staticmethod
+    def _cached_events(cached: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        # 캐시 적중 시 LLM 호출 없이 같은 이벤트 형식으로 한 번에 전달
+        yield {"type": "retrieval", "docs": cached["docs"], "doc_embeddings": cached["doc_embeddings"], "cached": True}
+        yield {"type": "token", "content": cached["answer"]}
+        yield {"type": "answer", "content": cached["answer"]}
@@ -1,5 +1,7 @@
+import asyncio
 import numpy as np
 from typing import List, Dict
+from langchain_core.documents import Document
 from langchain_core.vectorstores import VectorStore
 from langchain_core.embeddings import Embeddings
 from sentence_splitter import split_text_into_sentences
@@ -10,19 +12,22 @@ class VectorstoreGroundingChecker:
         self.embeddings = embeddings
         self.threshold = threshold
 
-    def run(self, answer: str) -> List[Dict]:
-        sentences = split_text_into_sentences(answer)
-        results = []
+    def _search(self, sentence_embeddings) -> tuple:
+        # 모든 문장 벡터를 한 번의 행렬 검색으로 처리 (문장별 가장 가까운 문서 1개)
+        vectors = np.asarray(sentence_embeddings, dtype=np.float32)
+        if self.vectorstore._normalize_L2:
+            vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        return self.vectorstore.index.search(vectors, 1)
 
-        for sentence in sentences:
-            sent_embedding = self.embeddings.embed_query(sentence)
-            # 유사한 문서 1개 검색
-            top_k_docs = self.vectorstore.similarity_search_with_score_by_vector(sent_embedding, k=1)
-            if not top_k_docs:
+    def _build_results(self, sentences: List[str], distances: np.ndarray, indices: np.ndarray) -> List[Dict]:
+        results = []
+        for sentence, score, idx in zip(sentences, distances[:, 0], indices[:, 0]):
+            if idx == -1:
                 continue
 
-            top_doc, score = top_k_docs[0]
-            similarity = 1 - score  # FAISS는 distance, 유사도로 변환
+            doc_id = self.vectorstore.index_to_docstore_id[int(idx)]
+            top_doc = self.vectorstore.docstore.search(doc_id)
+            similarity = 1 - float(score)  # FAISS는 distance, 유사도로 변환
 
             results.append({
                 "sentence": sentence,
@@ -31,4 +36,80 @@ class VectorstoreGroundingChecker:
                 "grounded": similarity >= self.threshold
             })
 
-        return results
\ No newline at end of file
+        return results
+
+    def run(self, answer: str) -> List[Dict]:
+        sentences = split_text_into_sentences(answer)
+        if not sentences:
+            return []
+
+        # 문장 전체를 한 번의 배치 호출로 임베딩
+        sentence_embeddings = self.embeddings.embed_documents(sentences)
+        distances, indices = self._search(sentence_embeddings)
+        return self._build_results(sentences, distances, indices)
+
+    async def arun(self, answer: str) -> List[Dict]:
+        sentences = split_text_into_sentences(answer)
+        if not sentences:
+            return []
+
+        sentence_embeddings = await self.embeddings.aembed_documents(sentences)
+        distances, indices = await asyncio.to_thread(self._search, sentence_embeddings)
+        return self._build_results(sentences, distances, indices)
+
+
+class SentenceGroundingChecker:
+    """
+    답변 문장을 LLM에 실제로 전달된 문서(context)와만 비교하는 그라운드체커입니다.
+    전체 벡터스토어를 검색하지 않고, retriever가 넘겨준 문서 벡터를 재사용해 코사인 유사도로 판정합니다.
+    """
+    def __init__(self, embeddings: Embeddings, threshold: float = 0.75):
+        self.embeddings = embeddings
+        self.threshold = threshold
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _score(self, sentences: List[str], sentence_embeddings, docs: List[Document], doc_embeddings) -> List[Dict]:
+        similarities = self._normalize(sentence_embeddings) @ self._normalize(doc_embeddings).T
+        best = np.argmax(similarities, axis=1)
+
+        results = []
+        for i, sentence in enumerate(sentences):
+            similarity = float(similarities[i, best[i]])
+            results.append({
+                "sentence": sentence,
+                "matched_context": docs[best[i]].page_content,
+                "similarity": round(similarity, 3),
+                "grounded": similarity >= self.threshold
+            })
+        return results
+
+    def run(self, answer: str, docs: List[Document], doc_embeddings=None) -> List[Dict]:
+        sentences = split_text_into_sentences(answer)
+        if not sentences or not docs:
+            return []
+
+        if doc_embeddings is None:
+            # 문서 벡터가 없으면 문장과 함께 한 번의 배치 호출로 임베딩
+            vectors = self.embeddings.embed_documents(sentences + [doc.page_content for doc in docs])
+            sentence_embeddings, doc_embeddings = vectors[:len(sentences)], vectors[len(sentences):]
+        else:
+            sentence_embeddings = self.embeddings.embed_documents(sentences)
+        return self._score(sentences, sentence_embeddings, docs, doc_embeddings)
+
+    async def arun(self, answer: str, docs: List[Document], doc_embeddings=None) -> List[Dict]:
+        sentences = split_text_into_sentences(answer)
+        if not sentences or not docs:
+            return []
+
+        if doc_embeddings is None:
+            vectors = await self.embeddings.aembed_documents(sentences + [doc.page_content for doc in docs])
+            sentence_embeddings, doc_embeddings = vectors[:len(sentences)], vectors[len(sentences):]
+        else:
+            sentence_embeddings = await self.embeddings.aembed_documents(sentences)
+        return self._score(sentences, sentence_embeddings, docs, doc_embeddings)
@@ -0,0 +1,112 @@
+import argparse
+import os
+import time
+from typing import Dict, List, Optional
+import faiss
+import numpy as np
+from vectorstore import INDEX_TYPES, index_factory_string, make_search_parameters
+
+# 인덱스 종류별로 비교할 검색 파라미터
+DEFAULT_SEARCH_GRID = {
+    "flat": [{}],
+    "hnsw": [{"ef_search": ef} for ef in (16, 32, 64, 128)],
+    "ivf_flat": [{"nprobe": n} for n in (1, 4, 16, 64)],
+    "ivf_pq": [{"nprobe": n} for n in (1, 4, 16, 64)],
+    "sq8": [{}],
+}
+
+
+def build_index(vectors: np.ndarray, index_type: str, index_params: Optional[dict] = None,
+                train_size: int = 20000, seed: int = 0):
+    """코퍼스에서 무작위로 뽑은 train_size개 벡터로 학습한 인덱스와 빌드 시간(초)을 반환합니다."""
+    start = time.perf_counter()
+    n, dim = vectors.shape
+    rng = np.random.default_rng(seed)
+    train_vectors = vectors[rng.choice(n, size=min(n, train_size), replace=False)]
+    index = faiss.index_factory(dim, index_factory_string(index_type, dim, len(train_vectors), **(index_params or {})))
+    if not index.is_trained:
+        index.train(train_vectors)
+    index.add(vectors)
+    return index, time.perf_counter() - start
+
+
+def evaluate_index(index, queries: np.ndarray, ground_truth: np.ndarray, k: int, search_params: dict) -> Dict[str, float]:
+    """질문을 하나씩 검색해(실제 서비스와 같은 방식) recall@k와 질문당 평균 지연시간을 측정합니다."""
+    params = make_search_parameters(index, **search_params)
+    hits, elapsed = 0, 0.0
+    for query, expected in zip(queries, ground_truth):
+        start = time.perf_counter()
+        _, found = index.search(query[None, :], k, params=params)
+        elapsed += time.perf_counter() - start
+        hits += len(set(found[0].tolist()) & set(expected.tolist()))
+    return {"recall": hits / (len(queries) * k), "latency_ms": elapsed / len(queries) * 1000}
+
+
+def recall_latency_report(vectors: np.ndarray, queries: np.ndarray, k: int = 10,
+                          index_types=INDEX_TYPES, search_grid: Optional[Dict[str, List[dict]]] = None,
+                          index_params: Optional[Dict[str, dict]] = None, train_size: int = 20000) -> List[dict]:
+    """
+    flat(정확한 검색) 결과를 정답으로 두고 인덱스 종류·검색 파라미터별 recall@k와 지연시간을 비교합니다.
+
+    Returns:
+        list: [{"index_type", "search_params", "recall", "latency_ms", "build_s", "size_mb"}, ...]
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    search_grid = search_grid or DEFAULT_SEARCH_GRID
+    index_params = index_params or {}
+
+    baseline = faiss.IndexFlatL2(vectors.shape[1])
+    baseline.add(vectors)
+    _, ground_truth = baseline.search(queries, k)
+
+    rows = []
+    for index_type in index_types:
+        index, build_seconds = build_index(vectors, index_type, index_params.get(index_type), train_size)
+        size_mb = faiss.serialize_index(index).nbytes / 1024 ** 2
+        for search_params in search_grid.get(index_type, [{}]):
+            rows.append({
+                "index_type": index_type,
+                "search_params": search_params,
+                **evaluate_index(index, queries, ground_truth, k, search_params),
+                "build_s": build_seconds,
+                "size_mb": size_mb,
+            })
+    return rows
+
+
+def recommend(rows: List[dict], min_recall: float = 0.95) -> dict:
+    """recall@k가 min_recall 이상인 설정 중 가장 빠른 것을 고릅니다. (없으면 flat)"""
+    candidates = [row for row in rows if row["recall"] >= min_recall]
+    if not candidates:
+        return next(row for row in rows if row["index_type"] == "flat")
+    return min(candidates, key=lambda row: row["latency_ms"])
+
+
+def print_report(rows: List[dict], k: int):
+    print(f"{'index':<10} {'params':<18} {f'recall@{k}':>10} {'ms/query':>10} {'build(s)':>9} {'size(MB)':>9}")
+    for row in rows:
+        params = ",".join(f"{key}={value}" for key, value in row["search_params"].items()) or "-"
+        print(f"{row['index_type']:<10} {params:<18} {row['recall']:>10.3f} {row['latency_ms']:>10.3f} "
+              f"{row['build_s']:>9.2f} {row['size_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FAISS 인덱스 종류별 recall@k / 지연시간 비교")
+    parser.add_argument("--index-dir", default="code/faiss_index_v2", help="flat 인덱스가 저장된 폴더 (벡터를 여기서 읽음)")
+    parser.add_argument("--queries", type=int, default=200, help="질문으로 사용할 문서 벡터 수 (코퍼스에서 무작위 추출)")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--train-size", type=int, default=20000)
+    args = parser.parse_args()
+
+    stored = faiss.read_index(os.path.join(args.index_dir, "index.faiss"))
+    corpus = stored.reconstruct_n(0, stored.ntotal)
+    rng = np.random.default_rng(0)
+    sample = corpus[rng.choice(len(corpus), size=min(args.queries, len(corpus)), replace=False)]
+
+    report = recall_latency_report(corpus, sample, k=args.k, train_size=args.train_size)
+    print_report(report, args.k)
+    best = recommend(report, args.min_recall)
+    print(f"\n추천: index_type=\"{best['index_type']}\" {best['search_params']} "
+          f"(recall@{args.k}={best['recall']:.3f}, {best['latency_ms']:.3f}ms/query)")
@@ -0,0 +1,183 @@
+import json
+import os
+import re
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from file_io import save_array, save_json
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def char_ngrams(text: str, ngram_sizes: Tuple[int, ...] = (2, 3)) -> List[str]:
+    """
+    단어(공백·문장부호 기준) 안에서 글자 n-gram을 만듭니다. 가장 짧은 n보다 짧은 단어는 그대로 사용합니다.
+    예: "의정부시 청년" → 의정, 정부, 부시, 의정부, 정부시, 청년
+    """
+    grams = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if len(token) < min(ngram_sizes):
+            grams.append(token)
+            continue
+        for n in ngram_sizes:
+            grams.extend(token[i:i + n] for i in range(len(token) - n + 1))
+    return grams
+
+
+class NgramBM25Index:
+    """
+    청크 본문의 글자 n-gram에 대한 BM25 역색인입니다.
+    지역명(의정부시, 창원시)·사업명·연령 표현처럼 정확히 일치해야 하는 단어를 dense 검색이 놓칠 때 보완합니다.
+
+    문서 번호는 FAISS 인덱스의 위치(index_to_docstore_id의 키)와 같으며, 추가된 순서대로 매겨집니다.
+    BM25의 문서 길이 정규화까지 미리 계산한 가중치를 저장하므로 검색은 질문 n-gram의 가중치 합만 구합니다.
+    """
+    dirname = "lexical_index"
+
+    def __init__(self, ngram_sizes: Tuple[int, ...] = (2, 3), k1: float = 1.2, b: float = 0.75):
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.k1 = k1
+        self.b = b
+        # 빌드 중: n-gram → 임시 번호, 배치별 (n-gram 번호, 빈도) 배열과 문서별 n-gram 종류 수·길이
+        self._term_ids = {}
+        self._pending_terms: List[np.ndarray] = []
+        self._pending_tfs: List[np.ndarray] = []
+        self._pending_sizes: List[np.ndarray] = []
+        self._pending_lengths: List[np.ndarray] = []
+        # 빌드 완료 후: 정렬된 n-gram 목록과 CSR 형태의 (문서 번호, 가중치)
+        self.terms: Optional[np.ndarray] = None
+        self.idf: Optional[np.ndarray] = None
+        self.indptr: Optional[np.ndarray] = None
+        self.doc_ids: Optional[np.ndarray] = None
+        self.weights: Optional[np.ndarray] = None
+        self.n_docs = 0
+        # 저장할 때 기록한 벡터스토어 인덱스 버전 (로드한 역색인이 현재 인덱스와 맞는지 확인)
+        self.version: Optional[str] = None
+
+    def __len__(self):
+        return self.n_docs
+
+    def add_texts(self, texts: Iterable[str]) -> None:
+        """
+        문서를 추가합니다. 배치마다 정수 배열로만 보관하므로 스트리밍으로 인덱스를 만들 때도 메모리가 작습니다.
+        """
+        if self.terms is not None:
+            raise ValueError("이미 빌드된 역색인에는 문서를 추가할 수 없습니다.")
+        terms, tfs, sizes, lengths = [], [], [], []
+        for text in texts:
+            counter = Counter(char_ngrams(text, self.ngram_sizes))
+            terms.extend(self._term_ids.setdefault(term, len(self._term_ids)) for term in counter)
+            tfs.extend(counter.values())
+            sizes.append(len(counter))
+            lengths.append(sum(counter.values()))
+        self._pending_terms.append(np.array(terms, dtype=np.int64))
+        self._pending_tfs.append(np.array(tfs, dtype=np.float32))
+        self._pending_sizes.append(np.array(sizes, dtype=np.int64))
+        self._pending_lengths.append(np.array(lengths, dtype=np.float32))
+        self.n_docs += len(sizes)
+
+    def build(self) -> None:
+        """추가된 문서로 역색인을 만듭니다. (저장/검색 전에 자동으로 호출)"""
+        if self.terms is not None:
+            return
+        vocabulary = np.array(list(self._term_ids), dtype=f"<U{max(self.ngram_sizes)}")
+        rows = np.concatenate(self._pending_terms) if self._pending_terms else np.empty(0, dtype=np.int64)
+        tfs = np.concatenate(self._pending_tfs) if self._pending_tfs else np.empty(0, dtype=np.float32)
+        sizes = np.concatenate(self._pending_sizes) if self._pending_sizes else np.empty(0, dtype=np.int64)
+        doc_lengths = np.concatenate(self._pending_lengths) if self._pending_lengths else np.empty(0, dtype=np.float32)
+        self._term_ids, self._pending_terms, self._pending_tfs = {}, [], []
+        self._pending_sizes, self._pending_lengths = [], []
+
+        # 임시 번호를 사전순 번호로 바꾼 뒤 n-gram 순(같은 n-gram 안에서는 문서 순)으로 정렬해 CSR로 저장
+        vocabulary_order = np.argsort(vocabulary, kind="stable")
+        rank = np.empty(len(vocabulary_order), dtype=np.int64)
+        rank[vocabulary_order] = np.arange(len(vocabulary_order))
+        rows = rank[rows]
+        docs = np.repeat(np.arange(self.n_docs, dtype=np.int32), sizes)
+        order = np.lexsort((docs, rows))
+        rows, docs, tfs = rows[order], docs[order], tfs[order]
+
+        avg_length = float(doc_lengths.mean()) if self.n_docs else 0.0
+        norm = self.k1 * (1 - self.b + self.b * doc_lengths[docs] / max(avg_length, 1e-6))
+        document_frequency = np.bincount(rows, minlength=len(vocabulary)).astype(np.float32)
+
+        self.terms = vocabulary[vocabulary_order]
+        self.idf = np.log1p((self.n_docs - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        self.indptr = np.concatenate([[0], np.cumsum(document_frequency.astype(np.int64))])
+        self.doc_ids = docs
+        self.weights = (tfs * (self.k1 + 1) / (tfs + norm)).astype(np.float32)
+
+    def _lookup(self, grams: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        counts = Counter(grams)
+        query_terms = np.array(list(counts), dtype=self.terms.dtype)
+        positions = np.searchsorted(self.terms, query_terms)
+        positions = np.minimum(positions, len(self.terms) - 1)
+        found = self.terms[positions] == query_terms
+        return positions[found], np.array(list(counts.values()), dtype=np.float32)[found]
+
+    def search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        (문서 번호, BM25 점수)를 점수 높은 순으로 최대 k개 반환합니다.
+        allowed(문서 번호별 boolean 배열)를 주면 True인 문서 안에서만 고릅니다.
+        """
+        self.build()
+        grams = char_ngrams(query, self.ngram_sizes)
+        if not grams or self.n_docs == 0 or len(self.terms) == 0:
+            return []
+
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term, query_tf in zip(*self._lookup(grams)):
+            start, end = self.indptr[term], self.indptr[term + 1]
+            scores[self.doc_ids[start:end]] += query_tf * self.idf[term] * self.weights[start:end]
+
+        if allowed is not None:
+            scores[~np.asarray(allowed, dtype=bool)] = 0
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(i), float(scores[i])) for i in matched]
+
+    def save(self, path: str, version: Optional[str] = None) -> None:
+        """
+        배열마다 임시 파일에 쓴 뒤 교체합니다. (다른 프로세스가 mmap으로 연 파일을 제자리에서 잘라 쓰지 않음)
+        meta.json은 마지막에 써서, 버전이 맞으면 배열도 모두 새 파일입니다.
+        """
+        self.build()
+        directory = os.path.join(path, self.dirname)
+        os.makedirs(directory, exist_ok=True)
+        for name in ("terms", "idf", "indptr", "doc_ids", "weights"):
+            save_array(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        self.version = version
+        save_json(os.path.join(directory, "meta.json"),
+                  {"ngram_sizes": self.ngram_sizes, "k1": self.k1, "b": self.b, "n_docs": self.n_docs, "version": version})
+
+    @classmethod
+    def load(cls, path: str) -> Optional["NgramBM25Index"]:
+        """
+        저장된 역색인을 읽기 전용 메모리 맵으로 엽니다. (FAISS mmap 인덱스처럼 프로세스 간 페이지 캐시 공유)
+        """
+        directory = os.path.join(path, cls.dirname)
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(ngram_sizes=tuple(meta["ngram_sizes"]), k1=meta["k1"], b=meta["b"])
+        index.n_docs = meta["n_docs"]
+        index.version = meta.get("version")
+        for name in ("terms", "idf", "indptr", "doc_ids", "weights"):
+            setattr(index, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+        return index
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[int]:
+    """
+    여러 검색 결과 순위를 RRF(1 / (k + 순위))로 합칩니다. 점수 척도가 다른 dense/BM25 결과를 그대로 합칠 수 있습니다.
+    동점이면 먼저 나온 결과 목록의 순서를 따릅니다.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda item: -scores[item])
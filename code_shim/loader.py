@@ -1,32 +1,123 @@
+import os
+from typing import Iterator
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from langchain_core.documents import Document
 
 class DocumentLoader:
-    def __init__(self, filepath: str):
+    def __init__(self, filepath: str, chunksize: int = 1000):
         self.filepath = filepath
+        self.chunksize = chunksize
         self.fields = ['지원대상', '지원내용', '신청방법', '접수기관명', '선정기준', '문의처']
+        # 지역 샤드(region_shards.py)를 나누는 기준 컬럼 (청크 메타데이터에 함께 저장)
+        self.region_fields = ['소관기관명', '접수기관명']
 
-    def _clean_text(self, text):
-        return str(text).replace('\r', ' ').replace('\n', ' ').replace('○', '').strip()
+    @staticmethod
+    def _clean_series(values: pd.Series) -> pd.Series:
+        # 문자열 변환 후 줄바꿈을 공백으로 바꾸고 '○' 제거 (행마다가 아닌 컬럼 단위 연산)
+        return (values.astype(str)
+                .str.replace('\r', ' ', regex=False)
+                .str.replace('\n', ' ', regex=False)
+                .str.replace('○', '', regex=False)
+                .str.strip())
 
-    def _extract_chunks_from_row(self, row) -> list[Document]:
-        service_name = self._clean_text(row.get("서비스명", ""))
-        service_id = row.get("서비스ID", "")
-        base_metadata = {"서비스ID": service_id}
+    def _build_documents(self, frame: pd.DataFrame) -> list[Document]:
+        """
+        행마다 항목(field)별 Document를 만듭니다. (행 순서 → 항목 순서)
+        """
+        n_rows = len(frame)
+        empty = pd.Series([""] * n_rows, index=frame.index)
+        service_names = self._clean_series(frame["서비스명"]) if "서비스명" in frame else empty
+        service_ids = frame["서비스ID"].to_numpy(dtype=object) if "서비스ID" in frame else np.full(n_rows, "", dtype=object)
+        regions = {
+            field: (self._clean_series(frame[field]).replace("nan", "") if field in frame else empty).to_numpy(dtype=object)
+            for field in self.region_fields
+        }
 
-        chunks = []
+        texts, masks = [], []
         for field in self.fields:
-            value = self._clean_text(row.get(field, ""))
-            if value and value.lower() != "nan":
-                chunk_text = f"[정책명: {service_name}] [항목: {field}]\n{value}"
-                chunks.append(Document(page_content=chunk_text, metadata=base_metadata))
+            values = self._clean_series(frame[field]) if field in frame else empty
+            masks.append(((values != "") & (values.str.lower() != "nan")).to_numpy())
+            texts.append(("[정책명: " + service_names + f"] [항목: {field}]\n" + values).to_numpy(dtype=object))
 
-        return chunks
+        # (행 수 × 항목 수) 행렬에서 남길 칸만 행 우선 순서로 꺼냄
+        rows, cols = np.nonzero(np.column_stack(masks))
+        text_matrix = np.column_stack(texts)
+        return [
+            Document(
+                page_content=text_matrix[r, c],
+                metadata={"서비스ID": service_ids[r], **{field: values[r] for field, values in regions.items()}}
+            )
+            for r, c in zip(rows, cols)
+        ]
+
+    def _parquet_path(self) -> str:
+        if self.filepath.endswith(".parquet"):
+            return self.filepath
+        return os.path.splitext(self.filepath)[0] + ".parquet"
+
+    @staticmethod
+    def _as_text(frame: pd.DataFrame) -> pd.DataFrame:
+        # 결측은 NaN, 나머지는 문자열로 통일 (CSV/Parquet 어느 쪽에서 읽어도 같은 결과, 서비스ID의 앞자리 0 유지)
+        return frame.astype(object).apply(lambda col: col.astype(str).where(col.notna(), np.nan))
+
+    def _iter_frames(self) -> Iterator[pd.DataFrame]:
+        """
+        문서 생성에 필요한 컬럼만 chunksize 행씩 읽습니다.
+        CSV는 처음 읽을 때 같은 이름의 .parquet으로 함께 변환해 두고, 이후에는 (CSV가 더 새롭지 않으면) Parquet에서 바로 읽습니다.
+        """
+        columns = list(dict.fromkeys(["서비스명", "서비스ID", *self.fields, *self.region_fields]))
+        parquet_path = self._parquet_path()
+        csv_is_newer = parquet_path != self.filepath and (
+            not os.path.exists(parquet_path) or os.path.getmtime(parquet_path) < os.path.getmtime(self.filepath)
+        )
+        if parquet_path != self.filepath and not csv_is_newer:
+            # 예전 Parquet 캐시에 새로 필요한 컬럼이 없으면 CSV에서 다시 만듦
+            cached = set(pq.ParquetFile(parquet_path).schema_arrow.names)
+            csv_columns = set(pd.read_csv(self.filepath, nrows=0).columns)
+            csv_is_newer = bool((set(columns) & csv_columns) - cached)
+
+        if not csv_is_newer:
+            parquet_file = pq.ParquetFile(parquet_path)
+            names = parquet_file.schema_arrow.names
+            for batch in parquet_file.iter_batches(batch_size=self.chunksize, columns=[c for c in columns if c in names]):
+                yield self._as_text(batch.to_pandas())
+            return
+
+        # CSV를 조각 단위로 읽으면서 Parquet 캐시도 조각 단위로 기록 (끝까지 읽었을 때만 교체)
+        tmp_path = f"{parquet_path}.tmp"
+        writer, completed = None, False
+        reader = pd.read_csv(self.filepath, usecols=lambda col: col in columns, dtype=str, chunksize=self.chunksize)
+        try:
+            for frame in reader:
+                frame = self._as_text(frame)
+                if writer is None:
+                    schema = pa.schema([pa.field(name, pa.string()) for name in frame.columns])
+                    writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+                writer.write_table(pa.Table.from_pandas(frame, preserve_index=False, schema=writer.schema))
+                yield frame
+            completed = True
+        finally:
+            if writer is not None:
+                writer.close()
+                if completed:
+                    os.replace(tmp_path, parquet_path)
+                else:
+                    os.remove(tmp_path)
+
+    def iter_document_batches(self) -> Iterator[list[Document]]:
+        """
+        chunksize 행씩 읽어 만든 Document 배치를 차례로 내보냅니다.
+        VectorStoreManager.load_or_create/create에 그대로 넘기면 전체 문서를 메모리에 올리지 않고 인덱스를 만듭니다.
+        """
+        for frame in self._iter_frames():
+            documents = self._build_documents(frame)
+            if documents:
+                yield documents
 
     def load_documents(self) -> list[Document]:
-        df = pd.read_csv(self.filepath)
-        documents = []
-        for _, row in df.iterrows():
-            documents.extend(self._extract_chunks_from_row(row))
+        documents = [doc for batch in self.iter_document_batches() for doc in batch]
         print(f"총 {len(documents)}개의 문서 생성 완료")
         return documents
@@ -4,9 +4,11 @@ from vectorstore import VectorStoreManager
 from llm import GovPolicyLLM
 from prompt import GovPolicyPrompt, MarkdownFormatter
 from gov_policy_qa import GovPolicyQA
+from answer_cache import AnswerCache
 from chat_history import ChatHistory
 from logger import Logger
-from grounding_checker import VectorstoreGroundingChecker
+from grounding_checker import SentenceGroundingChecker
+from embedding_cache import CachedEmbeddings
 from langchain_openai import OpenAIEmbeddings
 
 # 1. 환경 설정 및 초기화
@@ -18,11 +20,12 @@ history = ChatHistory()
 
 # 2. 데이터 로드 및 벡터스토어 구축
 doc_loader = DocumentLoader(filepath="data/serviceDetail_all.csv")
-documents = doc_loader.load_documents()
+# 문서는 배치 단위로 읽어 바로 임베딩 단계로 넘김 (인덱스가 이미 있으면 읽지 않음)
+document_batches = doc_loader.iter_document_batches()
 
-embeddings = OpenAIEmbeddings()
-vs_manager = VectorStoreManager(embeddings=embeddings)
-vectorstore = vs_manager.load_or_create(documents, path="code/faiss_index_v2")
+embeddings = CachedEmbeddings(OpenAIEmbeddings(), cache_path="code/embedding_cache.sqlite")
+vs_manager = VectorStoreManager(embeddings=embeddings, checkpoint_dir="code/embedding_checkpoint")
+vectorstore = vs_manager.load_or_create(document_batches, path="code/faiss_index_v2")
 
 # 3. LLM 및 Prompt 설정
 llm = GovPolicyLLM(model_name="gpt-4o", temperature=0).get_llm()
@@ -30,10 +33,18 @@ prompt = GovPolicyPrompt().get_prompt()
 formatter = MarkdownFormatter()
 
 # 4. QA 시스템 초기화
-qa_system = GovPolicyQA(vectorstore, embeddings, llm, prompt, formatter)
+qa_system = GovPolicyQA(
+    vectorstore, embeddings, llm, prompt, formatter,
+    side_store=vs_manager.side_store,
+    lexical_index=vs_manager.lexical_index,
+    policy_index=vs_manager.policy_index,
+    region_shards=vs_manager.region_shards,
+    cache=AnswerCache(),
+    index_version=vs_manager.version
+)
 
-# 5. 벡터스토어 기반 그라운드체커 초기화
-grounding_checker = VectorstoreGroundingChecker(vectorstore, embeddings)
+# 5. 검색 문맥 기반 그라운드체커 초기화
+grounding_checker = SentenceGroundingChecker(embeddings)
 
 # 6. 대화 루프
 print("정부 지원 정책 질문 시스템입니다. 'exit' 입력 시 종료됩니다.\n")
@@ -47,15 +58,22 @@ while True:
     logger.log_user_input(question)
     history.add_user_message(question)
 
-    # 답변 생성
-    answer = qa_system.run(question)
+    # 답변 생성 (토큰이 도착하는 대로 출력)
+    answer = ""
+    context_docs, context_embeddings = [], None
+    for event in qa_system.stream(question):
+        if event["type"] == "retrieval":
+            context_docs, context_embeddings = event["docs"], event["doc_embeddings"]
+            print(f"\n🔎 참고 문서 {len(event['docs'])}건 검색 완료")
+            print("\n📌 챗봇 답변:\n")
+        elif event["type"] == "token":
+            print(event["content"], end="", flush=True)
+        elif event["type"] == "answer":
+            answer = event["content"]
+    print()
 
-    # 그라운드체크 실행
-    grounding_results = grounding_checker.run(answer)
-
-    # 출력
-    print("\n📌 챗봇 답변:\n")
-    print(answer)
+    # 그라운드체크 실행 (LLM에 전달된 문서만 대상으로 확인)
+    grounding_results = grounding_checker.run(answer, context_docs, context_embeddings)
 
     print("\n🧠 그라운딩 체크 결과:")
     if grounding_results:
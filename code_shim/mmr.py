@@ -0,0 +1,84 @@
+import numpy as np
+from typing import List, Optional
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def batch_maximal_marginal_relevance(
+    query_embeddings: np.ndarray,
+    doc_embeddings: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+    valid_mask: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    여러 질문에 대한 MMR을 한 번에 계산합니다.
+
+    Args:
+        query_embeddings: (B, d) 질문 벡터
+        doc_embeddings: (B, n, d) 질문별 후보 문서 벡터
+        k: 질문별로 선택할 문서 수
+        lambda_mult: 관련성(1)과 다양성(0) 사이의 가중치
+        valid_mask: (B, n) 후보 수가 질문마다 다를 때 패딩 위치를 False로 표시
+
+    Returns:
+        np.ndarray: (B, k) 선택된 후보 인덱스. 후보가 부족한 자리는 -1
+    """
+    query_embeddings = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+    doc_embeddings = _normalize(np.asarray(doc_embeddings, dtype=np.float32))
+    batch_size, n_docs, _ = doc_embeddings.shape
+    k = min(k, n_docs)
+
+    if valid_mask is None:
+        valid_mask = np.ones((batch_size, n_docs), dtype=bool)
+    available = np.asarray(valid_mask, dtype=bool).copy()
+    rows = np.arange(batch_size)
+
+    similarity_to_query = np.einsum("bnd,bd->bn", doc_embeddings, query_embeddings)
+    # 이미 선택된 문서들과의 최대 유사도 (문서×문서 전체 행렬 대신 매 단계 한 열씩 갱신)
+    max_similarity_to_selected = np.full((batch_size, n_docs), -np.inf, dtype=np.float32)
+
+    selected = np.full((batch_size, k), -1, dtype=np.int64)
+    for step in range(k):
+        if step == 0:
+            scores = similarity_to_query.copy()
+        else:
+            scores = lambda_mult * similarity_to_query - (1 - lambda_mult) * max_similarity_to_selected
+        scores[~available] = -np.inf
+
+        best = np.argmax(scores, axis=1)
+        has_candidate = available[rows, best]
+        selected[has_candidate, step] = best[has_candidate]
+        available[rows, best] = False
+
+        best_vectors = doc_embeddings[rows, best]
+        np.maximum(
+            max_similarity_to_selected,
+            np.einsum("bnd,bd->bn", doc_embeddings, best_vectors),
+            out=max_similarity_to_selected
+        )
+
+    return selected
+
+
+def maximal_marginal_relevance(
+    query_embedding: np.ndarray,
+    doc_embeddings: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5
+) -> List[int]:
+    doc_embeddings = np.asarray(doc_embeddings, dtype=np.float32)
+    if doc_embeddings.size == 0 or k <= 0:
+        return []
+
+    selected = batch_maximal_marginal_relevance(
+        np.asarray(query_embedding, dtype=np.float32)[None, :],
+        doc_embeddings[None, :, :],
+        k=k,
+        lambda_mult=lambda_mult
+    )[0]
+    return [int(i) for i in selected if i != -1]
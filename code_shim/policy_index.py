@@ -0,0 +1,147 @@
+import json
+import os
+from typing import List, Optional
+import numpy as np
+from file_io import save_array, save_json
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class PolicyCentroidIndex:
+    """
+    서비스ID(정책)마다 항목 청크 벡터의 중심(centroid)을 하나씩 둔 정책 단위 색인입니다.
+    한 정책이 최대 6개 항목 청크로 나뉘므로, 청크 단위로 바로 검색하면 상위 후보가 몇몇 정책에 몰립니다.
+    먼저 정책 중심으로 상위 정책을 고른 뒤 그 정책의 청크만 정밀하게 점수를 매기는 2단계 검색에 사용합니다.
+
+    청크 번호는 FAISS 인덱스의 위치와 같으며, 추가된 순서대로 매겨집니다.
+    """
+    dirname = "policy_index"
+
+    def __init__(self):
+        # 빌드 중: 서비스ID → 정책 번호, 정책별 정규화 벡터 합과 청크 수, 배치별 청크의 정책 번호
+        self._policy_ids = {}
+        self._sums: Optional[np.ndarray] = None
+        self._counts: Optional[np.ndarray] = None
+        self._pending_policies: List[np.ndarray] = []
+        # 빌드 완료 후: 정책 중심 벡터, CSR 형태의 정책 → 청크 위치, 청크 위치 → 정책 번호
+        self.service_ids: Optional[List[str]] = None
+        self.centroids: Optional[np.ndarray] = None
+        self.indptr: Optional[np.ndarray] = None
+        self.positions: Optional[np.ndarray] = None
+        self.policy_of: Optional[np.ndarray] = None
+        self.n_chunks = 0
+        # 저장할 때 기록한 벡터스토어 인덱스 버전 (로드한 색인이 현재 인덱스와 맞는지 확인)
+        self.version: Optional[str] = None
+
+    def __len__(self):
+        return self.n_chunks
+
+    @property
+    def n_policies(self) -> int:
+        return len(self.service_ids) if self.service_ids is not None else len(self._policy_ids)
+
+    def add(self, service_ids: List[str], vectors: np.ndarray) -> None:
+        """청크의 서비스ID와 벡터를 추가합니다. 정책별 합계만 누적하므로 벡터 전체를 보관하지 않습니다."""
+        if self.centroids is not None:
+            raise ValueError("이미 빌드된 정책 색인에는 청크를 추가할 수 없습니다.")
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        policies = np.array(
+            [self._policy_ids.setdefault(str(sid), len(self._policy_ids)) for sid in service_ids], dtype=np.int32
+        )
+        if self._sums is None:
+            self._sums = np.zeros((max(1024, len(self._policy_ids)), vectors.shape[1]), dtype=np.float32)
+            self._counts = np.zeros(len(self._sums), dtype=np.int64)
+        if len(self._policy_ids) > len(self._sums):
+            # 정책 수가 늘어나면 두 배씩 확장
+            capacity = max(len(self._policy_ids), 2 * len(self._sums))
+            self._sums = np.vstack([self._sums, np.zeros((capacity - len(self._sums), self._sums.shape[1]), dtype=np.float32)])
+            self._counts = np.concatenate([self._counts, np.zeros(capacity - len(self._counts), dtype=np.int64)])
+        np.add.at(self._sums, policies, vectors)
+        np.add.at(self._counts, policies, 1)
+        self._pending_policies.append(policies)
+        self.n_chunks += len(policies)
+
+    def build(self) -> None:
+        """추가된 청크로 정책 색인을 만듭니다. (저장/검색 전에 자동으로 호출)"""
+        if self.centroids is not None:
+            return
+        n_policies = len(self._policy_ids)
+        self.policy_of = np.concatenate(self._pending_policies) if self._pending_policies else np.empty(0, dtype=np.int32)
+        self.service_ids = list(self._policy_ids)
+        dim = self._sums.shape[1] if self._sums is not None else 0
+        sums = self._sums[:n_policies] if self._sums is not None else np.empty((0, dim), dtype=np.float32)
+        self.centroids = _normalize(sums)
+        self.positions = np.argsort(self.policy_of, kind="stable").astype(np.int64)
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(self.policy_of, minlength=n_policies))]).astype(np.int64)
+        self._policy_ids, self._sums, self._counts, self._pending_policies = {}, None, None, []
+
+    def search(self, query_embedding, n: int, allowed: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        질문과 코사인 유사도가 높은 정책 번호를 최대 n개 반환합니다.
+        allowed(청크 위치별 boolean 배열)를 주면 허용된 청크가 하나라도 있는 정책만 고릅니다.
+        """
+        return self.search_batch(np.asarray(query_embedding, dtype=np.float32)[None, :], n, [allowed])[0]
+
+    def search_batch(self, query_embeddings, n: int,
+                     allowed: Optional[List[Optional[np.ndarray]]] = None) -> List[np.ndarray]:
+        """
+        여러 질문의 상위 정책 번호를 질문 순서대로 반환합니다. 정책 중심과의 유사도는 한 번의 행렬 곱으로 계산합니다.
+        allowed에는 질문별 허용 마스크(또는 None)를 넘깁니다.
+        """
+        self.build()
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        if self.n_policies == 0:
+            return [np.empty(0, dtype=np.int64) for _ in queries]
+        scores = queries @ np.asarray(self.centroids).T
+        results = []
+        for row, mask in zip(scores, allowed or [None] * len(queries)):
+            if mask is not None:
+                policy_allowed = np.zeros(self.n_policies, dtype=bool)
+                policy_allowed[self.policy_of[np.asarray(mask, dtype=bool)]] = True
+                row = np.where(policy_allowed, row, -np.inf)
+            top_n = min(n, int(np.isfinite(row).sum()))
+            if top_n <= 0:
+                results.append(np.empty(0, dtype=np.int64))
+                continue
+            top = np.argpartition(-row, top_n - 1)[:top_n]
+            results.append(top[np.argsort(-row[top], kind="stable")])
+        return results
+
+    def chunk_positions(self, policies) -> np.ndarray:
+        """정책 번호 순서대로 각 정책의 청크 위치를 이어 붙여 반환합니다."""
+        self.build()
+        if len(policies) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.positions[self.indptr[p]:self.indptr[p + 1]] for p in policies])
+
+    def save(self, path: str, version: Optional[str] = None) -> None:
+        """배열은 임시 파일에 쓴 뒤 교체하고(mmap으로 열린 파일을 제자리에서 잘라 쓰지 않음), meta.json은 마지막에 씁니다."""
+        self.build()
+        directory = os.path.join(path, self.dirname)
+        os.makedirs(directory, exist_ok=True)
+        for name in ("centroids", "indptr", "positions", "policy_of"):
+            save_array(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        self.version = version
+        save_json(os.path.join(directory, "meta.json"),
+                  {"n_chunks": self.n_chunks, "service_ids": self.service_ids, "version": version})
+
+    @classmethod
+    def load(cls, path: str) -> Optional["PolicyCentroidIndex"]:
+        """저장된 정책 색인을 읽기 전용 메모리 맵으로 엽니다."""
+        directory = os.path.join(path, cls.dirname)
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls()
+        index.n_chunks = meta["n_chunks"]
+        index.service_ids = meta["service_ids"]
+        index.version = meta.get("version")
+        for name in ("centroids", "indptr", "positions", "policy_of"):
+            setattr(index, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+        return index
@@ -0,0 +1,51 @@
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """
+    분당 요청 수(RPM)와 분당 토큰 수(TPM)를 함께 제한하는 토큰 버킷입니다.
+    여러 스레드에서 acquire()를 호출해도 안전하며, 한도를 넘으면 여유가 생길 때까지 대기합니다.
+    """
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute or 0)
+        self._token_allowance = float(tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                self.requests_per_minute, self._request_allowance + elapsed * self.requests_per_minute / 60
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                self.tokens_per_minute, self._token_allowance + elapsed * self.tokens_per_minute / 60
+            )
+
+    def acquire(self, tokens: int = 0):
+        if self.tokens_per_minute:
+            # 한 요청이 버킷 용량보다 크면 영원히 대기하지 않도록 용량으로 자름
+            tokens = min(tokens, self.tokens_per_minute)
+
+        while True:
+            with self._lock:
+                self._refill()
+                wait = 0.0
+                if self.requests_per_minute and self._request_allowance < 1:
+                    wait = max(wait, (1 - self._request_allowance) * 60 / self.requests_per_minute)
+                if self.tokens_per_minute and self._token_allowance < tokens:
+                    wait = max(wait, (tokens - self._token_allowance) * 60 / self.tokens_per_minute)
+                if wait == 0.0:
+                    if self.requests_per_minute:
+                        self._request_allowance -= 1
+                    if self.tokens_per_minute:
+                        self._token_allowance -= tokens
+                    return
+            time.sleep(wait)
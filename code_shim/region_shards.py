@@ -0,0 +1,235 @@
+import json
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from file_io import save_array, save_json
+
+# 시/도 → 기관명·질문에서 찾을 이름 (정식 명칭과 흔히 쓰는 줄임말)
+PROVINCES = {
+    "서울": ["서울특별시", "서울시", "서울"],
+    "부산": ["부산광역시", "부산시", "부산"],
+    "대구": ["대구광역시", "대구시", "대구"],
+    "인천": ["인천광역시", "인천시", "인천"],
+    "광주": ["광주광역시", "광주시", "광주"],
+    "대전": ["대전광역시", "대전시", "대전"],
+    "울산": ["울산광역시", "울산시", "울산"],
+    "세종": ["세종특별자치시", "세종시", "세종"],
+    "경기": ["경기도", "경기"],
+    "강원": ["강원특별자치도", "강원도", "강원"],
+    "충북": ["충청북도", "충북"],
+    "충남": ["충청남도", "충남"],
+    "전북": ["전북특별자치도", "전라북도", "전북"],
+    "전남": ["전라남도", "전남"],
+    "경북": ["경상북도", "경북"],
+    "경남": ["경상남도", "경남"],
+    "제주": ["제주특별자치도", "제주도", "제주"],
+}
+PROVINCE_NAMES = {alias for aliases in PROVINCES.values() for alias in aliases}
+DISTRICT_PATTERN = re.compile(r"^[가-힣]{1,5}[시군구]$")
+QUESTION_TOKEN_PATTERN = re.compile(r"[가-힣]+")
+# 질문 단어 끝에서 떼어 볼 조사 (예: "의정부시에서" → "의정부시")
+PARTICLES = ("에서는", "에서", "에는", "에게", "으로", "에", "의", "은", "는", "이", "가", "을", "를", "로")
+# 시/군/구 이름에서 접미사를 뗀 형태가 일상 단어와 같은 경우 (고령자, 예산, 영양, 부여 등)
+# 이런 이름은 "고령군"처럼 전체 이름으로 쓰거나 "경북 고령"처럼 시/도를 함께 말할 때만 지역으로 봄
+STEM_STOPWORDS = {
+    "고령", "예산", "영양", "부여", "장수", "상주", "보은", "광명", "구리", "영광", "공주", "동해", "남해",
+    "인제", "무안", "진도", "금산", "고성", "성주", "청도", "정선", "양주", "보성", "의령", "연수", "수성",
+}
+# 일상 단어("경기가 어려워")로도 쓰이는 시/도 줄임말: 혼자서는 지역으로 보지 않고 시/군/구를 좁히는 데만 사용
+AMBIGUOUS_PROVINCE_ALIASES = {"경기"}
+# 지역이 없는 기관(중앙부처, 공단 등)의 청크가 들어가는 전국 샤드
+NATIONAL = "전국"
+
+
+def find_province(text: str) -> Optional[str]:
+    """기관명에서 시/도를 찾습니다. (공백으로 나눈 단어가 시/도 이름으로 시작하는 경우)"""
+    for token in (text or "").split():
+        for province, aliases in PROVINCES.items():
+            if any(token.startswith(alias) for alias in aliases):
+                return province
+    return None
+
+
+def find_district(text: str) -> Optional[str]:
+    """
+    기관명에서 시/군/구 이름을 찾습니다. (예: "경기도 의정부시" → "의정부시")
+    맨 앞의 시/도 이름은 건너뛰므로 "경기도 광주시"의 광주시처럼 시/도 줄임말과 같은 시/군/구도 찾습니다.
+    """
+    province_seen = False
+    for token in (text or "").split():
+        if token in PROVINCE_NAMES and not province_seen:
+            province_seen = True
+            continue
+        if DISTRICT_PATTERN.match(token):
+            return token
+    return None
+
+
+class RegionShardIndex:
+    """
+    청크를 관할 지역(소관기관명, 없으면 접수기관명의 시/도)별 샤드로 나눈 색인입니다.
+    샤드는 FAISS 인덱스 안의 위치 목록이며, 질문에 지역이 나오면 그 지역 샤드와 전국 샤드만 검색하도록
+    허용 마스크(IDSelectorBitmap)를 만듭니다. BM25·정책 색인·보조 벡터 저장소와 위치가 그대로 맞습니다.
+
+    시/도 없이 시/군/구만 적힌 기관은 다른 기관명에서 본 시/도로 묶고, 끝까지 모르면 시/군/구 이름을 샤드로 씁니다.
+    """
+    dirname = "region_shards"
+
+    def __init__(self):
+        # 빌드 중: 청크별 (시/도, 시/군/구), 시/군/구 → 함께 나온 시/도
+        self._pending: List[tuple] = []
+        self._district_provinces: Dict[str, set] = {}
+        # 빌드 완료 후: 샤드 이름, CSR 형태의 샤드 → 청크 위치, 시/군/구 → 샤드 이름 목록
+        self.shard_names: Optional[List[str]] = None
+        self.indptr: Optional[np.ndarray] = None
+        self.positions: Optional[np.ndarray] = None
+        self.districts: Dict[str, List[str]] = {}
+        self.n_chunks = 0
+        # 저장할 때 기록한 벡터스토어 인덱스 버전 (로드한 샤드가 현재 인덱스와 맞는지 확인)
+        self.version: Optional[str] = None
+
+    def __len__(self):
+        return self.n_chunks
+
+    def add(self, agency_names: Iterable[List[str]]) -> None:
+        """청크마다 기관명 목록(우선순위 순: 소관기관명, 접수기관명)을 추가합니다."""
+        if self.shard_names is not None:
+            raise ValueError("이미 빌드된 샤드 색인에는 청크를 추가할 수 없습니다.")
+        for names in agency_names:
+            province, district = None, None
+            for name in names:
+                province = province or find_province(name)
+                district = district or find_district(name)
+                if district and province:
+                    self._district_provinces.setdefault(district, set()).add(province)
+                if province:
+                    break
+            self._pending.append((province, district))
+        self.n_chunks = len(self._pending)
+
+    def build(self) -> None:
+        """추가된 청크로 샤드를 만듭니다. (저장/검색 전에 자동으로 호출)"""
+        if self.shard_names is not None:
+            return
+        keys = []
+        for province, district in self._pending:
+            if province:
+                keys.append(province)
+            elif district:
+                known = sorted(self._district_provinces.get(district, ()))
+                # 같은 이름의 구(중구 등)가 여러 시/도에 있으면 어느 쪽인지 알 수 없으므로 구 이름으로 둠
+                keys.append(known[0] if len(known) == 1 else district)
+            else:
+                keys.append(NATIONAL)
+
+        self.shard_names = sorted(set(keys) | {NATIONAL})
+        shard_numbers = {name: i for i, name in enumerate(self.shard_names)}
+        codes = np.array([shard_numbers[key] for key in keys], dtype=np.int32)
+        self.positions = np.argsort(codes, kind="stable").astype(np.int64)
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(self.shard_names)))]).astype(np.int64)
+
+        districts = {district: sorted(provinces) for district, provinces in self._district_provinces.items()}
+        for key in set(keys) - set(PROVINCES) - {NATIONAL}:
+            # 시/도를 정하지 못한 시/군/구 샤드도 그 이름으로 찾을 수 있게 함
+            districts[key] = sorted(set(districts.get(key, [])) | {key})
+        self.districts = districts
+        self._pending, self._district_provinces = [], {}
+
+    @staticmethod
+    def _question_words(question: str) -> List[str]:
+        """질문의 한글 단어와, 끝의 조사를 뗀 형태 (부분 문자열이 아닌 단어 단위로만 지역을 찾기 위함)"""
+        words = []
+        for token in QUESTION_TOKEN_PATTERN.findall(question):
+            words.append(token)
+            words.extend(token[:-len(p)] for p in PARTICLES if token.endswith(p) and len(token) - len(p) >= 2)
+        return words
+
+    def _match_regions(self, question: str) -> Tuple[set, Dict[str, List[str]]]:
+        """질문에 나온 시/도(줄임말 포함)와, 지역으로 볼 시/군/구 → 그 샤드 목록"""
+        self.build()
+        words = set(self._question_words(question))
+        provinces = {province for province, aliases in PROVINCES.items() if words & set(aliases)}
+        districts = {}
+        for district, district_shards in self.districts.items():
+            stem = district[:-1]
+            if district in words:
+                matched = True
+            elif len(stem) >= 2 and stem in words:
+                matched = stem not in STEM_STOPWORDS or bool(set(district_shards) & provinces)
+            else:
+                matched = False
+            if matched:
+                districts[district] = district_shards
+        return provinces, districts
+
+    def route(self, question: str) -> Optional[List[str]]:
+        """
+        질문에 나온 지역의 샤드 이름 목록을 반환합니다. (전국 샤드는 항상 포함, 지역이 없으면 None = 전체 검색)
+        지역명은 단어 단위로만 찾습니다. 시/군/구는 "의정부시"뿐 아니라 "의정부"처럼 접미사를 뗀 이름(두 글자 이상)도 찾되,
+        일상 단어와 겹치는 이름(STEM_STOPWORDS)은 전체 이름이거나 시/도를 함께 말한 경우만 지역으로 봅니다.
+        "광주"만 말하면 광주광역시와 경기도 광주시를 모두 검색합니다.
+        """
+        provinces, districts = self._match_regions(question)
+        words = set(self._question_words(question))
+        shards = {province for province, aliases in PROVINCES.items()
+                  if words & (set(aliases) - AMBIGUOUS_PROVINCE_ALIASES)}
+        for district_shards in districts.values():
+            # "부산 중구"처럼 시/도를 함께 말하면 같은 이름의 다른 지역 구는 제외
+            shards.update(set(district_shards) & provinces or district_shards)
+        shards &= set(self.shard_names)
+        if not shards:
+            return None
+        return sorted(shards) + [NATIONAL]
+
+    def mentioned_regions(self, question: str) -> List[str]:
+        """
+        질문에 나온 시/도와 시/군/구 이름입니다. 같은 샤드로 라우팅되는 "의정부"와 "수원"도 구분하므로,
+        질문이 같은 지역을 묻는지 비교할 때 사용합니다. (답변 캐시의 의미 유사도 조회 등)
+        """
+        provinces, districts = self._match_regions(question)
+        return sorted(provinces | set(districts))
+
+    def mask(self, shards: List[str]) -> np.ndarray:
+        """주어진 샤드에 속한 청크를 True로 표시한 boolean 배열"""
+        self.build()
+        allowed = np.zeros(self.n_chunks, dtype=bool)
+        for name in shards:
+            if name in self.shard_names:
+                number = self.shard_names.index(name)
+                allowed[self.positions[self.indptr[number]:self.indptr[number + 1]]] = True
+        return allowed
+
+    def allowed_for(self, question: str) -> Optional[np.ndarray]:
+        """질문을 라우팅한 허용 마스크 (지역이 없으면 None)"""
+        shards = self.route(question)
+        return self.mask(shards) if shards is not None else None
+
+    def save(self, path: str, version: Optional[str] = None) -> None:
+        """배열은 임시 파일에 쓴 뒤 교체하고(mmap으로 열린 파일을 제자리에서 잘라 쓰지 않음), meta.json은 마지막에 씁니다."""
+        self.build()
+        directory = os.path.join(path, self.dirname)
+        os.makedirs(directory, exist_ok=True)
+        for name in ("indptr", "positions"):
+            save_array(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        self.version = version
+        save_json(os.path.join(directory, "meta.json"),
+                  {"n_chunks": self.n_chunks, "shard_names": self.shard_names, "districts": self.districts,
+                   "version": version})
+
+    @classmethod
+    def load(cls, path: str) -> Optional["RegionShardIndex"]:
+        directory = os.path.join(path, cls.dirname)
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls()
+        index.n_chunks = meta["n_chunks"]
+        index.shard_names = meta["shard_names"]
+        index.districts = meta["districts"]
+        index.version = meta.get("version")
+        for name in ("indptr", "positions"):
+            setattr(index, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+        return index
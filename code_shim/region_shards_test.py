@@ -0,0 +1,64 @@
+# region_shards_test.py
+# 실행: code_shim 폴더에서 `python -m pytest region_shards_test.py` 또는 `python region_shards_test.py`
+import tempfile
+import numpy as np
+from region_shards import NATIONAL, RegionShardIndex
+
+AGENCIES = [
+    "보건복지부", "경기도 의정부시", "서울특별시 강남구", "부산광역시 중구", "서울특별시 중구",
+    "경상북도 고령군", "충청남도 예산군", "경상북도 영양군", "경기도 광주시", "광주광역시 북구", "경상남도 창원시",
+]
+
+def make_shards() -> RegionShardIndex:
+    shards = RegionShardIndex()
+    shards.add([[agency, ""] for agency in AGENCIES])
+    shards.build()
+    return shards
+
+def test_common_words_do_not_route():
+    shards = make_shards()
+    for question in ["고령자 일자리 지원", "예산 지원 사업", "임산부 영양 지원", "경기가 어려운 소상공인 지원",
+                     "경기 침체 대응 지원금", "청년 월세 지원"]:
+        assert shards.route(question) is None, question
+
+def test_region_names_route():
+    shards = make_shards()
+    assert shards.route("의정부 청년 지원") == ["경기", NATIONAL]
+    assert shards.route("의정부시에서 받을 수 있는 지원") == ["경기", NATIONAL]
+    assert shards.route("서울 강남구 주거") == ["서울", NATIONAL]
+    assert shards.route("고령군 일자리 지원") == ["경북", NATIONAL]
+    assert shards.route("경북 고령 일자리") == ["경북", NATIONAL]
+    assert shards.route("충남 예산 청년") == ["충남", NATIONAL]
+    assert shards.route("경기도 청년 지원") == ["경기", NATIONAL]
+    assert shards.route("창원 면접 수당") == ["경남", NATIONAL]
+
+def test_ambiguous_regions():
+    shards = make_shards()
+    # 같은 이름의 구는 시/도를 함께 말하면 그 시/도만
+    assert shards.route("부산 중구 지원") == ["부산", NATIONAL]
+    assert shards.route("중구 지원") == ["부산", "서울", NATIONAL]
+    # "광주"는 광주광역시와 경기도 광주시 모두
+    assert shards.route("광주 청년 지원") == ["경기", "광주", NATIONAL]
+
+def test_save_replaces_mmapped_files():
+    with tempfile.TemporaryDirectory() as path:
+        make_shards().save(path, version="v1")
+        loaded = RegionShardIndex.load(path)
+        assert loaded.version == "v1"
+        before = np.array(loaded.positions)
+        # 다시 저장해도 mmap으로 열린 예전 파일은 제자리에서 바뀌지 않음
+        shards = RegionShardIndex()
+        shards.add([[agency, ""] for agency in reversed(AGENCIES)])
+        shards.save(path, version="v2")
+        assert np.array_equal(np.array(loaded.positions), before)
+        reloaded = RegionShardIndex.load(path)
+        assert reloaded.version == "v2"
+        assert reloaded.route("의정부 청년 지원") == ["경기", NATIONAL]
+        del loaded, reloaded
+
+if __name__ == "__main__":
+    test_common_words_do_not_route()
+    test_region_names_route()
+    test_ambiguous_regions()
+    test_save_replaces_mmapped_files()
+    print("✅ 지역 라우팅 테스트 통과")
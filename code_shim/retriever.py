@@ -1,10 +1,16 @@
+import faiss
 import numpy as np
-from typing import List
+from typing import List, Optional, Tuple
 from langchain_community.vectorstores.faiss import FAISS
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
+from vectorstore import VectorSideStore, make_search_parameters
+from lexical_index import NgramBM25Index, reciprocal_rank_fusion
+from policy_index import PolicyCentroidIndex
+from region_shards import RegionShardIndex
+from mmr import batch_maximal_marginal_relevance, maximal_marginal_relevance
 
 
 class HybridMMRRetriever:
@@ -14,91 +20,300 @@ class HybridMMRRetriever:
         embeddings: Embeddings,
         top_k_sim: int = 15,
         top_k_final: int = 5,
-        lambda_mult: float = 0.5
+        lambda_mult: float = 0.5,
+        side_store: Optional[VectorSideStore] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        lexical_index: Optional[NgramBM25Index] = None,
+        top_k_lexical: Optional[int] = None,
+        rrf_k: int = 60,
+        policy_index: Optional[PolicyCentroidIndex] = None,
+        top_n_policies: int = 10,
+        chunks_per_policy: Optional[int] = 2,
+        region_shards: Optional[RegionShardIndex] = None,
+        batch_score_size: int = 256
     ):
         self.vectorstore = vectorstore
         self.embeddings = embeddings
         self.top_k_sim = top_k_sim
         self.top_k_final = top_k_final
         self.lambda_mult = lambda_mult
+        # 인덱스가 reconstruct를 지원하지 않을 때 사용하는 벡터 보조 저장소 (없으면 메모리에 생성)
+        self.side_store = side_store if side_store is not None else VectorSideStore()
+        # 근사 인덱스의 검색 범위 (IVF: 탐색할 리스트 수, HNSW: 탐색 후보 수). 크면 정확도↑ 속도↓
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        # 글자 n-gram BM25 역색인 (있으면 dense 결과와 RRF로 합친 뒤 MMR 적용)
+        self.lexical_index = lexical_index
+        self.top_k_lexical = top_k_lexical
+        self.rrf_k = rrf_k
+        # 정책 중심 벡터 색인 (있으면 상위 정책을 먼저 고르고 그 정책의 청크만 점수를 매김)
+        # chunks_per_policy: MMR 후보에 한 정책이 차지할 수 있는 최대 청크 수 (None이면 제한 없음)
+        self.policy_index = policy_index
+        self.top_n_policies = top_n_policies
+        self.chunks_per_policy = chunks_per_policy
+        # 배치 검색에서 (질문 × 후보 청크) 점수 행렬을 한 번에 계산할 질문 수
+        self.batch_score_size = batch_score_size
+        # 지역 샤드 (질문에 지역이 나오면 그 지역 샤드와 전국 샤드 안에서만 검색)
+        self.region_shards = region_shards
 
-    def _maximal_marginal_relevance(
-        self,
-        query_embedding: np.ndarray,
-        doc_embeddings: np.ndarray,
-        k: int
-    ) -> List[int]:
-        if isinstance(query_embedding, list):
-            query_embedding = np.array(query_embedding)
+    def _dense_search(self, query_embedding, k: int, allowed: Optional[np.ndarray] = None) -> List[int]:
+        vector = np.array([query_embedding], dtype=np.float32)
+        if self.vectorstore._normalize_L2:
+            vector = vector / np.linalg.norm(vector, axis=1, keepdims=True)
+        params = make_search_parameters(self.vectorstore.index, nprobe=self.nprobe, ef_search=self.ef_search, allowed=allowed)
+        _, indices = self.vectorstore.index.search(vector, k, params=params)
+        return [int(i) for i in indices[0] if i != -1]
 
-        if isinstance(doc_embeddings, list):
-            doc_embeddings = np.array(doc_embeddings)
+    def _dense_search_batch(self, query_embeddings: np.ndarray, k: int) -> List[List[int]]:
+        # 여러 질문을 한 번의 FAISS 호출로 검색 (multi-query)
+        vectors = np.asarray(query_embeddings, dtype=np.float32)
+        if self.vectorstore._normalize_L2:
+            vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        params = make_search_parameters(self.vectorstore.index, nprobe=self.nprobe, ef_search=self.ef_search)
+        _, indices = self.vectorstore.index.search(vectors, k, params=params)
+        return [[int(i) for i in row if i != -1] for row in indices]
 
-        doc_embeddings = doc_embeddings / np.linalg.norm(doc_embeddings, axis=1, keepdims=True)
-        query_embedding = query_embedding / np.linalg.norm(query_embedding)
+    def _lookup(self, positions: List[int]) -> Tuple[List[Document], List[str]]:
+        doc_ids = [self.vectorstore.index_to_docstore_id[i] for i in positions]
+        return [self.vectorstore.docstore.search(doc_id) for doc_id in doc_ids], doc_ids
 
-        similarity_to_query = np.dot(doc_embeddings, query_embedding)
-        similarity_between_docs = np.dot(doc_embeddings, doc_embeddings.T)
+    def _policy_candidates(self, question: str, policies: List[int], k: int,
+                           allowed: Optional[np.ndarray] = None) -> Tuple[List[int], List[int]]:
+        """1단계에서 고른 정책(BM25 상위 청크의 정책과 RRF로 합침)의 청크 위치와, BM25 상위 청크 위치를 반환합니다."""
+        lexical_positions = []
+        if self.lexical_index is not None:
+            lexical_positions = [i for i, _ in self.lexical_index.search(question, self.top_k_lexical or k, allowed)]
+            lexical_policies = list(dict.fromkeys(int(self.policy_index.policy_of[i]) for i in lexical_positions))
+            policies = reciprocal_rank_fusion([list(policies), lexical_policies], k=self.rrf_k)[:self.top_n_policies]
+        candidates = self.policy_index.chunk_positions(policies)
+        if allowed is not None:
+            candidates = candidates[np.asarray(allowed, dtype=bool)[candidates]]
+        return candidates.tolist(), lexical_positions
 
-        selected = []
-        remaining = list(range(len(doc_embeddings)))
+    def _chunk_scores(self, query_embeddings: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        """(질문 수 × 청크 수) 점수 행렬. 인덱스와 같은 거리 기준을 쓰며 클수록 가깝습니다."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if self.vectorstore._normalize_L2:
+            queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        if self.vectorstore.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            return queries @ vectors.T
+        return -(np.sum(queries ** 2, axis=1)[:, None] - 2 * queries @ vectors.T + np.sum(vectors ** 2, axis=1)[None, :])
 
-        for _ in range(k):
-            if not remaining:
-                break
+    def _rank_policy_chunks(self, candidates: List[int], scores: np.ndarray, lexical_positions: List[int], k: int) -> List[int]:
+        positions = [candidates[i] for i in np.argsort(-scores, kind="stable")]
+        if lexical_positions:
+            candidate_set = set(candidates)
+            lexical_positions = [i for i in lexical_positions if i in candidate_set]
+            positions = reciprocal_rank_fusion([positions, lexical_positions], k=self.rrf_k)
 
-            if not selected:
-                selected_idx = int(np.argmax(similarity_to_query))
-                selected.append(selected_idx)
-                remaining.remove(selected_idx)
+        if self.chunks_per_policy is not None:
+            # 한 정책의 청크가 후보를 독차지하지 않도록 정책별 청크 수 제한
+            taken = {}
+            capped = []
+            for position in positions:
+                policy = int(self.policy_index.policy_of[position])
+                if taken.get(policy, 0) < self.chunks_per_policy:
+                    taken[policy] = taken.get(policy, 0) + 1
+                    capped.append(position)
+            positions = capped
+        return positions[:k]
+
+    def _policy_search(self, question: str, query_embedding, k: int, allowed: Optional[np.ndarray] = None) -> List[int]:
+        return self._policy_search_batch([question], np.asarray([query_embedding], dtype=np.float32), k, [allowed])[0]
+
+    def _policy_search_batch(self, questions: List[str], query_embeddings: np.ndarray, k: int,
+                             masks: List[Optional[np.ndarray]]) -> List[List[int]]:
+        results = []
+        # (질문 × 후보 청크) 점수 행렬과 후보 벡터가 너무 커지지 않도록 batch_score_size개 질문씩 처리
+        for start in range(0, len(questions), self.batch_score_size):
+            end = start + self.batch_score_size
+            queries = query_embeddings[start:end]
+            # 1단계: 정책 중심 벡터와의 유사도를 한 번의 행렬 곱으로 계산해 질문별 상위 정책 선택
+            policy_rows = self.policy_index.search_batch(queries, self.top_n_policies, masks[start:end])
+            per_question = [
+                self._policy_candidates(question, policies.tolist(), k, mask)
+                for question, policies, mask in zip(questions[start:end], policy_rows, masks[start:end])
+            ]
+
+            # 2단계: 고른 정책들의 청크(합집합) 벡터를 한 번만 읽어 모든 질문과의 점수를 한 번에 계산
+            union = list(dict.fromkeys(p for candidates, _ in per_question for p in candidates))
+            if not union:
+                results.extend([] for _ in per_question)
                 continue
+            docs, doc_ids = self._lookup(union)
+            scores = self._chunk_scores(queries, self._get_doc_embeddings(docs, doc_ids, union))
+            column = {position: j for j, position in enumerate(union)}
+            for row, (candidates, lexical_positions) in zip(scores, per_question):
+                columns = [column[p] for p in candidates]
+                results.append(self._rank_policy_chunks(candidates, row[columns], lexical_positions, k) if candidates else [])
+        return results
 
-            max_score = -np.inf
-            selected_idx = -1
+    def _candidate_positions(self, question: str, query_embedding, k: int, allowed: Optional[np.ndarray] = None,
+                             dense_positions: Optional[List[int]] = None) -> List[int]:
+        if self.policy_index is not None:
+            return self._policy_search(question, query_embedding, k, allowed)
+        # dense_positions: 배치 검색에서 미리 구한 dense 결과
+        positions = dense_positions if dense_positions is not None else self._dense_search(query_embedding, k, allowed)
+        if self.lexical_index is not None:
+            # dense 상위 k개와 BM25 상위 결과를 순위 기반(RRF)으로 합쳐 상위 k개를 MMR 후보로 사용
+            lexical_positions = [i for i, _ in self.lexical_index.search(question, self.top_k_lexical or k, allowed)]
+            positions = reciprocal_rank_fusion([positions, lexical_positions], k=self.rrf_k)[:k]
+        return positions
 
-            for idx in remaining:
-                sim_to_query = similarity_to_query[idx]
-                sim_to_selected = max(similarity_between_docs[idx][j] for j in selected)
-                score = self.lambda_mult * sim_to_query - (1 - self.lambda_mult) * sim_to_selected
+    def _search(self, question: str, query_embedding, k: int,
+                allowed: Optional[np.ndarray] = None) -> Tuple[List[Document], List[str], List[int]]:
+        positions = self._candidate_positions(question, query_embedding, k, allowed)
+        docs, doc_ids = self._lookup(positions)
+        return docs, doc_ids, positions
 
-                if score > max_score:
-                    max_score = score
-                    selected_idx = idx
+    def _get_doc_embeddings(self, docs: List[Document], doc_ids: List[str], positions: List[int]) -> np.ndarray:
+        # 1순위: FAISS 인덱스에 저장된 벡터를 그대로 복원
+        try:
+            return self.vectorstore.index.reconstruct_batch(np.array(positions, dtype=np.int64))
+        except RuntimeError:
+            pass
 
-            selected.append(selected_idx)
-            remaining.remove(selected_idx)
+        # 2순위: 보조 저장소, 그래도 없는 벡터만 한 번의 배치 호출로 임베딩 후 보관
+        vectors = self.side_store.get_many(doc_ids)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            new_vectors = self.embeddings.embed_documents([docs[i].page_content for i in missing])
+            self.side_store.add([doc_ids[i] for i in missing], new_vectors)
+            for i, vector in zip(missing, new_vectors):
+                vectors[i] = np.asarray(vector, dtype=np.float32)
+        return np.vstack(vectors)
+
+    def _maximal_marginal_relevance(
+        self,
+        query_embedding: np.ndarray,
+        doc_embeddings: np.ndarray,
+        k: int,
+        lambda_mult: float = None
+    ) -> List[int]:
+        lambda_mult = self.lambda_mult if lambda_mult is None else lambda_mult
+        return maximal_marginal_relevance(query_embedding, doc_embeddings, k=k, lambda_mult=lambda_mult)
 
-        return selected
+    def _route(self, question: str, allowed: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        # 질문에 지역이 나오면 그 지역 샤드와 전국 샤드만 허용
+        if self.region_shards is not None:
+            routed = self.region_shards.allowed_for(question)
+            if routed is not None:
+                allowed = routed if allowed is None else routed & np.asarray(allowed, dtype=bool)
+        return allowed
 
-    def retrieve(
+    def retrieve_with_embeddings(
         self,
         question: str,
         top_k_sim: int = None,
         top_k_final: int = None,
-        lambda_mult: float = None
-    ) -> List[Document]:
+        lambda_mult: float = None,
+        query_embedding: List[float] = None,
+        allowed: Optional[np.ndarray] = None
+    ) -> Tuple[List[Document], np.ndarray]:
+        """
+        선택된 문서와 함께 그 문서들의 벡터를 반환합니다. (그라운드체킹 등에서 재임베딩 없이 재사용)
+        allowed(인덱스 위치별 boolean 배열)를 주면 dense/BM25 검색 모두 True인 위치 안에서만 후보를 찾습니다.
+        """
         # 외부 입력값 우선, 없으면 인스턴스 기본값 사용
         top_k_sim = top_k_sim or self.top_k_sim
         top_k_final = top_k_final or self.top_k_final
-        lambda_mult = lambda_mult or self.lambda_mult
+        lambda_mult = self.lambda_mult if lambda_mult is None else lambda_mult
 
-        query_embedding = self.embeddings.embed_query(question)
-
-        sim_docs_and_scores = self.vectorstore.similarity_search_with_score_by_vector(
-            query_embedding,
-            k=top_k_sim
-        )
+        # 호출 측에서 이미 계산한 질문 임베딩이 있으면 재사용
+        if query_embedding is None:
+            query_embedding = self.embeddings.embed_query(question)
 
-        docs = [doc for doc, _ in sim_docs_and_scores]
-        doc_embeddings = [self.embeddings.embed_query(doc.page_content) for doc in docs]
+        docs, doc_ids, positions = self._search(question, query_embedding, top_k_sim, self._route(question, allowed))
+        if not docs:
+            return [], np.empty((0, len(query_embedding)), dtype=np.float32)
+        doc_embeddings = self._get_doc_embeddings(docs, doc_ids, positions)
 
         selected_indices = self._maximal_marginal_relevance(
             query_embedding=query_embedding,
             doc_embeddings=doc_embeddings,
-            k=top_k_final
+            k=top_k_final,
+            lambda_mult=lambda_mult
+        )
+
+        return [docs[i] for i in selected_indices], doc_embeddings[selected_indices]
+
+    def retrieve(
+        self,
+        question: str,
+        top_k_sim: int = None,
+        top_k_final: int = None,
+        lambda_mult: float = None,
+        query_embedding: List[float] = None,
+        allowed: Optional[np.ndarray] = None
+    ) -> List[Document]:
+        docs, _ = self.retrieve_with_embeddings(question, top_k_sim, top_k_final, lambda_mult, query_embedding, allowed)
+        return docs
+
+    def retrieve_batch_with_embeddings(
+        self,
+        questions: List[str],
+        query_embeddings,
+        top_k_sim: int = None,
+        top_k_final: int = None,
+        lambda_mult: float = None
+    ) -> List[Tuple[List[Document], np.ndarray]]:
+        """
+        여러 질문의 (문서, 문서 벡터)를 질문 순서대로 반환합니다. (retrieve_with_embeddings의 배치 버전)
+        정책 색인이 있으면 정책 중심·청크 점수를 질문 전체에 대해 행렬 곱으로 한 번에 계산하고,
+        없으면 지역이 라우팅되지 않은 질문을 한 번의 FAISS 호출로 검색합니다. MMR은 모든 질문의 후보를 (질문 수 × 후보 수 × 차원)으로 패딩해 한 번에 계산합니다.
+        """
+        top_k_sim = top_k_sim or self.top_k_sim
+        top_k_final = top_k_final or self.top_k_final
+        lambda_mult = self.lambda_mult if lambda_mult is None else lambda_mult
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        if not questions:
+            return []
+
+        masks = [self._route(question) for question in questions]
+        if self.policy_index is not None:
+            # 정책 중심 점수와 청크 점수 모두 질문 전체에 대해 행렬 곱으로 계산
+            positions_list = self._policy_search_batch(questions, query_embeddings, top_k_sim, masks)
+        else:
+            # 지역 마스크가 없는 질문은 한 번의 FAISS 호출로 검색 (마스크는 질문마다 달라 질문별로 검색)
+            batched = [i for i, mask in enumerate(masks) if mask is None]
+            dense = dict(zip(batched, self._dense_search_batch(query_embeddings[batched], top_k_sim))) if batched else {}
+            positions_list = [
+                self._candidate_positions(question, query_embeddings[i], top_k_sim, masks[i], dense.get(i))
+                for i, question in enumerate(questions)
+            ]
+
+        # 모든 질문의 후보(합집합)를 한 번에 조회하고 벡터를 한 번에 복원
+        union = list(dict.fromkeys(p for positions in positions_list for p in positions))
+        union_docs, union_ids = self._lookup(union)
+        union_vectors = self._get_doc_embeddings(union_docs, union_ids, union) if union else None
+        column = {position: j for j, position in enumerate(union)}
+        candidates = []
+        for positions in positions_list:
+            columns = [column[p] for p in positions]
+            candidates.append(([union_docs[j] for j in columns], union_vectors[columns] if columns else None))
+
+        # 후보 수가 질문마다 다르므로 가장 많은 후보 수에 맞춰 패딩하고 valid_mask로 표시
+        n_max = max(len(docs) for docs, _ in candidates)
+        dim = query_embeddings.shape[1]
+        doc_matrix = np.zeros((len(questions), max(n_max, 1), dim), dtype=np.float32)
+        valid_mask = np.zeros((len(questions), max(n_max, 1)), dtype=bool)
+        for i, (docs, vectors) in enumerate(candidates):
+            if docs:
+                doc_matrix[i, :len(docs)] = vectors
+                valid_mask[i, :len(docs)] = True
+        selected = batch_maximal_marginal_relevance(
+            query_embeddings, doc_matrix, k=top_k_final, lambda_mult=lambda_mult, valid_mask=valid_mask
         )
 
-        return [docs[i] for i in selected_indices]
+        results = []
+        for (docs, vectors), row in zip(candidates, selected):
+            indices = [int(j) for j in row if j != -1]
+            if not docs:
+                results.append(([], np.empty((0, dim), dtype=np.float32)))
+            else:
+                results.append(([docs[j] for j in indices], vectors[indices]))
+        return results
 
 
 # 체인 생성 함수 (similarity / mmr 등 공통 구조화용)
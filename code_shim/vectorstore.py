@@ -1,69 +1,623 @@
+import hashlib
+import json
 import os
+import pickle
+import random
+import shutil
 import time
-from typing import List
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import faiss
+import numpy as np
 from tqdm import tqdm
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 from langchain_core.vectorstores import VectorStoreRetriever
+from rate_limiter import RateLimiter
+from file_io import replace_file, save_json, save_text
+from lexical_index import NgramBM25Index
+from policy_index import PolicyCentroidIndex
+from region_shards import RegionShardIndex
+
+
+class VectorSideStore:
+    """
+    docstore id → 벡터 보조 저장소입니다.
+    인덱스 타입이 reconstruct를 지원하지 않을 때(IVF 등) 검색 후보의 벡터를 재임베딩하지 않고 꺼내기 위해 사용합니다.
+    """
+    filename = "side_vectors.npz"
+
+    def __init__(self):
+        self._vectors: Dict[str, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._vectors
+
+    def add(self, doc_ids: List[str], vectors) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        for doc_id, vector in zip(doc_ids, vectors):
+            self._vectors[doc_id] = vector
+
+    def get_many(self, doc_ids: List[str]) -> List[Optional[np.ndarray]]:
+        return [self._vectors.get(doc_id) for doc_id in doc_ids]
+
+    def delete(self, doc_ids: List[str]) -> None:
+        for doc_id in doc_ids:
+            self._vectors.pop(doc_id, None)
+
+    def save(self, path: str) -> None:
+        ids = list(self._vectors)
+        vectors = np.vstack([self._vectors[i] for i in ids]) if ids else np.empty((0, 0), dtype=np.float32)
+        np.savez(os.path.join(path, self.filename), ids=np.array(ids, dtype=str), vectors=vectors)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["VectorSideStore"]:
+        file_path = os.path.join(path, cls.filename)
+        if not os.path.exists(file_path):
+            return None
+        store = cls()
+        with np.load(file_path) as data:
+            store.add(data["ids"].tolist(), data["vectors"])
+        return store
+
+
+class EmbeddingCheckpoint:
+    """
+    완료된 임베딩 배치를 디스크에 저장해 두었다가, 빌드가 중단되면 이어서 진행할 수 있게 합니다.
+    배치 파일은 배치 텍스트의 해시로 저장하므로 입력이 바뀐 배치는 자연스럽게 다시 임베딩되고,
+    모델/배치 크기가 바뀌면 (fingerprint 불일치) 기존 체크포인트는 버립니다.
+    """
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        meta_path = os.path.join(path, "meta.json")
+
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                if json.load(f).get("fingerprint") != fingerprint:
+                    shutil.rmtree(path)
+
+        os.makedirs(path, exist_ok=True)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint}, f)
+
+    @staticmethod
+    def batch_key(texts: List[str]) -> str:
+        hasher = hashlib.sha256()
+        for text in texts:
+            hasher.update(b"\x00" + text.encode("utf-8"))
+        return hasher.hexdigest()
+
+    def _batch_path(self, batch_key: str) -> str:
+        return os.path.join(self.path, f"batch_{batch_key}.npy")
+
+    def load(self, batch_key: str) -> Optional[np.ndarray]:
+        batch_path = self._batch_path(batch_key)
+        if not os.path.exists(batch_path):
+            return None
+        return np.load(batch_path)
+
+    def save(self, batch_key: str, embeddings_list) -> None:
+        # 쓰는 도중 중단돼도 깨진 파일이 남지 않도록 임시 파일에 쓰고 교체
+        tmp_path = self._batch_path(batch_key) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(embeddings_list, dtype=np.float32))
+        os.replace(tmp_path, self._batch_path(batch_key))
+
+
+# 지원하는 인덱스 종류 (flat: 정확한 검색, 나머지: 근사 검색)
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq8")
+# 학습이 필요한 인덱스 종류 (처음 들어오는 벡터 일부로 학습 후 전체를 추가)
+TRAINED_INDEX_TYPES = ("ivf_flat", "ivf_pq", "sq8")
+
+
+def index_factory_string(index_type: str, dim: int, n_train: int, nlist: Optional[int] = None,
+                         hnsw_m: int = 32, pq_m: Optional[int] = None) -> str:
+    """
+    faiss.index_factory에 넘길 문자열을 만듭니다.
+    IVF의 리스트 수(nlist)와 PQ 비트 수는 학습 벡터 수에 맞춰 줄입니다. (faiss 권장: 리스트당 39개 이상)
+    """
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}"
+    if index_type == "sq8":
+        return "SQ8"
+    if index_type not in ("ivf_flat", "ivf_pq"):
+        raise ValueError(f"지원하지 않는 인덱스 종류입니다: {index_type} (가능: {', '.join(INDEX_TYPES)})")
+
+    nlist = nlist or 4 * int(np.sqrt(n_train))
+    nlist = max(1, min(nlist, n_train // 39))
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    # PQ 서브 양자화기 수는 차원의 약수여야 함 (기본: 서브 벡터당 8차원 안팎)
+    pq_m = pq_m or max(m for m in range(1, max(1, dim // 8) + 1) if dim % m == 0)
+    nbits = max(1, min(8, int(np.log2(max(n_train, 2)))))
+    return f"IVF{nlist},PQ{pq_m}x{nbits}"
+
+
+def make_search_parameters(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                           allowed: Optional[np.ndarray] = None):
+    """
+    검색 시점 파라미터(IVF의 nprobe, HNSW의 efSearch)를 쿼리 단위 SearchParameters로 만듭니다.
+    인덱스를 직접 바꾸지 않으므로 여러 스레드가 같은 인덱스를 서로 다른 값으로 검색할 수 있습니다.
+    allowed(인덱스 위치별 boolean 배열)를 주면 True인 위치 안에서만 검색합니다. (IDSelectorBitmap 사전 필터)
+    """
+    index = faiss.downcast_index(index)
+    kwargs = {}
+    keepalive = ()
+    if allowed is not None:
+        bitmap = np.packbits(np.asarray(allowed, dtype=bool), bitorder="little")
+        kwargs["sel"] = faiss.IDSelectorBitmap(len(allowed), faiss.swig_ptr(bitmap))
+        keepalive = (kwargs["sel"], bitmap)
+
+    if isinstance(index, faiss.IndexIVF) and (nprobe or kwargs):
+        params = faiss.SearchParametersIVF(nprobe=nprobe or index.nprobe, **kwargs)
+    elif isinstance(index, faiss.IndexHNSW) and (ef_search or kwargs):
+        params = faiss.SearchParametersHNSW(efSearch=ef_search or index.hnsw.efSearch, **kwargs)
+    elif kwargs:
+        params = faiss.SearchParameters(**kwargs)
+    else:
+        return None
+    # selector는 bitmap 메모리를 참조만 하므로 파라미터가 살아 있는 동안 함께 보관
+    params.referenced_objects = keepalive
+    return params
+
+
+SHARED_INDEX_NAME = "index_shared.faiss"
+# 공유 사본을 만든 원본 인덱스의 해시와 인덱스 버전 (원본이 바뀐 경우만 다시 쓰고, 읽을 때 버전이 맞는지 확인)
+SHARED_SOURCE_NAME = "index_shared.source.json"
+
+
+def to_shared_layout(index):
+    """
+    여러 프로세스가 mmap으로 같은 페이지 캐시를 공유할 수 있는 형태(IVF)로 변환합니다.
+    faiss는 IVF의 inverted list만 mmap으로 읽을 수 있으므로, flat 인덱스는 리스트가 1개인 IVF로 옮깁니다. (검색 결과 동일)
+    HNSW/SQ8처럼 옮길 수 없는 인덱스는 None을 반환합니다.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        shared = faiss.clone_index(index)
+    elif isinstance(index, faiss.IndexFlat):
+        # 리스트가 하나뿐이면 중심점 값은 결과에 영향이 없으므로 학습 없이 0 벡터 하나로 둠
+        quantizer = faiss.IndexFlat(index.d, index.metric_type)
+        quantizer.add(np.zeros((1, index.d), dtype=np.float32))
+        shared = faiss.IndexIVFFlat(quantizer, index.d, 1, index.metric_type)
+        if index.ntotal:
+            shared.add(index.reconstruct_n(0, index.ntotal))
+    else:
+        return None
+    if isinstance(shared, faiss.IndexIVFFlat):
+        # 검색 후보 벡터를 인덱스에서 그대로 복원할 수 있도록 (보조 벡터 저장소 불필요)
+        # PQ 등은 복원값이 근사치이므로 기존처럼 보조 저장소의 원래 벡터를 사용
+        shared.make_direct_map()
+    return shared
+
+
+def index_supports_reconstruct(index) -> bool:
+    if index.ntotal == 0:
+        return True
+    try:
+        index.reconstruct(0)
+        return True
+    except RuntimeError:
+        return False
 
 
 class VectorStoreManager:
-    def __init__(self, embeddings: Embeddings):
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_workers: int = 4,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = 5,
+        checkpoint_dir: Optional[str] = None,
+        index_type: str = "flat",
+        index_params: Optional[dict] = None,
+        train_size: int = 20000,
+        lexical: bool = True,
+        policy_centroids: bool = True,
+        region_sharding: bool = True
+    ):
+        """
+        Args:
+            index_type: INDEX_TYPES 중 하나 (index_benchmark.py의 recall@k/지연시간 리포트로 선택)
+            index_params: index_factory_string에 넘길 값 (nlist, hnsw_m, pq_m)
+            train_size: 학습이 필요한 인덱스(IVF, SQ8)를 학습할 벡터 수 (처음 임베딩된 배치부터 채움)
+            lexical: True이면 FAISS 인덱스와 함께 글자 n-gram BM25 역색인(lexical_index)도 만들고 저장
+            policy_centroids: True이면 서비스ID별 중심 벡터 색인(policy_index)도 만들고 저장 (정책 → 청크 2단계 검색용)
+            region_sharding: True이면 소관기관명/접수기관명 기준 지역 샤드(region_shards)도 만들고 저장
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"지원하지 않는 인덱스 종류입니다: {index_type} (가능: {', '.join(INDEX_TYPES)})")
         self.embeddings = embeddings
         self.vectorstore = None
+        self.side_store: Optional[VectorSideStore] = None
+        self.lexical = lexical
+        self.lexical_index: Optional[NgramBM25Index] = None
+        self.policy_centroids = policy_centroids
+        self.policy_index: Optional[PolicyCentroidIndex] = None
+        self.region_sharding = region_sharding
+        self.region_shards: Optional[RegionShardIndex] = None
+        # 인덱스가 새로 만들어질 때마다 바뀌는 버전 (답변 캐시 무효화 등에 사용)
+        self.version: Optional[str] = None
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.checkpoint_dir = checkpoint_dir
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.train_size = train_size
+        # 인덱스 학습 전까지 모아두는 (배치, 벡터) 목록
+        self._train_buffer: List[Tuple[List[Document], np.ndarray]] = []
 
-    def embed_documents_in_batches(self, documents: List[Document], batch_size: int = 100):
-        all_embeddings = []
-        all_docs = []
+    @staticmethod
+    def _estimate_tokens(texts: List[str]) -> int:
+        # 한국어는 대략 한 글자당 1토큰 이하이므로 글자 수를 보수적인 추정치로 사용
+        return sum(len(text) for text in texts)
 
-        for i in tqdm(range(0, len(documents), batch_size), desc="임베딩 처리 중..."):
-            batch = documents[i:i + batch_size]
+    def _embed_batch_with_retry(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(tokens=self._estimate_tokens(texts))
             try:
-                batch_embeddings = self.embeddings.embed_documents([doc.page_content for doc in batch])
+                return self.embeddings.embed_documents(texts)
             except Exception as e:
-                print(f"임베딩 에러 발생. 3초 후 재시도 중... ({e})")
-                time.sleep(3)
-                batch_embeddings = self.embeddings.embed_documents([doc.page_content for doc in batch])
+                if attempt == self.max_retries:
+                    raise
+                # 지수 백오프 + 지터 (최대 60초)
+                delay = min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+                print(f"임베딩 에러 발생. {delay:.1f}초 후 재시도 중... ({attempt + 1}/{self.max_retries}) ({e})")
+                time.sleep(delay)
 
-            all_embeddings.extend(batch_embeddings)
-            all_docs.extend(batch)
+    def _open_checkpoint(self, batch_size: int) -> Optional[EmbeddingCheckpoint]:
+        if not self.checkpoint_dir:
+            return None
+        model = getattr(self.embeddings, "model", None) or type(self.embeddings).__name__
+        return EmbeddingCheckpoint(self.checkpoint_dir, f"{model}\x00{batch_size}")
 
-        return all_docs, all_embeddings
+    @staticmethod
+    def _rebatch(document_batches: Iterable[List[Document]], batch_size: int) -> Iterator[List[Document]]:
+        # 로더가 넘겨주는 배치 크기와 관계없이 임베딩 API 호출 단위(batch_size)로 다시 묶음
+        buffer: List[Document] = []
+        for batch in document_batches:
+            buffer.extend(batch)
+            while len(buffer) >= batch_size:
+                yield buffer[:batch_size]
+                buffer = buffer[batch_size:]
+        if buffer:
+            yield buffer
 
-    def create(self, documents: List[Document]) -> FAISS:
-        docs, embeddings_list = self.embed_documents_in_batches(documents)
-        self.vectorstore = FAISS.from_embeddings(
-            embeddings=embeddings_list,
-            texts=[doc.page_content for doc in docs],
-            metadatas=[doc.metadata for doc in docs],
+    def _embed_or_restore(self, texts: List[str], checkpoint: Optional[EmbeddingCheckpoint]) -> Tuple[np.ndarray, bool]:
+        """배치 벡터와, 체크포인트에서 복원했는지 여부를 반환합니다."""
+        batch_key = EmbeddingCheckpoint.batch_key(texts) if checkpoint is not None else None
+        if checkpoint is not None:
+            restored = checkpoint.load(batch_key)
+            if restored is not None:
+                return restored, True
+        vectors = np.asarray(self._embed_batch_with_retry(texts), dtype=np.float32)
+        if checkpoint is not None:
+            checkpoint.save(batch_key, vectors)
+        return vectors, False
+
+    def _new_index(self, train_vectors: np.ndarray):
+        dim = train_vectors.shape[1]
+        index = faiss.index_factory(dim, index_factory_string(self.index_type, dim, len(train_vectors), **self.index_params))
+        if not index.is_trained:
+            index.train(train_vectors)
+        return index
+
+    def _flush_train_buffer(self) -> None:
+        # 모아둔 벡터로 인덱스를 만들고(필요하면 학습) 모아둔 배치를 모두 추가
+        if not self._train_buffer:
+            return
+        batches, self._train_buffer = self._train_buffer, []
+        index = self._new_index(np.vstack([vectors for _, vectors in batches]))
+        self.vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
         )
+        for batch, vectors in batches:
+            self._add_batch(batch, vectors)
+
+    def _add_batch(self, batch: List[Document], vectors: np.ndarray) -> None:
+        if self.vectorstore is None:
+            self._train_buffer.append((batch, vectors))
+            buffered = sum(len(b) for b, _ in self._train_buffer)
+            if self.index_type not in TRAINED_INDEX_TYPES or buffered >= self.train_size:
+                self._flush_train_buffer()
+            return
+
+        texts = [doc.page_content for doc in batch]
+        metadatas = [doc.metadata for doc in batch]
+        ids = [str(uuid.uuid4()) for _ in batch]
+        first_batch = self.vectorstore.index.ntotal == 0
+        self.vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+        if first_batch:
+            # 인덱스에서 벡터를 복원할 수 있으면 보조 저장소는 필요 없음 (IVF 등은 복원 불가)
+            self.side_store = None if index_supports_reconstruct(self.vectorstore.index) else VectorSideStore()
+        if self.side_store is not None:
+            self.side_store.add(ids, vectors)
+        if self.lexical_index is not None:
+            # 역색인의 문서 번호 = FAISS 위치 (추가 순서가 같으므로 그대로 맞음)
+            self.lexical_index.add_texts(texts)
+        if self.policy_index is not None:
+            self.policy_index.add([doc.metadata.get("서비스ID") for doc in batch], vectors)
+        if self.region_shards is not None:
+            self.region_shards.add(self._agency_names(metadatas))
+
+    def create(self, documents: Union[List[Document], Iterable[List[Document]]], batch_size: int = 100) -> FAISS:
+        """
+        문서를 batch_size 단위로 병렬 임베딩하면서 바로 FAISS에 추가합니다.
+        documents에는 Document 리스트 또는 Document 배치를 내보내는 이터러블(DocumentLoader.iter_document_batches)을
+        넘길 수 있으며, 후자는 전체 문서를 메모리에 올리지 않으므로 코퍼스가 커져도 메모리 사용량이 일정합니다.
+        """
+        if isinstance(documents, list) and (not documents or isinstance(documents[0], Document)):
+            documents = [documents]
+        checkpoint = self._open_checkpoint(batch_size)
+        self.vectorstore, self.side_store = None, None
+        self.lexical_index = NgramBM25Index() if self.lexical else None
+        self.policy_index = PolicyCentroidIndex() if self.policy_centroids else None
+        self.region_shards = RegionShardIndex() if self.region_sharding else None
+        self._train_buffer = []
+
+        # 대기 중인 배치를 max_workers * 2개로 제한하고, 완료되면 순서대로 인덱스에 추가
+        pending = deque()
+        errors = []
+        restored = 0
+        progress = tqdm(desc="임베딩 처리 중...", unit="batch")
+
+        def drain_one():
+            nonlocal restored
+            batch, future = pending.popleft()
+            try:
+                vectors, from_checkpoint = future.result()
+            except Exception as e:
+                errors.append(e)
+                return
+            restored += from_checkpoint
+            if not errors:
+                # 실패한 배치가 생기면 이후 배치는 체크포인트에만 남기고 인덱스에는 추가하지 않음
+                self._add_batch(batch, vectors)
+            progress.update(1)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch in self._rebatch(documents, batch_size):
+                texts = [doc.page_content for doc in batch]
+                pending.append((batch, executor.submit(self._embed_or_restore, texts, checkpoint)))
+                if len(pending) >= self.max_workers * 2:
+                    drain_one()
+            while pending:
+                drain_one()
+        if not errors:
+            # 문서 수가 train_size보다 적으면 모인 벡터 전체로 학습
+            self._flush_train_buffer()
+        progress.close()
+        if restored:
+            print(f"체크포인트에서 {restored}개 배치를 복원했습니다.")
+
+        if errors:
+            # 성공한 배치는 체크포인트에 남아 있으므로 다시 실행하면 실패한 배치부터 이어서 진행
+            raise RuntimeError(f"{len(errors)}개 배치 임베딩 실패: {errors[0]}") from errors[0]
+        if self.vectorstore is None:
+            raise ValueError("임베딩할 문서가 없습니다.")
+
+        self.version = uuid.uuid4().hex
+        if self.checkpoint_dir:
+            # 인덱스가 만들어졌으므로 더 이상 이어서 할 작업이 없음
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
         print("FAISS 벡터스토어 생성 완료")
         return self.vectorstore
 
     def save_local(self, path: str = "faiss_index_v2"):
         if self.vectorstore is None:
             raise ValueError("저장할 벡터스토어가 없습니다. 먼저 생성 또는 로드하세요.")
+        # 공유 사본·보조 색인은 이 버전으로 저장되며, 로드할 때 version.txt와 같아야 사용
+        self.version = self.version or uuid.uuid4().hex
         self.vectorstore.save_local(path)
+        self._save_shared_index(path)
+        if self.side_store is not None:
+            self.side_store.save(path)
+        if self.lexical_index is not None:
+            self.lexical_index.save(path, version=self.version)
+        if self.policy_index is not None:
+            self.policy_index.save(path, version=self.version)
+        if self.region_shards is not None:
+            self.region_shards.save(path, version=self.version)
+        # 버전은 마지막에 바꿔, 저장 도중 로드한 프로세스는 버전이 맞지 않는 파일을 쓰지 않음
+        save_text(os.path.join(path, "version.txt"), self.version)
         print(f"벡터스토어 저장 완료 → {path}/")
 
-    def load(self, path: str = "faiss_index_v2", allow_dangerous: bool = True) -> FAISS:
+    def _save_shared_index(self, path: str) -> None:
+        """
+        mmap 공유용 사본을 저장합니다. 원본 인덱스가 그대로면 다시 쓰지 않아 읽는 프로세스의 페이지 캐시를 유지하고,
+        쓸 때는 고유한 임시 파일에 쓴 뒤 교체하므로 여러 프로세스가 동시에 저장해도 섞이지 않습니다.
+        """
+        shared_path = os.path.join(path, SHARED_INDEX_NAME)
+        source_path = os.path.join(path, SHARED_SOURCE_NAME)
+        index = self.vectorstore.index
+        if not isinstance(faiss.downcast_index(index), (faiss.IndexIVF, faiss.IndexFlat)):
+            for stale_path in (shared_path, source_path):
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+            return
+
+        digest = hashlib.blake2b(faiss.serialize_index(index), digest_size=16).hexdigest()
+        source = self._read_shared_source(path)
+        if not (os.path.exists(shared_path) and source.get("digest") == digest):
+            shared = to_shared_layout(index)
+            replace_file(shared_path, lambda tmp_path: faiss.write_index(shared, tmp_path))
+        if source != {"digest": digest, "version": self.version}:
+            save_json(source_path, {"digest": digest, "version": self.version})
+
+    @staticmethod
+    def _read_shared_source(path: str) -> dict:
+        source_path = os.path.join(path, SHARED_SOURCE_NAME)
+        if not os.path.exists(source_path):
+            return {}
+        with open(source_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def load(self, path: str = "faiss_index_v2", allow_dangerous: bool = True, mmap: bool = False) -> FAISS:
+        """
+        mmap=True이면 인덱스를 읽기 전용 메모리 맵으로 엽니다. 벡터가 프로세스 메모리로 복사되지 않고
+        OS 페이지 캐시를 통해 같은 서버의 모든 프로세스가 공유합니다.
+        검색 전용이며, 이렇게 연 인덱스에 문서를 추가하면 faiss가 프로세스를 종료시키므로 추가하지 마세요.
+        """
+        if mmap:
+            return self._load_mmap(path, allow_dangerous)
         self.vectorstore = FAISS.load_local(
             folder_path=path,
             embeddings=self.embeddings,
             allow_dangerous_deserialization=allow_dangerous
         )
+        self.side_store = VectorSideStore.load(path)
+        self.version = self._read_version(path)
+        self.lexical_index = self._load_lexical_index(path)
+        self.policy_index = self._load_policy_index(path)
+        self.region_shards = self._load_region_shards(path)
         print(f"FAISS 벡터스토어 로드 완료 from {path}/")
         return self.vectorstore
 
-    def load_or_create(self, documents: List[Document], path: str = "faiss_index_v2") -> FAISS:
+    def _load_mmap(self, path: str, allow_dangerous: bool) -> FAISS:
+        if not allow_dangerous:
+            raise ValueError("docstore(index.pkl)는 pickle 파일이므로 allow_dangerous=True일 때만 로드합니다.")
+        shared_path = os.path.join(path, SHARED_INDEX_NAME)
+        # 공유 사본은 save_local에서만 만듦 (여러 프로세스가 동시에 로드하면서 쓰지 않도록)
+        if not os.path.exists(shared_path):
+            print("⚠️ mmap 공유용 인덱스가 없어 일반 로드합니다. (flat/IVF 계열 인덱스를 save_local로 다시 저장하면 사용 가능)")
+            return self.load(path, allow_dangerous)
+        if self._read_shared_source(path).get("version") != self._read_version(path):
+            print("⚠️ mmap 공유용 인덱스가 현재 인덱스와 맞지 않아 일반 로드합니다. (save_local로 다시 저장하면 사용 가능)")
+            return self.load(path, allow_dangerous)
+
+        index = faiss.read_index(shared_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        with open(os.path.join(path, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        self.vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+        )
+        self.side_store = None if index_supports_reconstruct(index) else VectorSideStore.load(path)
+        self.version = self._read_version(path)
+        self.lexical_index = self._load_lexical_index(path)
+        self.policy_index = self._load_policy_index(path)
+        self.region_shards = self._load_region_shards(path)
+        print(f"FAISS 벡터스토어 로드 완료 (읽기 전용 mmap) from {path}/")
+        return self.vectorstore
+
+    def _load_lexical_index(self, path: str) -> Optional[NgramBM25Index]:
+        if not self.lexical:
+            return None
+        lexical_index = NgramBM25Index.load(path)
+        if lexical_index is not None and lexical_index.version == self.version:
+            return lexical_index
+
+        # 역색인이 없거나 다른 버전의 인덱스로 만든 것이면 docstore 본문으로 메모리에만 만듦
+        # (로드하는 프로세스는 파일을 쓰지 않음: save_local로 저장하면 다음 로드부터 그대로 사용)
+        print("글자 n-gram 역색인 생성 중... (save_local로 저장하면 다음 로드부터 생략)")
+        lexical_index = NgramBM25Index()
+        id_by_position = self.vectorstore.index_to_docstore_id
+        lexical_index.add_texts(
+            self.vectorstore.docstore.search(id_by_position[i]).page_content for i in range(len(id_by_position))
+        )
+        lexical_index.build()
+        return lexical_index
+
+    def _load_policy_index(self, path: str) -> Optional[PolicyCentroidIndex]:
+        if not self.policy_centroids:
+            return None
+        policy_index = PolicyCentroidIndex.load(path)
+        if policy_index is not None and policy_index.version == self.version:
+            return policy_index
+
+        # 정책 색인이 없거나 다른 버전의 인덱스로 만든 것이면 저장된 벡터(복원 불가 인덱스는 보조 저장소)로
+        # 메모리에만 만듦 (로드하는 프로세스는 파일을 쓰지 않음: save_local로 저장하면 다음 로드부터 그대로 사용)
+        vectors = self._stored_vectors()
+        if vectors is None:
+            print("⚠️ 저장된 벡터를 읽을 수 없어 정책 단위 색인 없이 검색합니다.")
+            return None
+        print("정책 단위 색인 생성 중... (save_local로 저장하면 다음 로드부터 생략)")
+        policy_index = PolicyCentroidIndex()
+        id_by_position = self.vectorstore.index_to_docstore_id
+        for start in range(0, len(id_by_position), 10000):
+            positions = range(start, min(start + 10000, len(id_by_position)))
+            service_ids = [self.vectorstore.docstore.search(id_by_position[i]).metadata.get("서비스ID") for i in positions]
+            policy_index.add(service_ids, vectors(positions))
+        policy_index.build()
+        return policy_index
+
+    @staticmethod
+    def _agency_names(metadatas: List[dict]) -> List[List[str]]:
+        return [[metadata.get("소관기관명") or "", metadata.get("접수기관명") or ""] for metadata in metadatas]
+
+    def _load_region_shards(self, path: str) -> Optional[RegionShardIndex]:
+        if not self.region_sharding:
+            return None
+        region_shards = RegionShardIndex.load(path)
+        if region_shards is not None and region_shards.version == self.version:
+            return region_shards
+
+        id_by_position = self.vectorstore.index_to_docstore_id
+        metadatas = [self.vectorstore.docstore.search(id_by_position[i]).metadata for i in range(len(id_by_position))]
+        if not any("소관기관명" in metadata or "접수기관명" in metadata for metadata in metadatas):
+            # 기관명 메타데이터가 없는 예전 인덱스는 인덱스를 다시 만들어야 지역 샤드를 쓸 수 있음
+            print("⚠️ 문서에 기관명 메타데이터가 없어 지역 샤드 없이 검색합니다. (인덱스를 다시 만들면 사용 가능)")
+            return None
+        # 로드하는 프로세스는 파일을 쓰지 않고 메모리에만 만듦 (save_local로 저장하면 다음 로드부터 그대로 사용)
+        print("지역 샤드 생성 중... (save_local로 저장하면 다음 로드부터 생략)")
+        region_shards = RegionShardIndex()
+        region_shards.add(self._agency_names(metadatas))
+        region_shards.build()
+        return region_shards
+
+    def _stored_vectors(self):
+        """위치 목록 → 벡터 행렬을 반환하는 함수 (인덱스에서 복원하거나 보조 저장소에서 읽음). 둘 다 없으면 None"""
+        index = self.vectorstore.index
+        if index_supports_reconstruct(index):
+            return lambda positions: index.reconstruct_batch(np.array(positions, dtype=np.int64))
+        if self.side_store is None:
+            return None
+        id_by_position = self.vectorstore.index_to_docstore_id
+        vectors = self.side_store.get_many([id_by_position[i] for i in range(len(id_by_position))])
+        if any(vector is None for vector in vectors):
+            return None
+        return lambda positions: np.vstack([vectors[i] for i in positions])
+
+    @staticmethod
+    def _read_version(path: str) -> str:
+        version_path = os.path.join(path, "version.txt")
+        if os.path.exists(version_path):
+            with open(version_path, "r", encoding="utf-8") as f:
+                version = f.read().strip()
+            if version:
+                return version
+        # 버전 파일이 없는 예전 인덱스는 파일 크기/수정 시각으로 대신함
+        stat = os.stat(os.path.join(path, "index.faiss"))
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def load_or_create(self, documents: Union[List[Document], Iterable[List[Document]]],
+                       path: str = "faiss_index_v2", mmap: bool = False) -> FAISS:
         index_path = os.path.join(path, "index.faiss")
         if os.path.exists(index_path):
-            return self.load(path)
-        else:
-            vs = self.create(documents)
-            self.save_local(path)
-            return vs
+            return self.load(path, mmap=mmap)
+        vs = self.create(documents)
+        self.save_local(path)
+        if mmap:
+            # 방금 만든 인덱스의 메모리 사본 대신 공유 가능한 mmap 인덱스로 다시 엶
+            return self.load(path, mmap=True)
+        return vs
 
     def get_retriever(self) -> VectorStoreRetriever:
         if not self.vectorstore: